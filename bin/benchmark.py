@@ -0,0 +1,193 @@
+"""
+Times kardboard's hot paths against seeded synthetic datasets and
+prints the results as JSON, for comparing one commit with another.
+
+    python bin/benchmark.py --sizes 1000,10000,100000 > before.json
+
+Every size is generated into --db (kardboard_benchmark by default),
+which is dropped first. Don't point it at a database you care about.
+"""
+import datetime
+import json
+import optparse
+import socket
+import subprocess
+import sys
+import time
+
+from dateutil.relativedelta import relativedelta
+
+
+def _connect(db_name):
+    from flask.ext.mongoengine import MongoEngine
+    from mongoengine.connection import connect, disconnect, _get_db
+    from kardboard.views import app
+
+    disconnect()
+    app.config['MONGODB_DB'] = db_name
+    app.config['CELERY_ALWAYS_EAGER'] = True
+    connect(db_name)
+    app.db = MongoEngine(app)
+
+    db = _get_db()
+    for name in db.collection_names():
+        if 'system.' not in name:
+            db.drop_collection(name)
+    return app
+
+
+def _timed(func, repeat):
+    timings = []
+    for i in xrange(0, repeat):
+        start = time.time()
+        func()
+        timings.append((time.time() - start) * 1000)
+    timings.sort()
+    return {
+        'min_ms': round(timings[0], 2),
+        'median_ms': round(timings[len(timings) // 2], 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def _view(client, url):
+    def get():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise AssertionError("%s returned %s" % (url, response.status_code))
+    return get
+
+
+def hot_paths(app, today):
+    """
+    The (name, callable) pairs to time, in the order they're run.
+    """
+    from kardboard.models import (
+        DailyRecord,
+        DisplayBoard,
+        FlowReport,
+        ServiceClassRecord,
+        ServiceClassSnapshot,
+    )
+    from kardboard.services.teams import TeamStats, get_teams
+
+    team = get_teams().names[0]
+    client = app.test_client()
+
+    def display_board():
+        DisplayBoard().rows
+
+    def team_stats():
+        stats = TeamStats(team)
+        stats.wip_count()
+        stats.weekly_throughput_ave()
+        stats.lead_time()
+        stats.percentile(.8)
+
+    paths = [
+        ('DailyRecord.calculate', lambda: DailyRecord.calculate(today, group='all')),
+        ('FlowReport.capture', lambda: FlowReport.capture(group='all')),
+        ('ServiceClassSnapshot.calculate', lambda: ServiceClassSnapshot.calculate(group='all')),
+        ('ServiceClassRecord.calculate', lambda: ServiceClassRecord.calculate(
+            today - relativedelta(months=1), today, group='all')),
+        ('DisplayBoard', display_board),
+        ('TeamStats', team_stats),
+    ]
+    urls = (
+        '/',
+        '/reports/all/throughput/',
+        '/reports/all/cycle/',
+        '/reports/all/cycle/distribution/all/',
+        '/reports/all/flow/',
+        '/reports/all/done/',
+        '/reports/all/service-class/',
+        '/reports/all/leaderboard/',
+    )
+    for url in urls:
+        paths.append(('GET %s' % url, _view(client, url)))
+    return paths
+
+
+def prepare(today, days):
+    """
+    The DailyRecords and FlowReports the report views read.
+    """
+    from kardboard.models import DailyRecord, FlowReport
+    for i in xrange(days, -1, -1):
+        DailyRecord.calculate(today - relativedelta(days=i), group='all')
+    FlowReport.capture(group='all', capture=False)
+
+
+def _git_revision():
+    try:
+        return subprocess.Popen(['git', 'rev-parse', 'HEAD'],
+            stdout=subprocess.PIPE).communicate()[0].strip()
+    except OSError:
+        return None
+
+
+def run(sizes, seed, repeat, db_name, history_days):
+    from kardboard.tests.synthetic import SyntheticDataset
+    from kardboard.util import make_start_date, now
+
+    today = make_start_date(date=now())
+
+    results = []
+    for size in sizes:
+        app = _connect(db_name)
+        generate_start = time.time()
+        counts = SyntheticDataset(cards=size, seed=seed, today=today).generate()
+        generated_ms = (time.time() - generate_start) * 1000
+
+        prepare(today, history_days)
+        timings = {}
+        for name, func in hot_paths(app, today):
+            timings[name] = _timed(func, repeat)
+            print >> sys.stderr, "%7d cards  %-45s %10.2f ms" % (size, name, timings[name]['median_ms'])
+
+        results.append({
+            'size': size,
+            'documents': counts,
+            'generate_ms': round(generated_ms, 2),
+            'timings': timings,
+        })
+
+    return {
+        'revision': _git_revision(),
+        'host': socket.gethostname(),
+        'run_at': datetime.datetime.now().isoformat(),
+        'seed': seed,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option('--sizes', default='1000,10000,100000',
+        help="Comma separated card counts to benchmark [%default]")
+    parser.add_option('--seed', type='int', default=0,
+        help="Random seed for the synthetic data [%default]")
+    parser.add_option('--repeat', type='int', default=5,
+        help="Times each hot path is run [%default]")
+    parser.add_option('--db', default='kardboard_benchmark',
+        help="Scratch database, dropped before each size [%default]")
+    parser.add_option('--history-days', type='int', default=30,
+        help="Days of DailyRecords to build before timing the reports [%default]")
+    parser.add_option('--output', default=None,
+        help="Write the JSON here instead of stdout")
+    options, args = parser.parse_args()
+
+    sizes = [int(s) for s in options.sizes.split(',') if s.strip()]
+    report = run(sizes, options.seed, options.repeat, options.db, options.history_days)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as f:
+            f.write(output)
+    else:
+        print output
+
+
+if __name__ == '__main__':
+    main()
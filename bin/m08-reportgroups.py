@@ -0,0 +1,6 @@
+from kardboard.models import Kard
+
+Kard.sync_report_groups()
+
+for group in Kard.objects.distinct('report_groups'):
+    print "%s: %s cards" % (group, Kard.objects.filter(report_groups=group).count())
@@ -0,0 +1,20 @@
+from kardboard.models import Kard, TicketPayload
+
+collection = Kard._get_collection()
+fields = Kard._fields
+
+moved = 0
+for doc in collection.find({'_ticket_system_data': {'$exists': True}}, fields=['_ticket_system_data']):
+    data = doc.get('_ticket_system_data') or {}
+    TicketPayload.store(doc['_id'], data)
+
+    update = {}
+    for name, value in Kard.denormalize_ticket_data(data).items():
+        update[fields[name].db_field] = fields[name].to_mongo(value)
+    collection.update(
+        {'_id': doc['_id']},
+        {'$set': update, '$unset': {'_ticket_system_data': 1}},
+    )
+    moved += 1
+
+print "Moved %s ticket payloads to %s" % (moved, TicketPayload._get_collection().name)
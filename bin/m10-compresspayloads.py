@@ -0,0 +1,19 @@
+from kardboard.app import app
+from kardboard.models import TicketPayload
+
+if not app.config.get('TICKET_PAYLOAD_COMPRESSION', False):
+    print "Set TICKET_PAYLOAD_COMPRESSION = True before running this"
+else:
+    collection = TicketPayload._get_collection()
+    # Rewriting a payload can move it, so don't scan while writing
+    card_ids = [doc['_id'] for doc in collection.find({'data': {'$exists': True}}, fields=['_id'])]
+
+    compressed = 0
+    for card_id in card_ids:
+        doc = collection.find_one({'_id': card_id}, fields=['data'])
+        if not doc or not doc.get('data'):
+            # Empty payloads are stored as they are
+            continue
+        TicketPayload.store(card_id, doc['data'])
+        compressed += 1
+    print "Compressed %s of %s ticket payloads" % (compressed, len(card_ids))
@@ -20,6 +20,7 @@ try:
 except ImportError:
     SENTRY_SUPPORT = False
 
+from kardboard import instrumentation, profiler, querylog
 from kardboard.util import (
     slugify,
     timesince,
@@ -74,6 +75,10 @@ def get_app():
     prefix_name = '%s.%s.kardboard' % (environment_name, machine_name)
     app.statsd = statsd.Client(prefix_name, statsd_connection)
 
+    querylog.init_app(app)
+    instrumentation.init_app(app)
+    profiler.init_app(app)
+
     if SENTRY_SUPPORT and 'SENTRY_DSN' in app.config.keys():
         sentry = Sentry(app)
         sentry
@@ -33,8 +33,18 @@ REPORT_GROUPS = {
     'team-2': (('Team 2',), 'Team 2'),
 }
 
+# When True, ReportGroup filters on the report_groups list stored
+# on each card instead of an $in on team. Run bin/m08-reportgroups.py
+# (or the sync_report_groups task) before turning this on, and again
+# whenever REPORT_GROUPS changes.
+REPORT_GROUPS_DENORMALIZED = False
+
 DEFAULT_TYPE = "Card"
 
+# How long (in seconds) browsers may reuse a report page
+# before revalidating it with If-None-Match/If-Modified-Since
+REPORT_CACHE_MAX_AGE = 60
+
 BROKER_TRANSPORT = "redis"
 BROKER_HOST = "localhost"  # Maps to redis host.
 BROKER_PORT = 6379         # Maps to redis port.
@@ -55,6 +65,54 @@ TICKET_AUTH = False
 # How old can tickets get before we refresh
 TICKET_UPDATE_THRESHOLD = 60 * 5
 
+# Store raw ticket payloads as zlib compressed BSON, with status/type/resolution
+# kept once in the ticket metadata collection. Existing payloads are read either way.
+TICKET_PAYLOAD_COMPRESSION = False
+TICKET_PAYLOAD_COMPRESSION_LEVEL = 6
+
+# Cards done more than this many months ago are moved, with their
+# StateLogs, to the kard_archive/state_log_archive collections.
+# Set to None to keep every card in the live collection.
+ARCHIVE_DONE_AFTER_MONTHS = 24
+
+# Count and time the Mongo queries each request and Celery task makes.
+# Requests get X-Mongo-Queries/X-Mongo-Time headers, both send statsd
+# timings, and a warning is logged when one query shape is repeated
+# more than MONGO_REPEATED_QUERY_THRESHOLD times (usually an N+1).
+MONGO_QUERY_ACCOUNTING = False
+MONGO_REPEATED_QUERY_THRESHOLD = 10
+
+# The share of requests that send per endpoint total, template render
+# and Mongo timings to statsd. REQUEST_STATS_SAMPLE_RATES overrides it
+# by endpoint name, e.g. {'state': 0.1} for the wallboard.
+REQUEST_STATS_SAMPLE_RATE = 1
+REQUEST_STATS_SAMPLE_RATES = {}
+
+# When True, logged in users can add ?_profile=1 to a URL, and tasks
+# can be called with _profile=True, to store a cProfile run with its
+# Mongo queries. Runs are listed at /profiles/. Leave TICKET_AUTH on
+# too, or anyone can profile.
+PROFILING_ENABLED = False
+# How many functions, by cumulative time, and queries each run keeps
+PROFILE_TOP_N = 50
+PROFILE_QUERY_LIMIT = 500
+
+# Celery workers buffer statsd counters, gauges and timings and send
+# them in batched packets at the end of each task, or after this many
+# seconds for long running tasks.
+STATSD_FLUSH_INTERVAL = 10
+
+# How long a worker may hold the lease on a DailyRecord or FlowReport
+# (date, group) while calculating it before another worker can take over
+REPORT_LEASE_SECONDS = 60
+
+# Where the locks that stop periodic report tasks from overlapping live,
+# 'redis' (the broker's) or 'file' (flock in TASK_LOCK_DIR, one host only).
+# A Redis lock expires after TASK_LOCK_SECONDS in case its worker died.
+TASK_LOCK_BACKEND = 'redis'
+TASK_LOCK_SECONDS = 60 * 60
+TASK_LOCK_DIR = None
+
 from celery.schedules import crontab
 CELERYBEAT_SCHEDULE = {
     # How often should we look for old tickets and queue them for updates
@@ -66,40 +124,47 @@ CELERYBEAT_SCHEDULE = {
         'task': 'tasks.jira_queue_team_cards',
         'schedule': crontab(minute="*/3"),
     },
-    # How often should we update all the Person
-    # objects to make sure they reflect reality, due to deleted cards
-    # or people being removed from a card
-    'update_people_recently': {
-        'task': 'tasks.normalize_people',
-        'schedule': crontab(minute="*/60"),
-    },
+    # Rebuild every Person from the last year of cards, the
+    # recently active ones are kept up to date by refresh_reports
     'update_people_yearly': {
         'task': 'tasks.normalize_people',
         'schedule': crontab(minute=1, hour=1),
         'args': (365, ),
     },
-    # How often (probably nighly) should we update daily records for the past
-    # 365 days
+    # How often should we rebuild every daily record for the past
+    # 365 days, in case a change was missed by the dirty date tracking
     'calc-daily-records-year': {
         'task': 'tasks.queue_daily_record_updates',
-        'schedule': crontab(minute=1, hour=0),
+        'schedule': crontab(minute=1, hour=0, day_of_week=0),
         'args': (365, ),
     },
-    # How often should we update daily records for the past
-    # 14 days
-    'calc-daily-records-week': {
-        'task': 'tasks.queue_daily_record_updates',
-        'schedule': crontab(minute="*/15"),
-        'args': (14, ),
+    # How often should we recalculate the daily records
+    # that changed cards have made out of date
+    'calc-dirty-daily-records': {
+        'task': 'tasks.update_dirty_daily_records',
+        'schedule': crontab(minute="*/5"),
+    },
+    # Capture/update the day's flow, daily record and service class
+    # data and recently active people, from one read of the cards
+    'refresh_reports': {
+        'task': 'tasks.refresh_reports',
+        'schedule': crontab(minute="*/5"),
+    },
+    # Recalculate the leaderboard for recently completed months,
+    # in case cards were edited after the month closed
+    'update_leaderboard_records': {
+        'task': 'tasks.update_leaderboard_records',
+        'schedule': crontab(minute=30, hour=0),
+        'args': (2, ),
+    },
+    # Keep the report groups stored on cards in step with REPORT_GROUPS
+    'sync_report_groups': {
+        'task': 'tasks.sync_report_groups',
+        'schedule': crontab(minute=15, hour=0),
     },
-    # Capture/update the day's flow data
-    'update_flow_reports': {
-        'task': 'tasks.update_flow_reports',
-        'schedule': crontab(minute="*/30"),
+    # Move long done cards out of the live collection
+    'archive_done_cards': {
+        'task': 'tasks.archive_done_cards',
+        'schedule': crontab(minute=45, hour=1),
     },
-    # Capture/update the day's service class data
-    'queue_service_class_reports': {
-        'task': 'tasks.queue_service_class_reports',
-        'schedule': crontab(minute="*/1"),
-    }
 }
@@ -9,7 +9,7 @@ from wtforms import (
 )
 from wtforms.ext.dateutil.fields import DateField
 
-from kardboard.models import Kard, States
+from kardboard.models import Kard, KardArchive, get_states
 
 
 def _make_choice_field_ready(choice_list):
@@ -19,22 +19,34 @@ def _make_choice_field_ready(choice_list):
 
 
 class Unique(object):
-    """Validator that checks for uniqueness"""
-    def __init__(self, klass, field, message=None):
+    """
+    Validator that checks for uniqueness with an indexed,
+    limit 1 query. If normalize is supplied it's applied to
+    the value first, to match how the value is saved. If taken
+    is supplied it's called with the value to check anywhere
+    else the value may already be in use.
+    """
+    def __init__(self, klass, field, message=None, normalize=None, taken=None):
         self.klass = klass
         self.field = field
         if not message:
             message = u"this value must be unique"
         self.message = message
+        self.normalize = normalize
+        self.taken = taken
 
     def __call__(self, form, field):
-        check = field.data.strip() in self.klass.objects.distinct(self.field)
-        if check:
+        value = field.data.strip()
+        if self.normalize:
+            value = self.normalize(value)
+        query = {self.field: value}
+        check = self.klass.objects.filter(**query).only(self.field).first()
+        if check is not None or (self.taken and self.taken(value)):
             raise ValidationError(self.message)
 
 
 def done_date_validator(form, field):
-        states = States()
+        states = get_states()
         if form.state.data == states.done:
             if field.data is None:
                 raise ValidationError("Done date required since the card's state is %s" % form.state.data)
@@ -43,7 +55,7 @@ def done_date_validator(form, field):
 
 
 def start_date_validator(form, field):
-        states = States()
+        states = get_states()
         if states.index(form.state.data) >= states.index(states.start):
             if field.data is None:
                 raise ValidationError("Start date required since the card's state is %s" % form.state.data)
@@ -104,7 +116,8 @@ class CardUnblockForm(Form):
 
 def get_card_form(new=False):
     if new:
-        CardForm.validate_key = Unique(Kard, 'key')
+        CardForm.validate_key = Unique(Kard, 'key', normalize=Kard.normalize_key,
+            taken=KardArchive.exists)
     else:
         if hasattr(CardForm, 'validate_key'):
             delattr(CardForm, 'validate_key')
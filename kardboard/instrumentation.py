@@ -0,0 +1,133 @@
+"""
+Per endpoint statsd timings for the web tier: total latency, time
+spent rendering templates and time spent in Mongo, each also tagged
+with the report group when the view takes one.
+
+Requests are sampled at :ref:`REQUEST_STATS_SAMPLE_RATE`, or the
+endpoint's rate in :ref:`REQUEST_STATS_SAMPLE_RATES`, and unsampled
+requests aren't instrumented at all.
+"""
+import random
+import time
+
+import flask.templating
+from flask import _request_ctx_stack
+
+from kardboard.querylog import QueryLog, install
+
+
+class RequestStats(object):
+    """
+    The timings for one sampled request.
+    """
+
+    def __init__(self, endpoint, group=None, sample_rate=1):
+        self.endpoint = endpoint or 'unknown'
+        self.group = group
+        self.sample_rate = sample_rate
+        self.started = time.time()
+        self.render = 0.0
+        self.queries = QueryLog(self.endpoint).start()
+
+    def finish(self):
+        self.queries.stop()
+        total = time.time() - self.started
+        return {
+            'total': total * 1000,
+            'render': self.render * 1000,
+            'db': self.queries.total_ms,
+        }
+
+    def packets(self, prefix):
+        """
+        The statsd timer packets for the request, annotated with the sample rate.
+        """
+        names = ['%s.web.%s' % (prefix, self.endpoint)]
+        if self.group:
+            names.append('%s.web.%s.group.%s' % (prefix, self.endpoint, self.group))
+
+        rate = ''
+        if self.sample_rate < 1:
+            rate = '|@%s' % self.sample_rate
+
+        data = {}
+        for timing, ms in self.finish().items():
+            for name in names:
+                data['%s.%s' % (name, timing)] = '%0.08f|ms%s' % (ms, rate)
+        return data
+
+
+def send_packets(connection, packets):
+    """
+    Sends each packet on its own, python-statsd's Connection.send
+    stops after the first key of the dict it's given.
+    """
+    for name, value in sorted(packets.items()):
+        connection.send({name: value}, sample_rate=1)
+
+
+def _current():
+    ctx = _request_ctx_stack.top
+    if ctx is None:
+        return None
+    return getattr(ctx, 'request_stats', None)
+
+
+def _timed_render(original):
+    def _render(template, context, app):
+        stats = _current()
+        if stats is None:
+            return original(template, context, app)
+        start = time.time()
+        try:
+            return original(template, context, app)
+        finally:
+            stats.render += time.time() - start
+    _render._instrumented = True
+    return _render
+
+
+def sample_rate(config, endpoint):
+    rates = config.get('REQUEST_STATS_SAMPLE_RATES', {})
+    return rates.get(endpoint, config.get('REQUEST_STATS_SAMPLE_RATE', 1))
+
+
+def request_group(config, view_args):
+    """
+    The report group slug the request is for, if any.
+    """
+    group = (view_args or {}).get('group')
+    if group == 'all' or group in config.get('REPORT_GROUPS', {}):
+        return group
+    return None
+
+
+def init_app(app):
+    """
+    Sends per endpoint timings over app.statsd's connection.
+    """
+    from flask import request
+
+    install()
+    if not getattr(flask.templating._render, '_instrumented', False):
+        flask.templating._render = _timed_render(flask.templating._render)
+
+    @app.before_request
+    def start_request_stats():
+        rate = sample_rate(app.config, request.endpoint)
+        if rate <= 0 or random.random() > rate:
+            return
+        _request_ctx_stack.top.request_stats = RequestStats(
+            request.endpoint,
+            group=request_group(app.config, request.view_args),
+            sample_rate=rate,
+        )
+
+    @app.after_request
+    def send_request_stats(response):
+        stats = _current()
+        if stats is None:
+            return response
+        _request_ctx_stack.top.request_stats = None
+        send_packets(app.statsd.connection, stats.packets(app.statsd.name))
+        return response
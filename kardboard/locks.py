@@ -0,0 +1,117 @@
+"""
+Locks that keep a periodic task from running on top of itself.
+
+A scheduled task that takes longer than its schedule interval would
+otherwise start again while it's still running, and every overlapping
+run multiplies the load on Mongo. Tasks decorated with @exclusive skip
+a run while a previous one with the same arguments holds the lock.
+
+:ref:`TASK_LOCK_BACKEND` picks where locks live. 'redis' (the broker's
+Redis) works across hosts and expires locks after
+:ref:`TASK_LOCK_SECONDS` so a crashed worker can't hold one forever.
+'file' uses flock in :ref:`TASK_LOCK_DIR` and only works on one host,
+it's meant for tests and single box installs.
+"""
+import fcntl
+import functools
+import os
+import re
+import tempfile
+import uuid
+
+
+class RedisLock(object):
+    def __init__(self, key, seconds, client):
+        self.key = 'lock:%s' % key
+        self.seconds = seconds
+        self.client = client
+        self.token = None
+
+    def acquire(self):
+        token = uuid.uuid4().hex
+        if self.client.setnx(self.key, token):
+            self.client.expire(self.key, self.seconds)
+            self.token = token
+            return True
+        if self.client.ttl(self.key) in (None, -1):
+            # Whoever set it died before setting the expiry
+            self.client.expire(self.key, self.seconds)
+        return False
+
+    def release(self):
+        if self.token is not None and self.client.get(self.key) == self.token:
+            self.client.delete(self.key)
+        self.token = None
+
+
+class FileLock(object):
+    def __init__(self, key, directory):
+        filename = re.sub(r'[^\w.-]', '_', key) + '.lock'
+        self.path = os.path.join(directory, filename)
+        self.handle = None
+
+    def acquire(self):
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+    def release(self):
+        if self.handle is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+def _redis_client(config):
+    import redis
+    return redis.Redis(
+        host=config.get('CELERY_REDIS_HOST', 'localhost'),
+        port=config.get('CELERY_REDIS_PORT', 6379),
+        db=config.get('CELERY_REDIS_DB', 0),
+    )
+
+
+def task_lock(key, seconds=None):
+    """
+    A lock for key from the configured :ref:`TASK_LOCK_BACKEND`.
+    """
+    from kardboard.app import app
+
+    if seconds is None:
+        seconds = app.config.get('TASK_LOCK_SECONDS', 60 * 60)
+    backend = app.config.get('TASK_LOCK_BACKEND', 'redis')
+    if backend == 'file':
+        directory = app.config.get('TASK_LOCK_DIR') or tempfile.gettempdir()
+        return FileLock(key, directory)
+    return RedisLock(key, seconds, _redis_client(app.config))
+
+
+def exclusive(func):
+    """
+    Skips a call to the task while another call with the same
+    arguments is still running, counting it as tasks.<name>.skipped.
+    """
+    name = "%s.%s" % (func.__module__.split('.')[-1], func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from kardboard.app import app
+        from kardboard.metrics import ScopedMetrics
+
+        key = ':'.join([name] + [str(a) for a in args] +
+            ['%s=%s' % item for item in sorted(kwargs.items())])
+        lock = task_lock(key)
+        if not lock.acquire():
+            ScopedMetrics(name).incr('skipped')
+            app.logger.info("Skipped %s, the previous run is still going" % key)
+            return None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            lock.release()
+    return wrapper
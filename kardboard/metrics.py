@@ -0,0 +1,183 @@
+"""
+A buffered statsd client for Celery workers.
+
+python-statsd sends every increment as its own UDP packet and tasks
+built fresh client objects on every run. get_metrics() returns one
+buffer per process that sums counters locally and sends everything
+as newline separated packets, when :ref:`STATSD_FLUSH_INTERVAL`
+seconds have passed and at the end of every task.
+
+Metric names are the same as the python-statsd clients produced,
+under app.statsd's prefix.
+"""
+import atexit
+import os
+import socket
+import time
+
+
+MAX_PACKET_SIZE = 512
+"""Bytes per UDP packet, small enough to never be fragmented."""
+
+
+class Stopwatch(object):
+    """
+    Stands in for statsd.Timer: start(), then stop() records name.total.
+    """
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.started = None
+
+    def start(self):
+        self.started = time.time()
+        return self
+
+    def stop(self, subname='total'):
+        if self.started is not None:
+            self.metrics.timing('%s.%s' % (self.name, subname), time.time() - self.started)
+            self.started = None
+
+
+class MetricsBuffer(object):
+    def __init__(self, prefix, host='127.0.0.1', port=8125, flush_interval=10):
+        self.prefix = prefix
+        self.address = (host, port)
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self._socket = None
+        self._reset()
+        self.last_flush = time.time()
+
+    def _reset(self):
+        self.counters = {}
+        self.gauges = {}
+        self.timings = []
+
+    def incr(self, name, delta=1):
+        self.counters[name] = self.counters.get(name, 0) + delta
+        self.maybe_flush()
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+        self.maybe_flush()
+
+    def timing(self, name, seconds):
+        self.timings.append((name, seconds * 1000))
+        self.maybe_flush()
+
+    def timer(self, name):
+        return Stopwatch(self, name)
+
+    def lines(self):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append('%s.%s:%d|c' % (self.prefix, name, value))
+        for name, value in sorted(self.gauges.items()):
+            lines.append('%s.%s:%s|g' % (self.prefix, name, value))
+        for name, ms in self.timings:
+            lines.append('%s.%s:%0.08f|ms' % (self.prefix, name, ms))
+        return lines
+
+    def packets(self):
+        """
+        The buffered lines packed into as few packets as fit.
+        """
+        packets, current = [], ''
+        for line in self.lines():
+            if current and len(current) + len(line) + 1 > MAX_PACKET_SIZE:
+                packets.append(current)
+                current = ''
+            current = line if not current else '%s\n%s' % (current, line)
+        if current:
+            packets.append(current)
+        return packets
+
+    def maybe_flush(self):
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        packets = self.packets()
+        self._reset()
+        self.last_flush = time.time()
+        if not packets:
+            return 0
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for packet in packets:
+            try:
+                self._socket.sendto(packet, self.address)
+            except socket.error:
+                pass
+        return len(packets)
+
+
+class ScopedMetrics(object):
+    """
+    Names relative to a prefix, always writing to this process's buffer.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _name(self, name):
+        return '%s.%s' % (self.name, name) if name else self.name
+
+    def incr(self, name=None, delta=1):
+        get_metrics().incr(self._name(name), delta)
+
+    def gauge(self, name, value):
+        get_metrics().gauge(self._name(name), value)
+
+    def timing(self, name, seconds):
+        get_metrics().timing(self._name(name), seconds)
+
+    def timer(self, name=None):
+        return Stopwatch(get_metrics(), self._name(name))
+
+    def scope(self, name):
+        return ScopedMetrics(self._name(name))
+
+
+_metrics = []
+
+
+def get_metrics():
+    """
+    This process's MetricsBuffer. Workers forked after it was made get their own.
+    """
+    if _metrics and _metrics[0].pid == os.getpid():
+        return _metrics[0]
+
+    from kardboard.app import app
+    statsd_conf = app.config.get('STATSD_CONF', {})
+    metrics = MetricsBuffer(
+        app.statsd.name,
+        host=statsd_conf.get('host', '127.0.0.1'),
+        port=statsd_conf.get('port', 8125),
+        flush_interval=app.config.get('STATSD_FLUSH_INTERVAL', 10),
+    )
+    _metrics[:] = [metrics]
+    return metrics
+
+
+def flush():
+    if _metrics and _metrics[0].pid == os.getpid():
+        _metrics[0].flush()
+
+
+def init_celery(app):
+    """
+    Flushes the buffer after every task.
+    """
+    from celery.signals import task_postrun
+
+    def flush_task_metrics(**kwargs):
+        flush()
+
+    task_postrun.connect(flush_task_metrics, weak=False)
+
+
+atexit.register(flush)
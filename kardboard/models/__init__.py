@@ -1,13 +1,22 @@
 from mongoengine.queryset import Q
 
 from kardboard.models.kard import Kard
+from kardboard.models.ticketpayload import TicketPayload, TicketMetadata
 from kardboard.models.dailyrecord import DailyRecord
+from kardboard.models.teamdailymetric import TeamDailyMetric
 from kardboard.models.person import Person
 from kardboard.models.reportgroup import ReportGroup
-from kardboard.models.states import States
+from kardboard.models.states import States, get_states
 from kardboard.models.boards import DisplayBoard
 from kardboard.models.personcardset import PersonCardSet
 from kardboard.models.flowreport import FlowReport
 from kardboard.models.statelog import StateLog
+from kardboard.models.archive import KardArchive, ArchiveUnion
+from kardboard.models.serviceclass import ServiceClass, get_service_classes
 from kardboard.models.serviceclassrecord import ServiceClassRecord, ServiceClassSnapshot
-from kardboard.models.team import Team, TeamList
\ No newline at end of file
+from kardboard.models.team import Team, TeamList
+from kardboard.models.leaderboard import LeaderboardRecord, LeaderboardPerson
+from kardboard.models.profilerun import ProfileRun
+from kardboard.models.taskrun import TaskRun
+from kardboard.models.atomic import Lease, find_and_upsert
+from kardboard.models.dirtyrange import DirtyRange
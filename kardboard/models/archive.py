@@ -0,0 +1,236 @@
+from dateutil.relativedelta import relativedelta
+from pymongo.errors import DuplicateKeyError
+
+from kardboard.app import app
+from kardboard.models.kard import Kard
+from kardboard.models.statelog import StateLog
+from kardboard.models.reportgroup import report_groups_for_team
+from kardboard.util import now, make_start_date
+
+
+ARCHIVE_SUFFIX = '_archive'
+
+
+def _archive_for(document):
+    return document._get_db()[document._meta['collection'] + ARCHIVE_SUFFIX]
+
+
+def _merge_group_rows(rows):
+    """
+    Merges $group results from the live and archive collections,
+    summing the numeric fields of rows that share an _id.
+    """
+    merged = {}
+    order = []
+    for row in rows:
+        key = repr(sorted(row['_id'].items())) if isinstance(row['_id'], dict) else repr(row['_id'])
+        if key not in merged:
+            merged[key] = dict(row)
+            order.append(key)
+            continue
+        existing = merged[key]
+        for field, value in row.items():
+            if field == '_id':
+                continue
+            if isinstance(value, (int, long, float)) and isinstance(existing.get(field), (int, long, float)):
+                existing[field] += value
+            elif isinstance(value, dict) and isinstance(existing.get(field), dict):
+                existing[field] = _merge_group_rows([existing[field], value])
+    return [merged[k] for k in order]
+
+
+class KardArchive(object):
+    """
+    Cold storage for cards, and their StateLogs, that were done
+    more than :ref:`ARCHIVE_DONE_AFTER_MONTHS` months ago.
+
+    Archived cards are never scheduled for ticket updates. Reports
+    that reach back past the cutoff read both collections, see
+    KardQuerySet.with_archive and KardArchive.aggregate.
+    """
+
+    @classmethod
+    def cards(klass):
+        return _archive_for(Kard)
+
+    @classmethod
+    def statelogs(klass):
+        return _archive_for(StateLog)
+
+    @classmethod
+    def cutoff(klass, months=None):
+        if months is None:
+            months = app.config.get('ARCHIVE_DONE_AFTER_MONTHS', None)
+        if not months:
+            return None
+        return make_start_date(date=now() - relativedelta(months=months))
+
+    @classmethod
+    def ensure_indexes(klass):
+        cards = klass.cards()
+        cards.ensure_index('key', unique=True)
+        cards.ensure_index([('team', 1), ('done_date', 1)])
+        cards.ensure_index([('report_groups', 1), ('done_date', 1)])
+        cards.ensure_index('done_date')
+        klass.statelogs().ensure_index('card')
+
+    @classmethod
+    def archive(klass, months=None, batch_size=500):
+        """
+        Moves cards done before the cutoff, and their StateLogs, into
+        the archive collections. Each card is copied before it's
+        removed, so an interrupted run is safe to repeat.
+        """
+        cutoff = klass.cutoff(months)
+        if cutoff is None:
+            return 0
+
+        klass.ensure_indexes()
+        live_cards = Kard._get_collection()
+        live_logs = StateLog._get_collection()
+        archived_cards = klass.cards()
+        archived_logs = klass.statelogs()
+
+        moved = 0
+        query = {'done_date': {'$lt': cutoff}}
+        while True:
+            docs = list(live_cards.find(query).limit(batch_size))
+            if not docs:
+                break
+            for doc in docs:
+                try:
+                    archived_cards.save(doc, safe=True)
+                except DuplicateKeyError:
+                    # The key was archived before and then recreated,
+                    # the newer card replaces the older one
+                    klass._remove(archived_cards.find_one({'key': doc['key']}, fields=['_id']))
+                    archived_cards.save(doc, safe=True)
+                for log in live_logs.find({'card': doc['_id']}):
+                    archived_logs.save(log)
+                live_logs.remove({'card': doc['_id']})
+                live_cards.remove({'_id': doc['_id']})
+                moved += 1
+        return moved
+
+    @classmethod
+    def _remove(klass, doc):
+        if doc is None:
+            return
+        klass.statelogs().remove({'card': doc['_id']})
+        klass.cards().remove({'_id': doc['_id']})
+
+    @classmethod
+    def sync_report_groups(klass):
+        """
+        Archived counterpart of Kard.sync_report_groups.
+        """
+        cards = klass.cards()
+        for team in cards.distinct('team'):
+            cards.update(
+                {'team': team},
+                {'$set': {'report_groups': report_groups_for_team(team)}},
+                multi=True,
+            )
+
+    @classmethod
+    def restore(klass, key):
+        """
+        Moves an archived card, and its StateLogs, back to the live
+        collections. Returns the card or None if it isn't archived.
+        """
+        doc = klass.cards().find_one({'key': Kard.normalize_key(key)})
+        if doc is None:
+            return None
+
+        Kard._get_collection().save(doc)
+        for log in klass.statelogs().find({'card': doc['_id']}):
+            StateLog._get_collection().save(log)
+        klass.statelogs().remove({'card': doc['_id']})
+        klass.cards().remove({'_id': doc['_id']})
+        return Kard.objects.with_id(doc['_id'])
+
+    @classmethod
+    def get(klass, key):
+        """
+        A read only Kard for the archived card with key, or None.
+        """
+        doc = klass.cards().find_one({'key': Kard.normalize_key(key)})
+        if doc is None:
+            return None
+        return Kard._from_son(doc)
+
+    @classmethod
+    def exists(klass, key):
+        return klass.cards().find_one(
+            {'key': Kard.normalize_key(key)}, fields=['_id']) is not None
+
+    @classmethod
+    def statelogs_for(klass, card):
+        """
+        Read only StateLogs of an archived card, newest first.
+        """
+        logs = klass.statelogs().find({'card': card.id}).sort('created_at', -1)
+        return [StateLog._from_son(doc) for doc in logs]
+
+    @classmethod
+    def find(klass, query, fields=None):
+        """
+        Raw archived card documents matching a compiled Kard query.
+        """
+        return klass.cards().find(query, fields=fields)
+
+    @classmethod
+    def kards(klass, query):
+        """
+        Read only Kard instances for archived cards matching a compiled Kard query.
+        """
+        return [Kard._from_son(doc) for doc in klass.find(query)]
+
+    @classmethod
+    def aggregate(klass, pipeline):
+        """
+        Runs a Kard pipeline ending in a $group over the live and
+        archive collections and merges the results.
+        """
+        rows = Kard._get_collection().aggregate(pipeline).get('result', [])
+        archived = klass.cards().aggregate(pipeline).get('result', [])
+        if not archived:
+            return rows
+        return _merge_group_rows(rows + archived)
+
+
+class ArchiveUnion(object):
+    """
+    A read only view of a Kard queryset plus the same query against
+    the archive, for reports over ranges that may predate the cutoff.
+    """
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def filter(self, *args, **kwargs):
+        return ArchiveUnion(self.queryset.clone().filter(*args, **kwargs))
+
+    def order_by(self, *keys):
+        return ArchiveUnion(self.queryset.clone().order_by(*keys))
+
+    def count(self):
+        return self.queryset.clone().count() + \
+            KardArchive.find(self.queryset._query).count()
+
+    def __len__(self):
+        return self.count()
+
+    def _sort(self, cards):
+        ordering = getattr(self.queryset, '_ordering', None) or []
+        reverse_map = getattr(Kard, '_reverse_db_field_map', {})
+        for key, direction in reversed(ordering):
+            attr = reverse_map.get(key, key)
+            cards.sort(key=lambda c: getattr(c, attr, None), reverse=direction < 0)
+        return cards
+
+    def __iter__(self):
+        cards = list(self.queryset.clone())
+        archived = KardArchive.kards(self.queryset._query)
+        if archived:
+            cards = self._sort(cards + archived)
+        return iter(cards)
@@ -0,0 +1,96 @@
+import contextlib
+import datetime
+import os
+import socket
+import uuid
+
+from pymongo.errors import OperationFailure
+
+from kardboard.app import app
+
+
+def find_and_upsert(klass, query, **values):
+    """
+    Sets values on the klass document matching query, creating it if
+    there isn't one, with a single find_and_modify. Returns the
+    document as it is after the update.
+
+    Unlike get-or-construct-then-save, two writers can't both insert
+    and trip a unique_with index.
+    """
+    son = klass(**dict(query, **values)).to_mongo()
+    son.pop('_id', None)
+    spec = dict([(klass._fields[name].db_field, son[klass._fields[name].db_field])
+        for name in query.keys()])
+
+    doc = klass._get_collection().find_and_modify(
+        query=spec,
+        update={'$set': son},
+        upsert=True,
+        new=True,
+    )
+    return klass._from_son(doc)
+
+
+class Lease(app.db.Document):
+    """
+    A short lived, named claim on a piece of work, so only one worker
+    at a time does it. Expired leases are simply taken over.
+    """
+
+    key = app.db.StringField(primary_key=True)
+
+    holder = app.db.StringField(required=True)
+    """The host, process and a random token of whoever holds the lease."""
+
+    expires_at = app.db.DateTimeField(required=True)
+
+    meta = {
+        'collection': 'lease',
+        'allow_inheritance': False,
+    }
+
+    @classmethod
+    def acquire(klass, key, seconds=None):
+        """
+        Returns a holder token if the lease was free or expired, None
+        if someone else holds it.
+        """
+        if seconds is None:
+            seconds = app.config.get('REPORT_LEASE_SECONDS', 60)
+        holder = "%s:%s:%s" % (socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+        now = datetime.datetime.now()
+        try:
+            klass._get_collection().find_and_modify(
+                query={'_id': key, 'expires_at': {'$lt': now}},
+                update={'$set': {
+                    'holder': holder,
+                    'expires_at': now + datetime.timedelta(seconds=seconds),
+                }},
+                upsert=True,
+            )
+        except OperationFailure, e:
+            # The lease exists and hasn't expired, so the upsert
+            # tried to insert a second document with its key.
+            if getattr(e, 'code', None) == 11000 or 'E11000' in str(e):
+                return None
+            raise
+        return holder
+
+    @classmethod
+    def release(klass, key, holder):
+        klass._get_collection().remove({'_id': key, 'holder': holder})
+
+
+@contextlib.contextmanager
+def leased(key, seconds=None):
+    """
+    Holds the lease for key inside the block, yielding False
+    without waiting if someone else has it.
+    """
+    holder = Lease.acquire(key, seconds)
+    try:
+        yield holder is not None
+    finally:
+        if holder is not None:
+            Lease.release(key, holder)
@@ -2,8 +2,7 @@ from dateutil.relativedelta import relativedelta
 
 from mongoengine.queryset import Q
 
-from kardboard.app import app
-from kardboard.models.states import States
+from kardboard.models.states import get_states
 from kardboard.models.kard import Kard
 from kardboard.util import (
     now,
@@ -13,15 +12,16 @@ from kardboard.util import (
 
 class DisplayBoard(object):
     def __init__(self, teams=None, done_days=7, backlog_limit=None):
-        self.states = States()
+        self.states = get_states()
         self.done_days = done_days
         self._cards = None
+        self.today = now()
         self._rows = []
         self.backlog_limit = backlog_limit
 
         from kardboard.services import teams as teams_service
         if teams is None:
-            teams = teams_service.setup_teams(app.config).names
+            teams = teams_service.get_teams().names
         self.teams = teams
 
     def __iter__(self):
@@ -68,7 +68,7 @@ class DisplayBoard(object):
                     non_pri.reverse()
                     cards = pri_cards + non_pri
                 elif state in self.states.in_progress:
-                    cards = sorted(cards, key=lambda c: c.current_cycle_time())
+                    cards = sorted(cards, key=lambda c: c.current_cycle_time(self.today))
                     cards.reverse()
                 else:
                     try:
@@ -84,11 +84,11 @@ class DisplayBoard(object):
         self._rows = rows
         return self._rows
 
-    @property
-    def cards(self):
-        if self._cards:
-            return self._cards
-
+    def card_querysets(self):
+        """
+        The querysets behind cards, by name. The board sorts each
+        cell itself, so only the limited backlog queries are ordered.
+        """
         in_progress_q = Q(
             state__in=self.states.in_progress,
             team__in=self.teams)
@@ -103,24 +103,39 @@ class DisplayBoard(object):
         total_backlog_q = Q(
             state=self.states.backlog,
             team__in=self.teams)
-        done_q = Q(done_date__gte=now() - relativedelta(days=self.done_days),
+        done_q = Q(done_date__gte=self.today - relativedelta(days=self.done_days),
             team__in=self.teams)
         if self.backlog_limit:
-            ordered_backlog_cards = Kard.objects.filter(ordered_backlog_q).order_by('priority', 'created_at')
-            ordered_backlog_cards = ordered_backlog_cards.limit(self.backlog_limit).exclude('_ticket_system_data')
+            return {
+                'ordered_backlog': Kard.objects.filter(ordered_backlog_q).order_by(
+                    'priority', 'created_at').limit(self.backlog_limit),
+                'unordered_backlog': Kard.objects.filter(unordered_backlog_q).order_by(
+                    'created_at').limit(self.backlog_limit),
+                'cards': Kard.objects.filter(in_progress_q | done_q).unordered(),
+            }
+        return {
+            'cards': Kard.objects.filter(total_backlog_q | in_progress_q | done_q).unordered(),
+        }
+
+    @property
+    def cards(self):
+        if self._cards:
+            return self._cards
+
+        querysets = self.card_querysets()
+        if self.backlog_limit:
+            ordered_backlog_cards = querysets['ordered_backlog']
             unordered_backlog_cards = []
             if len(ordered_backlog_cards) < self.backlog_limit:
-                unordered_backlog_cards = Kard.objects.filter(unordered_backlog_q).order_by('created_at')
-                unordered_backlog_cards = unordered_backlog_cards.limit(self.backlog_limit).exclude('_ticket_system_data')
+                unordered_backlog_cards = querysets['unordered_backlog']
 
             backlog_cards = list(ordered_backlog_cards) + list(unordered_backlog_cards)
             backlog_cards = backlog_cards[:self.backlog_limit]
 
-            cards_query = in_progress_q | done_q
-            cards = list(Kard.objects.filter(cards_query).exclude('_ticket_system_data'))
+            cards = list(querysets['cards'])
             self._cards = backlog_cards + cards
         else:
-            cards_query = total_backlog_q | in_progress_q | done_q
-            self._cards = list(Kard.objects.filter(cards_query).exclude('_ticket_system_data'))
+            self._cards = list(querysets['cards'])
 
+        Kard.evaluate_goals(self._cards, self.today)
         return self._cards
@@ -1,8 +1,10 @@
 import datetime
 
 from kardboard.app import app
+from kardboard.models.atomic import find_and_upsert, leased
 from kardboard.models.kard import Kard
 from kardboard.models.reportgroup import ReportGroup
+from kardboard.models.teamdailymetric import TeamDailyMetric
 from kardboard.util import make_end_date
 
 class DailyRecord(app.db.Document):
@@ -52,27 +54,49 @@ class DailyRecord(app.db.Document):
         return self.in_progress + self.done
 
     @classmethod
-    def calculate(klass, date, group='all'):
+    def calculate(klass, date, group='all', capture=True):
         """
         Creates or updates a DailyRecord for the date provided.
+
+        The numbers are rolled up from the group's TeamDailyMetric rows.
+        If capture is True those rows are recalculated first, pass False
+        when they were just captured for another group.
+
+        Only one worker calculates a date and group at a time, the others
+        return the record as it stands (or None if there isn't one yet).
+        """
+        record = klass.recalculate(date, group=group, capture=capture)
+        if record is None:
+            record = klass.objects(date=make_end_date(date=date), group=group).first()
+        return record
+
+    @classmethod
+    def recalculate(klass, date, group='all', capture=True):
+        """
+        Like calculate, but returns None without touching the record
+        when another worker is calculating the date and group.
         """
 
         date = make_end_date(date=date)
 
-        try:
-            k = klass.objects.get(date=date, group=group)
-        except klass.DoesNotExist:
-            k = klass()
-            k.date = date
-            k.group = group
-
-        k.backlog = ReportGroup(group, Kard.backlogged(date)).queryset.count()
-        k.in_progress = ReportGroup(group, Kard.in_progress(date)).queryset.count()
-        k.done = ReportGroup(group, Kard.objects.filter(done_date__lte=date)).queryset.count()
-        k.completed = ReportGroup(group, Kard.objects.filter(done_date=date)).queryset.count()
-        k.moving_cycle_time = ReportGroup(group, Kard.objects).queryset.moving_cycle_time(
-            year=date.year, month=date.month, day=date.day)
-        k.moving_lead_time = ReportGroup(group, Kard.objects).queryset.moving_lead_time(
-            year=date.year, month=date.month, day=date.day)
-
-        k.save()
\ No newline at end of file
+        with leased('DailyRecord:%s:%s' % (date.strftime('%Y-%m-%d'), group)) as held:
+            if not held:
+                return None
+
+            if capture:
+                TeamDailyMetric.capture(date)
+
+            teams = ReportGroup(group, Kard.objects).teams
+            metrics = TeamDailyMetric.rollup(date, teams)
+
+            return find_and_upsert(
+                klass,
+                {'date': date, 'group': group},
+                backlog=metrics['backlog'],
+                in_progress=metrics['in_progress'],
+                done=metrics['done'],
+                completed=metrics['completed'],
+                moving_cycle_time=metrics['moving_cycle_time'],
+                moving_lead_time=metrics['moving_lead_time'],
+                updated_at=datetime.datetime.now(),
+            )
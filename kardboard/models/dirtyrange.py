@@ -0,0 +1,187 @@
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from mongoengine import signals
+
+from kardboard.app import app
+from kardboard.models.kard import Kard
+from kardboard.models.reportgroup import report_groups_for_team
+from kardboard.models.teamdailymetric import MOVING_WEEKS
+from kardboard.util import now, make_start_date, make_end_date
+
+DATE_FIELDS = ('backlog_date', 'start_date', 'done_date')
+TRACKED_FIELDS = set(('team', ) + DATE_FIELDS)
+
+
+def _card_dates(card):
+    values = dict([(f, getattr(card, f)) for f in DATE_FIELDS])
+    values['team'] = card.team
+    return values
+
+
+def _footprint(card, today):
+    dates = [card[f] for f in DATE_FIELDS if card.get(f)]
+    if not dates:
+        return None
+    return min(dates), today
+
+
+def affected(before, after, today=None):
+    """
+    The report groups and (start, end) dates whose DailyRecords change
+    when a card goes from before to after, or None if none do. Each is
+    a dict of the card's team and dates, None for a card being created
+    or deleted.
+    """
+    today = today or now()
+    window = relativedelta(weeks=MOVING_WEEKS)
+
+    spans = []
+    if before is None or after is None or before['team'] != after['team']:
+        # Done cards count towards every day after they're done,
+        # so the whole life of the card up to today changes
+        spans = [_footprint(c, today) for c in (before, after) if c]
+    else:
+        for f in DATE_FIELDS:
+            old, new = before.get(f), after.get(f)
+            if old == new:
+                continue
+            changed = [d for d in (old, new) if d]
+            end = today if None in (old, new) else max(changed)
+            if f == 'done_date':
+                end += window
+            spans.append((min(changed), end))
+        if spans and after.get('done_date'):
+            # The card's cycle and lead times feed the moving averages
+            spans.append((after['done_date'], after['done_date'] + window))
+
+    spans = [s for s in spans if s]
+    if not spans:
+        return None
+
+    groups = set(['all'])
+    for card in (before, after):
+        if card:
+            groups.update(report_groups_for_team(card['team']))
+    start = min([s[0] for s in spans])
+    end = min(max([s[1] for s in spans]), today)
+    return groups, start, end
+
+
+class DirtyRange(app.db.Document):
+    """
+    Dates of a report group whose DailyRecords are out of date
+    because a card was changed, added or deleted.
+    """
+
+    group = app.db.StringField(required=True)
+    start_date = app.db.DateTimeField(required=True)
+    end_date = app.db.DateTimeField(required=True)
+
+    created_at = app.db.DateTimeField(required=True)
+
+    meta = {
+        'collection': 'dirty_range',
+        'allow_inheritance': False,
+    }
+
+    @classmethod
+    def mark(klass, before, after, today=None):
+        found = affected(before, after, today)
+        if found is None:
+            return []
+        groups, start, end = found
+        ranges = [klass(
+            group=group,
+            start_date=make_start_date(date=start),
+            end_date=make_end_date(date=end),
+            created_at=datetime.datetime.now(),
+        ) for group in sorted(groups)]
+        klass.objects.insert(ranges, load_bulk=False)
+        return ranges
+
+    @classmethod
+    def collect(klass, since=None):
+        """
+        The ids of the current ranges and a dict of the dates (on or
+        after since) they cover to the set of groups dirty on that date.
+        """
+        ranges = list(klass.objects.all())
+        dates = {}
+        for r in ranges:
+            day = r.start_date
+            if since is not None:
+                day = max(day, make_start_date(date=since))
+            while day <= r.end_date:
+                dates.setdefault(make_end_date(date=day), set()).add(r.group)
+                day += relativedelta(days=1)
+        return [r.id for r in ranges], dates
+
+    @classmethod
+    def requeue(klass, dates):
+        """
+        Marks the groups of a dict of dates, like the one collect
+        returns, dirty again. Consecutive dates share a range.
+        """
+        days_by_group = {}
+        for day, groups in dates.items():
+            for group in groups:
+                days_by_group.setdefault(group, []).append(make_start_date(date=day))
+
+        ranges = []
+        for group in sorted(days_by_group):
+            days = sorted(days_by_group[group])
+            start = end = days[0]
+            for day in days[1:] + [None]:
+                if day is not None and (day - end).days <= 1:
+                    end = day
+                    continue
+                ranges.append(klass(
+                    group=group,
+                    start_date=start,
+                    end_date=make_end_date(date=end),
+                    created_at=datetime.datetime.now(),
+                ))
+                start = end = day
+        if ranges:
+            klass.objects.insert(ranges, load_bulk=False)
+        return ranges
+
+    @classmethod
+    def clear(klass, ids):
+        if ids:
+            klass.objects(id__in=ids).delete()
+
+    @classmethod
+    def kard_post_init(klass, sender, document, **kwargs):
+        # What the card looked like when it was loaded, so a save can
+        # tell what changed without reading it back from the DB
+        if document.id is not None:
+            document._dates_loaded = _card_dates(document)
+
+    @classmethod
+    def kard_pre_save(klass, sender, document, **kwargs):
+        before = getattr(document, '_dates_loaded', None)
+        if document.id is None:
+            before = None
+        elif before is not None and not set(document._changed_fields) & TRACKED_FIELDS:
+            # Nothing the reports count has changed
+            before = False
+        document._dates_before = before
+
+    @classmethod
+    def kard_post_save(klass, sender, document, **kwargs):
+        before = getattr(document, '_dates_before', None)
+        after = _card_dates(document)
+        if before is not False:
+            klass.mark(before, after)
+        document._dates_loaded = after
+
+    @classmethod
+    def kard_pre_delete(klass, sender, document, **kwargs):
+        klass.mark(_card_dates(document), None)
+
+signals.post_init.connect(DirtyRange.kard_post_init, sender=Kard)
+signals.pre_save.connect(DirtyRange.kard_pre_save, sender=Kard)
+signals.post_save.connect(DirtyRange.kard_post_save, sender=Kard)
+signals.pre_delete.connect(DirtyRange.kard_pre_delete, sender=Kard)
@@ -1,9 +1,11 @@
 import datetime
 
 from kardboard.app import app
-from kardboard.models.states import States
+from kardboard.models.states import get_states
 from kardboard.models.reportgroup import ReportGroup
+from kardboard.models.atomic import find_and_upsert, leased
 from kardboard.models.kard import Kard
+from kardboard.models.teamdailymetric import TeamDailyMetric
 from kardboard.util import (
     make_end_date,
 )
@@ -40,24 +42,35 @@ class FlowReport(app.db.Document):
         return "<FlowReport: %s -- %s>" % (self.group, self.date)
 
     @classmethod
-    def capture(klass, group='all'):
+    def capture(klass, group='all', capture=True):
+        """
+        Creates or updates today's FlowReport for the group, rolled up
+        from today's TeamDailyMetric rows. If capture is True those rows
+        are recalculated first, pass False when they were just captured.
+        """
         date = datetime.datetime.now()
         date = make_end_date(date=date)
-        try:
-            r = klass.objects.get(date=date, group=group)
-        except klass.DoesNotExist:
-            r = klass()
-            r.date = date
-            r.group = group
 
-        states = States()
+        with leased('FlowReport:%s:%s' % (date.strftime('%Y-%m-%d'), group)) as held:
+            if not held:
+                return klass.objects(date=date, group=group).first()
 
-        for state in states:
-            group_cards = ReportGroup(group, Kard.objects.filter(state=state)).queryset
-            r.state_counts[state] = group_cards.count()
+            if capture:
+                TeamDailyMetric.capture(date)
 
-            non_defects = [c for c in group_cards.only('_type') if c.is_card]
-            r.state_card_counts[state] = len(non_defects)
+            teams = ReportGroup(group, Kard.objects).teams
+            metrics = TeamDailyMetric.rollup(date, teams)
 
-        r.save()
-        return r
+            states = get_states()
+            state_counts, state_card_counts = {}, {}
+            for state in states:
+                state_counts[state] = metrics['state_counts'].get(state, 0)
+                state_card_counts[state] = metrics['state_card_counts'].get(state, 0)
+
+            return find_and_upsert(
+                klass,
+                {'date': date, 'group': group},
+                state_counts=state_counts,
+                state_card_counts=state_card_counts,
+                updated_at=datetime.datetime.now(),
+            )
@@ -1,4 +1,3 @@
-import importlib
 import datetime
 import math
 
@@ -10,7 +9,10 @@ from mongoengine.queryset import Q
 from flask.ext.mongoengine import QuerySet
 
 from kardboard.models.blocker import BlockerRecord
-from kardboard.models.states import States
+from kardboard.models.reportgroup import report_groups_for_team
+from kardboard.models.serviceclass import get_service_classes
+from kardboard.models.ticketpayload import TicketPayload
+from kardboard.models.states import get_states
 from kardboard.services import ticketdatasync
 from kardboard.util import (
     now,
@@ -21,9 +23,52 @@ from kardboard.util import (
     month_range,
     week_range,
     average,
+    get_ticket_helper_class,
 )
 
 class KardQuerySet(QuerySet):
+    _unordered = False
+
+    def unordered(self):
+        """
+        Skips Kard's default ordering, for analytics and tasks
+        that don't care what order the cards come back in.
+        An explicit order_by afterwards still applies.
+        """
+        self._unordered = True
+        self._ordering = []
+        return self
+
+    def order_by(self, *keys):
+        if keys:
+            self._unordered = False
+        return super(KardQuerySet, self).order_by(*keys)
+
+    def clone(self):
+        c = super(KardQuerySet, self).clone()
+        c._unordered = self._unordered
+        return c
+
+    @property
+    def _cursor(self):
+        if not self._unordered or self._cursor_obj is not None:
+            return super(KardQuerySet, self)._cursor
+
+        # Built here because the base queryset falls back to
+        # meta['ordering'] when there's no explicit ordering,
+        # and pymongo won't take an empty sort to undo it
+        cursor = self._collection.find(self._query, **self._cursor_args)
+        if self._where_clause:
+            cursor.where(self._where_clause)
+        if self._limit is not None:
+            cursor.limit(self._limit - (self._skip or 0))
+        if self._skip is not None:
+            cursor.skip(self._skip)
+        if self._hint != -1:
+            cursor.hint(self._hint)
+        self._cursor_obj = cursor
+        return cursor
+
     def done_in_week(self, year=None, month=None, day=None, date=None):
         """
         Kards that were completed in the week of the specified day.
@@ -39,8 +84,16 @@ class KardQuerySet(QuerySet):
         )
         return results
 
+    def with_archive(self):
+        """
+        A read only union of this query and the same query against
+        archived cards, for reports that reach back past the cutoff.
+        """
+        from kardboard.models.archive import ArchiveUnion
+        return ArchiveUnion(self)
+
     def average(self, field_str):
-        values = [getattr(k, field_str) for k in self.filter().only(field_str)]
+        values = [getattr(k, field_str) for k in self.filter().unordered().only(field_str)]
         if len(values) == 0:
             return 0
         return average(values)
@@ -117,6 +170,10 @@ class Kard(app.db.Document):
     Represents a card on a Kanban board.
     """
     _ticket_system = None
+    _resolved_service_class = None
+    _goal_status = None
+    _ticket_payload = None
+    _ticket_payload_dirty = False
 
     key = app.db.StringField(required=True, unique=True)
     """A unique string that matches a Kard up to a ticket in a parent system."""
@@ -136,6 +193,9 @@ class Kard(app.db.Document):
     team = app.db.StringField(required=True, default="")
     """A selection from a user supplied list of teams/assignees. See :ref:`CARD_TEAMS`"""
 
+    report_groups = app.db.ListField(app.db.StringField())
+    """The slugs of the :ref:`REPORT_GROUPS` that include the card's team, kept up to date on save."""
+
     state = app.db.StringField(required=True, default="Unknown")
     """Which column on the kanban board the card is in."""
     priority = app.db.IntField(required=False)
@@ -160,14 +220,22 @@ class Kard(app.db.Document):
     _version = app.db.StringField(required=False, db_field="version")
 
     _ticket_system_updated_at = app.db.DateTimeField()
-    _ticket_system_data = app.db.DictField()
+
+    _reporter = app.db.StringField(db_field="reporter")
+    _developers = app.db.ListField(app.db.StringField(), db_field="developers")
+    _testers = app.db.ListField(app.db.StringField(), db_field="testers")
+    _ticket_updated = app.db.DateTimeField(db_field="ticket_updated")
+    _ticket_status = app.db.DictField(db_field="ticket_status")
+    """Denormalised from the ticket data, which is stored in :class:`TicketPayload`."""
 
     meta = {
         'queryset_class': KardQuerySet,
         'collection': 'kard',
         'ordering': ['-due_date', '+priority', '-backlog_date'],
         'auto_create_index': True,
-        'indexes': [('state', 'team'), ('team', 'done_date'), 'team', '_type', '_service_class', '_cycle_time', '_lead_time', 'due_date'],
+        'indexes': [('state', 'team'), ('team', 'done_date'), 'team', ('report_groups', 'done_date'), '_type', '_service_class', '_cycle_time', '_lead_time', 'due_date', '_developers',
+            ('-due_date', '+priority', '-backlog_date'), ('done_date', 'start_date'), ('start_date', 'backlog_date'),
+            ('team', 'state', 'priority'), '_ticket_system_updated_at'],
     }
 
     EXPORT_FIELDNAMES = (
@@ -179,23 +247,24 @@ class Kard(app.db.Document):
         'state',
     )
 
+    @staticmethod
+    def normalize_key(key):
+        """
+        Keys are stored stripped and upper cased, lookups
+        should run the key through this first.
+        """
+        return key.strip().upper()
+
     @property
     def service_class(self):
-        if self._service_class:
-            classdef = app.config.get('SERVICE_CLASSES', {}).get(
-                self._service_class, {})
-        else:
-            classdef = app.config.get('SERVICE_CLASSES', {}).get(
-                'default', {})
-
-        service_class = {
-            'name': classdef.get('name', None),
-            'upper': classdef.get('upper', None),
-            'lower': classdef.get('lower', None),
-            'wip': classdef.get('wip', None),
-        }
-        return service_class
-
+        """
+        The shared :class:`ServiceClass` the card is in, see :ref:`SERVICE_CLASSES`.
+        """
+        resolved = self._resolved_service_class
+        if resolved is not None and resolved.slug == (self._service_class or 'default'):
+            # Pinned by evaluate_goals for the length of a render
+            return resolved
+        return get_service_classes().find(self._service_class)
 
     def _convert_dates_to_datetimes(self, date):
         if not date:
@@ -264,7 +333,7 @@ class Kard(app.db.Document):
     def _auto_state_changes(self):
         # Auto move to done
         if self.done_date:
-            states = States()
+            states = get_states()
             self.in_progress = False
             self.state = states.done
 
@@ -286,22 +355,71 @@ class Kard(app.db.Document):
 
         self._set_cycle_lead_times()
 
-        self._type = self.ticket_system.type or app.config.get('DEFAULT_TYPE', '')
-        if self._type:
-            self._type = self._type.strip()
-        self._version = self.ticket_system.get_version()
-        self._assignee = self.ticket_system_data.get('assignee', '')
-        self.title = self.ticket_system_data.get('summary', '')
-        self.key = self.key.upper()
-        ticket_class = self.ticket_system_data.get('service_class', None)
-        if ticket_class:
-            self._service_class = ticket_class
-
-        ticketdatasync.set_due_date_from_ticket(self, self.ticket_system_data)
+        self.key = self.normalize_key(self.key)
+        if self.id is None or self._ticket_payload_dirty:
+            # The denormalised fields only change with the payload,
+            # don't load and decompress it on every save
+            self._type = self.ticket_system.type or app.config.get('DEFAULT_TYPE', '')
+            if self._type:
+                self._type = self._type.strip()
+            self._version = self.ticket_system.get_version()
+            ticket_data = self.ticket_system_data
+            for name, value in self.denormalize_ticket_data(ticket_data).items():
+                setattr(self, name, value)
+            ticket_class = ticket_data.get('service_class', None)
+            if ticket_class:
+                self._service_class = ticket_class
+
+            ticketdatasync.set_due_date_from_ticket(self, ticket_data)
+        self.report_groups = report_groups_for_team(self.team)
 
         self._auto_state_changes()
         super(Kard, self).save(*args, **kwargs)
 
+        if self._ticket_payload_dirty:
+            TicketPayload.store(self.id, self._ticket_payload)
+            self._ticket_payload_dirty = False
+
+    def delete(self, *args, **kwargs):
+        card_id = self.id
+        super(Kard, self).delete(*args, **kwargs)
+        TicketPayload.remove(card_id)
+
+    def reload(self, *args, **kwargs):
+        super(Kard, self).reload(*args, **kwargs)
+        self._ticket_payload = None
+        self._ticket_payload_dirty = False
+
+    @staticmethod
+    def denormalize_ticket_data(data):
+        """
+        The Kard fields kardboard reads often, pulled out of a
+        ticket payload so they can be queried without it.
+        """
+        status = data.get('status') or {}
+        return {
+            '_assignee': data.get('assignee', ''),
+            'title': data.get('summary', ''),
+            '_reporter': data.get('reporter', ''),
+            '_developers': list(data.get('developers') or []),
+            '_testers': list(data.get('testers') or data.get('qaers') or []),
+            '_ticket_updated': data.get('updated', None),
+            '_ticket_status': {
+                'name': status.get('name', ''),
+                'icon': status.get('icon', ''),
+            },
+        }
+
+    @classmethod
+    def sync_report_groups(cls):
+        """
+        Rewrites report_groups on every card, one update per team.
+        Run after changing :ref:`REPORT_GROUPS`.
+        """
+        for team in cls.objects.distinct('team'):
+            cls.objects(team=team).update(
+                set__report_groups=report_groups_for_team(team))
+
     @classmethod
     def update_flow_records(cls):
         if app.config.get('UPDATE_FLOW_ON_SAVE', False):
@@ -340,8 +458,8 @@ class Kard(app.db.Document):
         query_a = Q(done_date=None) & Q(start_date__lte=date)
         query_b = Q(done_date__gt=date) & Q(start_date__lte=date)
 
-        results_a = list(klass.objects.filter(query_a))
-        results_b = list(klass.objects.filter(query_b))
+        results_a = list(klass.objects.filter(query_a).unordered().only('id'))
+        results_b = list(klass.objects.filter(query_b).unordered().only('id'))
 
         all_ids = [c.id for c in results_a]
         all_ids = set(all_ids)
@@ -378,8 +496,8 @@ class Kard(app.db.Document):
         query_b = Q(start_date__gt=date) & \
             Q(backlog_date__lte=date)
 
-        results_a = list(klass.objects.filter(query_a))
-        results_b = list(klass.objects.filter(query_b))
+        results_a = list(klass.objects.filter(query_a).unordered().only('id'))
+        results_b = list(klass.objects.filter(query_b).unordered().only('id'))
 
         all_ids = [c.id for c in results_a]
         all_ids = set(all_ids)
@@ -435,12 +553,7 @@ class Kard(app.db.Document):
 
     @property
     def cycle_goal(self):
-        classdef = self.service_class
-        lower = classdef.get('lower')
-        upper = classdef.get('upper')
-        if lower is not None and upper is not None:
-            return lower, upper
-        return None
+        return self.service_class.goal
 
     @property
     def cycle_in_goal(self):
@@ -463,24 +576,39 @@ class Kard(app.db.Document):
 
     @property
     def cycle_vs_goal(self):
-        if not self.cycle_goal:
+        if self._goal_status is not None:
+            return self._goal_status
+        return self.cycle_vs_goal_at()
+
+    def cycle_vs_goal_at(self, today=None):
+        """
+        Where the card's cycle time falls against its service class
+        goal, as of today for cards that aren't done yet.
+        """
+        service_class = self.service_class
+        if not service_class.goal:
             return 0
 
-        lower, upper = self.cycle_goal
-        super_upper = upper * 2
         if self.done_date:
             current = self.cycle_time
         else:
-            current = self.current_cycle_time()
+            current = self.current_cycle_time(today)
+        return service_class.vs_goal(current)
 
-        if current < lower:
-            return -1
-        elif current >= lower and current <= upper:
-            return 0
-        elif current >= super_upper:
-            return 2
-        elif current >= upper:
-            return 1
+    @classmethod
+    def evaluate_goals(klass, cards, today=None):
+        """
+        Resolves the service class and goal status of every card
+        against one reference time, so rendering a board doesn't
+        redo it per card and per template lookup.
+        """
+        if today is None:
+            today = now()
+        service_classes = get_service_classes()
+        for card in cards:
+            card._resolved_service_class = service_classes.find(card._service_class)
+            card._goal_status = card.cycle_vs_goal_at(today)
+        return cards
 
     def __unicode__(self):
         backlog, start, done = self.backlog_date, self.start_date, \
@@ -506,16 +634,23 @@ class Kard(app.db.Document):
         if self._ticket_system:
             return self._ticket_system
 
-        helper_setting = app.config['TICKET_HELPER']
-        modname = '.'.join(helper_setting.split('.')[:-1])
-        klassnam = helper_setting.split('.')[-1]
-        mod = importlib.import_module(modname)
-        klass = getattr(mod, klassnam)
-
+        klass = get_ticket_helper_class(app.config)
         helper = klass(app.config, self)
         self._ticket_system = helper
         return helper
 
+    def _get_ticket_system_data(self):
+        if self._ticket_payload is None:
+            # Loaded on first access, see TicketPayload
+            self._ticket_payload = TicketPayload.load(self.id)
+        return self._ticket_payload
+
+    def _set_ticket_system_data(self, data):
+        self._ticket_payload = data or {}
+        self._ticket_payload_dirty = True
+
+    _ticket_system_data = property(_get_ticket_system_data, _set_ticket_system_data)
+
     @property
     def ticket_system_data(self):
         """
@@ -528,6 +663,22 @@ class Kard(app.db.Document):
         else:
             return self._ticket_system_data
 
+    @property
+    def ticket_status(self):
+        return self._ticket_status or {}
+
     @property
     def assignee(self):
         return self._assignee
+
+    @property
+    def reporter(self):
+        return self._reporter
+
+    @property
+    def developers(self):
+        return self._developers or []
+
+    @property
+    def testers(self):
+        return self._testers or []
@@ -0,0 +1,170 @@
+import datetime
+
+from kardboard.app import app
+from kardboard.models.kard import Kard
+from kardboard.models.archive import KardArchive
+from kardboard.models.reportgroup import ReportGroup
+from kardboard.util import (
+    now,
+    month_range,
+    make_start_date,
+)
+
+
+class LeaderboardPerson(object):
+    """
+    A developer's card and defect totals, summed across
+    one or more months of LeaderboardRecords.
+    """
+    def __init__(self, name):
+        super(LeaderboardPerson, self).__init__()
+        self.name = name
+        self.cards = 0
+        self.defects = 0
+        self.cycle_time_total = 0
+        self.cycle_time_count = 0
+
+    def add(self, row):
+        self.cards += row.get('cards', 0)
+        self.defects += row.get('defects', 0)
+        self.cycle_time_total += row.get('cycle_time_total', 0)
+        self.cycle_time_count += row.get('cycle_time_count', 0)
+
+    @property
+    def count(self):
+        return self.cards
+
+    @property
+    def cycle_time(self):
+        if not self.cycle_time_count:
+            return None
+        return int(round(float(self.cycle_time_total) / self.cycle_time_count))
+
+    def __cmp__(self, other):
+        return cmp(self.count, other.count)
+
+
+class LeaderboardRecord(app.db.Document):
+    """
+    Per-developer card counts and cycle times for a completed
+    month, per group.
+    """
+
+    month = app.db.DateTimeField(required=True, unique_with=['group', ])
+    """The first day of the month this record covers."""
+
+    group = app.db.StringField(required=True, default="all")
+    """The report group to which this record belongs."""
+
+    people = app.db.ListField(app.db.DictField())
+    """One dictionary per developer with their card, defect and cycle time totals."""
+
+    updated_at = app.db.DateTimeField(required=True)
+    """The datetime the record was last updated at."""
+
+    meta = {
+        'indexes': [('group', 'month')],
+    }
+
+    def save(self, *args, **kwargs):
+        self.updated_at = datetime.datetime.now()
+        super(LeaderboardRecord, self).save(*args, **kwargs)
+
+    @classmethod
+    def aggregate(klass, start_date, end_date, group='all'):
+        """
+        Unwinds the developers on every card completed between the two
+        dates and returns a list of per-developer totals, computed by
+        MongoDB rather than by loading each card.
+        """
+        rg = ReportGroup(group, Kard.objects.done().filter(
+            done_date__gte=start_date,
+            done_date__lte=end_date,
+        ))
+
+        pipeline = [
+            {'$match': rg.queryset._query},
+            {'$project': {
+                'developers': 1,
+                '_type': 1,
+                'cycle_time': 1,
+            }},
+            {'$unwind': '$developers'},
+            {'$group': {
+                '_id': {'name': '$developers', 'type': '$_type'},
+                'count': {'$sum': 1},
+                'cycle_time_total': {'$sum': '$cycle_time'},
+                'cycle_time_count': {'$sum': {
+                    '$cond': [{'$gte': ['$cycle_time', 0]}, 1, 0]
+                }},
+            }},
+        ]
+        rows = KardArchive.aggregate(pipeline)
+
+        defect_types = app.config.get('DEFECT_TYPES', ())
+        default_type = app.config.get('DEFAULT_TYPE', '')
+
+        people = {}
+        for row in rows:
+            name = row['_id']['name']
+            card_type = row['_id'].get('type') or default_type
+            person = people.setdefault(name, {
+                'name': name,
+                'cards': 0,
+                'defects': 0,
+                'cycle_time_total': 0,
+                'cycle_time_count': 0,
+            })
+            if card_type in defect_types:
+                person['defects'] += row['count']
+            else:
+                person['cards'] += row['count']
+            person['cycle_time_total'] += row['cycle_time_total']
+            person['cycle_time_count'] += row['cycle_time_count']
+
+        return people.values()
+
+    @classmethod
+    def calculate(klass, month, group='all'):
+        """
+        Creates or updates the LeaderboardRecord for the month
+        containing the date provided.
+        """
+        start_date, end_date = month_range(month)
+
+        try:
+            r = klass.objects.get(month=start_date, group=group)
+        except klass.DoesNotExist:
+            r = klass()
+            r.month = start_date
+            r.group = group
+
+        r.people = klass.aggregate(start_date, end_date, group)
+        r.save()
+        return r
+
+    @classmethod
+    def people_for_ranges(klass, months_ranges, group='all'):
+        """
+        Returns a LeaderboardPerson per developer for the supplied
+        month ranges. Completed months are read from (or stored as)
+        LeaderboardRecords, only the current month is computed live.
+        """
+        current_month = make_start_date(date=now().replace(day=1))
+
+        people = {}
+        for start_date, end_date in months_ranges:
+            if start_date < current_month:
+                try:
+                    rows = klass.objects.get(month=start_date, group=group).people
+                except klass.DoesNotExist:
+                    rows = klass.calculate(start_date, group).people
+            else:
+                rows = klass.aggregate(start_date, end_date, group)
+
+            for row in rows:
+                person = people.get(row['name'], LeaderboardPerson(row['name']))
+                person.add(row)
+                people[row['name']] = person
+
+        return people.values()
@@ -0,0 +1,49 @@
+import datetime
+
+from kardboard.app import app
+
+
+class ProfileRun(app.db.Document):
+    """
+    The cProfile stats and Mongo queries of one profiled request or task.
+    """
+
+    kind = app.db.StringField(required=True, choices=('request', 'task'))
+
+    name = app.db.StringField(required=True)
+    """The endpoint or task name."""
+
+    target = app.db.StringField()
+    """The request's full path, or the task's arguments."""
+
+    user = app.db.StringField()
+    """Who asked for the profile, for requests."""
+
+    duration = app.db.FloatField()
+    """Wall clock milliseconds."""
+
+    stats = app.db.ListField(app.db.DictField())
+    """The top functions by cumulative time."""
+
+    queries = app.db.ListField(app.db.DictField())
+    """The Mongo operations made, see kardboard.querylog."""
+
+    query_count = app.db.IntField(default=0)
+    query_time = app.db.FloatField(default=0)
+
+    created_at = app.db.DateTimeField(required=True)
+
+    meta = {
+        'collection': 'profile_run',
+        'ordering': ['-created_at'],
+        'max_documents': 200,
+        'max_size': 64 * 1024 * 1024,
+    }
+
+    def save(self, *args, **kwargs):
+        if self.created_at is None:
+            self.created_at = datetime.datetime.now()
+        super(ProfileRun, self).save(*args, **kwargs)
+
+    def __str__(self):
+        return "<ProfileRun: %s %s -- %s>" % (self.kind, self.name, self.created_at)
@@ -1,25 +1,42 @@
-from mongoengine.queryset import Q
-
 from kardboard.app import app
 
 
+def report_groups_for_team(team, config=None):
+    """
+    The slugs of every configured report group that includes the team.
+    """
+    if config is None:
+        config = app.config
+    groups_config = config.get('REPORT_GROUPS', {})
+    slugs = [slug for slug, group in groups_config.items() if team in group[0]]
+    slugs.sort()
+    return slugs
+
+
 class ReportGroup(object):
     def __init__(self, group, queryset):
         self.group = group
         self.qs = queryset
+        self.teams = self._find_teams()
         super(ReportGroup, self).__init__()
 
-    @property
-    def queryset(self):
+    def _find_teams(self):
+        """
+        The teams that make up the group, or None if the
+        group isn't configured (e.g. 'all').
+        """
         groups_config = app.config.get('REPORT_GROUPS', {})
         group = groups_config.get(self.group, ())
-        query = Q()
+        if group and group[0]:
+            return tuple(group[0])
+        return None
 
-        if group:
-            teams = group[0]
-            for team in teams:
-                query = Q(team=team) | query
+    @property
+    def queryset(self):
+        if self.teams is None:
+            return self.qs
 
-        if query:
-            return self.qs.filter(query)
-        return self.qs
+        if app.config.get('REPORT_GROUPS_DENORMALIZED', False):
+            # Cards carry their group slugs, see Kard.sync_report_groups
+            return self.qs.filter(report_groups=self.group)
+        return self.qs.filter(team__in=self.teams)
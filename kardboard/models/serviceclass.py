@@ -0,0 +1,79 @@
+from kardboard.app import app
+from kardboard.util import FrozenDict, ConfigRegistry
+
+
+class ServiceClass(FrozenDict):
+    """
+    One of the :ref:`SERVICE_CLASSES`, resolved once and shared
+    by every card in it. Reads like the dict it's built from.
+    """
+    def __init__(self, slug, classdef=None):
+        classdef = classdef or {}
+        super(ServiceClass, self).__init__(
+            name=classdef.get('name', None),
+            upper=classdef.get('upper', None),
+            lower=classdef.get('lower', None),
+            wip=classdef.get('wip', None),
+        )
+        self.slug = slug
+        self.name = self['name']
+
+        lower, upper = self['lower'], self['upper']
+        if lower is not None and upper is not None:
+            self.goal = (lower, upper)
+        else:
+            self.goal = None
+
+    def vs_goal(self, current):
+        """
+        Where a cycle time falls against the goal. -1 under it,
+        0 within it, 1 over it and 2 at twice the upper bound or more.
+        """
+        if not self.goal:
+            return 0
+
+        lower, upper = self.goal
+        super_upper = upper * 2
+        if current < lower:
+            return -1
+        elif current >= lower and current <= upper:
+            return 0
+        elif current >= super_upper:
+            return 2
+        elif current >= upper:
+            return 1
+
+
+class ServiceClassMap(FrozenDict):
+    def __init__(self, config):
+        classdefs = config.get('SERVICE_CLASSES', {})
+        super(ServiceClassMap, self).__init__(
+            [(slug, ServiceClass(slug, classdef)) for slug, classdef in classdefs.items()]
+        )
+        if 'default' not in self:
+            dict.__setitem__(self, 'default', ServiceClass('default'))
+
+    def find(self, slug):
+        """
+        The ServiceClass for the slug, the default one if the slug is
+        empty, or an empty one if it isn't configured.
+        """
+        if not slug:
+            slug = 'default'
+        try:
+            return self[slug]
+        except KeyError:
+            return ServiceClass(slug)
+
+
+_registry = ConfigRegistry(('SERVICE_CLASSES', ), ServiceClassMap)
+
+
+def get_service_classes(config=None):
+    """
+    The process wide ServiceClassMap for the config. It's only
+    rebuilt when SERVICE_CLASSES is replaced.
+    """
+    if not config:
+        config = app.config
+    return _registry.get(config)
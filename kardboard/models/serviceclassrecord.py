@@ -7,8 +7,12 @@ from kardboard.util import (
 )
 
 def report_on_cards(rg):
+    return report_on_card_list(rg.queryset.unordered())
+
+
+def report_on_card_list(cards):
     data = {}
-    for k in rg.queryset():
+    for k in cards:
         class_cards = data.get(k.service_class.get('name'), [])
         class_cards.append(k)
         data[k.service_class.get('name')] = class_cards
@@ -53,7 +57,11 @@ class ServiceClassSnapshot(app.db.Document):
     }
 
     @classmethod
-    def calculate(cls, group="all"):
+    def calculate(cls, group="all", cards=None):
+        """
+        Reports on the group's cards in progress. Pass cards to report
+        on an already loaded list of them instead of querying.
+        """
         from kardboard.models import Kard
         from kardboard.models import ReportGroup
 
@@ -66,8 +74,11 @@ class ServiceClassSnapshot(app.db.Document):
             record.group = group
             record.data = {}
 
-        kards = ReportGroup(group, Kard.in_progress())
-        record.data = report_on_cards(kards)
+        if cards is not None:
+            record.data = report_on_card_list(cards)
+        else:
+            kards = ReportGroup(group, Kard.in_progress())
+            record.data = report_on_cards(kards)
         record.save()
         return record
 
@@ -105,7 +116,11 @@ class ServiceClassRecord(app.db.Document):
         super(ServiceClassRecord, self).save(*args, **kwargs)
 
     @classmethod
-    def calculate(cls, start_date, end_date, group="all"):
+    def calculate(cls, start_date, end_date, group="all", cards=None):
+        """
+        Reports on the group's cards started between the dates. Pass
+        cards to report on an already loaded list of them instead of querying.
+        """
         from kardboard.models import Kard
         from kardboard.models import ReportGroup
 
@@ -125,12 +140,15 @@ class ServiceClassRecord(app.db.Document):
             record.group = group
             record.data = {}
 
-        kards = ReportGroup(group,
-            Kard.objects.filter(
-                start_date__gte=start_date,
-                start_date__lte=end_date,
+        if cards is not None:
+            record.data = report_on_card_list(cards)
+        else:
+            kards = ReportGroup(group,
+                Kard.objects.filter(
+                    start_date__gte=start_date,
+                    start_date__lte=end_date,
+                )
             )
-        )
-        record.data = report_on_cards(kards)
+            record.data = report_on_cards(kards)
         record.save()
         return record
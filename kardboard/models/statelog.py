@@ -66,11 +66,7 @@ class StateLog(app.db.Document):
         # If you're here it's because the observed_card's state is changing
         if observed_card.old_state is not None:
             try:
-                slos = cls.objects.filter(
-                        card=observed_card,
-                        state=observed_card.old_state,
-                        service_class=observed_card.service_class.get('name'),
-                        exited__exists=False)
+                slos = cls.open_logs(observed_card)
                 for s in slos:
                     s.exited = now()
                     s.save() # Close the old state log
@@ -78,6 +74,17 @@ class StateLog(app.db.Document):
                 #  For some reason we didn't record the old state, this should only happen when first rolled out
                 pass
 
+    @classmethod
+    def open_logs(cls, observed_card):
+        """
+        The logs for the state a card is leaving that haven't been exited yet.
+        """
+        return cls.objects.filter(
+            card=observed_card,
+            state=observed_card.old_state,
+            service_class=observed_card.service_class.get('name'),
+            exited__exists=False)
+
     @classmethod
     def kard_post_save(cls, sender, document, **kwargs):
         observed_card = document
@@ -1,4 +1,5 @@
 from kardboard.app import app
+from kardboard.util import FrozenList, ConfigRegistry
 
 
 class States(object):
@@ -6,29 +7,32 @@ class States(object):
         if not config:
             config = app.config
         self.config = config
-        self.states = config.get('CARD_STATES', ())
+        self.states = FrozenList(config.get('CARD_STATES', ()))
+        self._index = {}
+        for i, state in enumerate(self.states):
+            self._index.setdefault(state, i)
+
         self.backlog = self._find_backlog()
         self.start = self._find_start()
         self.done = self._find_done()
         self.pre_start = self._find_pre_start()
         self.in_progress = self._find_in_progress()
+        self.for_forms = self._find_for_forms()
 
     def _find_pre_start(self):
         """
         Find all states, in order, that come
         before a start_date is applied.
         """
-        return [s for s in self.states if self.states.index(s) < self.states.index(self.start)]
+        return FrozenList(self.states[:self.index(self.start)])
 
     def _find_in_progress(self):
         """
         Find all states, in order, that come after after backlog
         but before done.
         """
-        in_progress = [s for s in self.states
-            if self.states.index(s) > self.states.index(self.backlog) and
-            self.states.index(s) < self.states.index(self.done)]
-        return in_progress
+        in_progress = self.states[self.index(self.backlog) + 1:self.index(self.done)]
+        return FrozenList(in_progress)
 
     def _find_done(self):
         default = -1
@@ -45,6 +49,11 @@ class States(object):
         backlog = self.config.get('BACKLOG_STATE', default)
         return self.states[backlog]
 
+    def _find_for_forms(self):
+        form_list = [('', ''), ]  # Add a blank
+        form_list.extend([(state, state) for state in self.states])
+        return tuple(form_list)
+
     def __iter__(self):
         for state in self.states:
             yield state
@@ -58,11 +67,24 @@ class States(object):
     def __getitem__(self, key):
         return self.states[key]
 
-    def index(self, *args, **kwargs):
-        return self.states.index(*args, **kwargs)
+    def index(self, state):
+        try:
+            return self._index[state]
+        except KeyError:
+            raise ValueError("%s is not a configured state" % (state, ))
 
-    @property
-    def for_forms(self):
-        form_list = [('', ''), ]  # Add a blank
-        form_list.extend([(state, state) for state in self.states])
-        return tuple(form_list)
+
+_registry = ConfigRegistry(
+    ('CARD_STATES', 'BACKLOG_STATE', 'START_STATE', 'DONE_STATE'),
+    States,
+)
+
+
+def get_states(config=None):
+    """
+    The process wide States for the config. It's only rebuilt
+    when the CARD_STATES or *_STATE settings are replaced.
+    """
+    if not config:
+        config = app.config
+    return _registry.get(config)
@@ -0,0 +1,46 @@
+from kardboard.app import app
+
+
+class TaskRun(app.db.Document):
+    """
+    When a periodic task last ran and how long it took, one document per task.
+    """
+
+    name = app.db.StringField(primary_key=True)
+    """The Celery task name, e.g. tasks.update_flow_reports"""
+
+    last_started = app.db.DateTimeField()
+    last_finished = app.db.DateTimeField()
+
+    last_duration = app.db.FloatField()
+    """Milliseconds the last finished run took."""
+
+    last_failed = app.db.DateTimeField()
+    last_error = app.db.StringField()
+
+    runs = app.db.IntField(default=0)
+
+    meta = {
+        'collection': 'task_run',
+    }
+
+    @classmethod
+    def started(klass, name, at):
+        klass.objects(name=name).update_one(upsert=True, set__last_started=at)
+
+    @classmethod
+    def finished(klass, name, at, duration):
+        klass.objects(name=name).update_one(
+            upsert=True,
+            set__last_finished=at,
+            set__last_duration=duration,
+            inc__runs=1,
+        )
+
+    @classmethod
+    def failed(klass, name, at, error):
+        klass.objects(name=name).update_one(
+            upsert=True,
+            set__last_failed=at,
+            set__last_error=unicode(error)[:500],
+        )
@@ -1,31 +1,27 @@
-from kardboard.util import slugify
+from kardboard.util import slugify, FrozenList
 
 
 class Team(object):
     def __init__(self, name, wip_limit=0):
         self.name = name.strip()
         self.wip_limit = wip_limit
+        self.slug = slugify(self.name)
 
-    @property
-    def slug(self):
-        return slugify(self.name)
 
-
-class TeamList(list):
+class TeamList(FrozenList):
     def __init__(self, *args):
         super(TeamList, self).__init__(args)
         self.teams = args
-
-    @property
-    def names(self):
-        return [t.name for t in self.teams]
-
-    @property
-    def slug_name_mapping(self):
-        return dict(
+        self.names = FrozenList([t.name for t in self.teams])
+        self.slug_name_mapping = dict(
             [(t.slug, t.name) for t in self.teams]
         )
+        self._by_name = {}
+        for team in self.teams:
+            self._by_name.setdefault(team.name, team)
 
     def find_by_name(self, name):
-        index = self.names.index(name)
-        return self.teams[index]
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise ValueError("%s is not a configured team" % (name, ))
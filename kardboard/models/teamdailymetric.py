@@ -0,0 +1,237 @@
+import datetime
+
+from dateutil.relativedelta import relativedelta
+
+from kardboard.app import app
+from kardboard.models.archive import KardArchive
+from kardboard.util import (
+    now,
+    make_end_date,
+    make_start_date,
+)
+
+MOVING_WEEKS = 4
+"""How many weeks of done cards the moving cycle and lead times cover."""
+
+
+def _is_set(field):
+    return {'$gt': ['$%s' % field, None]}
+
+
+def _on_or_before(field, date):
+    return {'$and': [_is_set(field), {'$lte': ['$%s' % field, date]}]}
+
+
+def _between(field, start_date, end_date):
+    return {'$and': [
+        _is_set(field),
+        {'$gte': ['$%s' % field, start_date]},
+        {'$lte': ['$%s' % field, end_date]},
+    ]}
+
+
+def _count_if(condition):
+    return {'$sum': {'$cond': [condition, 1, 0]}}
+
+
+def _sum_if(condition, field):
+    return {'$sum': {'$cond': [condition, '$%s' % field, 0]}}
+
+
+class TeamDailyMetric(app.db.Document):
+    """
+    One cell of the per-team, per-day, per-type metrics cube.
+
+    Report groups are unions of teams, so a group's numbers
+    for a day are the sum of its teams' rows for that day.
+    """
+
+    date = app.db.DateTimeField(required=True, unique_with=['team', 'card_type'])
+    """The date for the metrics"""
+
+    team = app.db.StringField(required=False, default="")
+    """The team the cards belong to."""
+
+    card_type = app.db.StringField(required=False)
+    """The card type, as stored on Kard._type."""
+
+    backlog = app.db.IntField(default=0)
+    """The number of cards backlogged on the date."""
+
+    in_progress = app.db.IntField(default=0)
+    """The number of cards in progress on the date."""
+
+    done = app.db.IntField(default=0)
+    """The number of cards done on or before the date."""
+
+    completed = app.db.IntField(default=0)
+    """The number of cards completed on the date."""
+
+    cycle_time_sum = app.db.IntField(default=0)
+    cycle_time_count = app.db.IntField(default=0)
+    """Cycle time total and card count for cards done in the MOVING_WEEKS before the date."""
+
+    lead_time_sum = app.db.IntField(default=0)
+    lead_time_count = app.db.IntField(default=0)
+    """Lead time total and card count for cards done in the MOVING_WEEKS before the date."""
+
+    state_counts = app.db.DictField()
+    """Kanban state as the key and the count of cards in it. Only captured for the current day."""
+
+    updated_at = app.db.DateTimeField(required=True)
+    """The datetime the row was last updated at."""
+
+    meta = {
+        'indexes': [('date', 'team')],
+    }
+
+    METRIC_FIELDS = (
+        'backlog',
+        'in_progress',
+        'done',
+        'completed',
+        'cycle_time_sum',
+        'cycle_time_count',
+        'lead_time_sum',
+        'lead_time_count',
+    )
+
+    def save(self, *args, **kwargs):
+        self.updated_at = datetime.datetime.now()
+        super(TeamDailyMetric, self).save(*args, **kwargs)
+
+    def __str__(self):
+        return "<TeamDailyMetric: %s -- %s -- %s>" % (self.date, self.team, self.card_type)
+
+    @classmethod
+    def _aggregate(klass, pipeline):
+        return KardArchive.aggregate(pipeline)
+
+    @classmethod
+    def _date_metrics(klass, date):
+        day_start = make_start_date(date=date)
+        window_start = make_start_date(date=date - relativedelta(weeks=MOVING_WEEKS))
+        in_window = _between('done_date', window_start, date)
+
+        pipeline = [
+            {'$match': {'$or': [
+                {'backlog_date': {'$lte': date}},
+                {'start_date': {'$lte': date}},
+                {'done_date': {'$lte': date}},
+            ]}},
+            {'$group': {
+                '_id': {'team': '$team', 'type': '$_type'},
+                'backlog': _count_if({'$and': [
+                    _on_or_before('backlog_date', date),
+                    {'$not': [_on_or_before('start_date', date)]},
+                ]}),
+                'in_progress': _count_if({'$and': [
+                    _on_or_before('start_date', date),
+                    {'$not': [_on_or_before('done_date', date)]},
+                ]}),
+                'done': _count_if(_on_or_before('done_date', date)),
+                'completed': _count_if(_between('done_date', day_start, date)),
+                'cycle_time_sum': _sum_if(
+                    {'$and': [in_window, _is_set('cycle_time')]}, 'cycle_time'),
+                'cycle_time_count': _count_if(
+                    {'$and': [in_window, _is_set('cycle_time')]}),
+                'lead_time_sum': _sum_if(
+                    {'$and': [in_window, _is_set('lead_time')]}, 'lead_time'),
+                'lead_time_count': _count_if(
+                    {'$and': [in_window, _is_set('lead_time')]}),
+            }},
+        ]
+
+        rows = {}
+        for row in klass._aggregate(pipeline):
+            key = (row['_id'].get('team'), row['_id'].get('type'))
+            rows[key] = dict([(f, row[f]) for f in klass.METRIC_FIELDS])
+        return rows
+
+    @classmethod
+    def _state_metrics(klass):
+        pipeline = [
+            {'$group': {
+                '_id': {'team': '$team', 'type': '$_type', 'state': '$state'},
+                'count': {'$sum': 1},
+            }},
+        ]
+
+        rows = {}
+        for row in klass._aggregate(pipeline):
+            key = (row['_id'].get('team'), row['_id'].get('type'))
+            state_counts = rows.setdefault(key, {})
+            state_counts[row['_id'].get('state')] = row['count']
+        return rows
+
+    @classmethod
+    def capture(klass, date):
+        """
+        Recalculates every team's rows for the date provided
+        with a single aggregation over the live and archived cards.
+        """
+        date = make_end_date(date=date)
+        rows = klass._date_metrics(date)
+
+        state_rows = {}
+        if date == make_end_date(date=now()):
+            # Card state is only known as of right now
+            state_rows = klass._state_metrics()
+
+        keys = set(rows.keys())
+        keys.update(state_rows.keys())
+        for team, card_type in keys:
+            values = rows.get((team, card_type), {})
+            update = dict([('set__%s' % f, values.get(f, 0)) for f in klass.METRIC_FIELDS])
+            update['set__state_counts'] = state_rows.get((team, card_type), {})
+            update['set__updated_at'] = datetime.datetime.now()
+            klass.objects(
+                date=date,
+                team=team,
+                card_type=card_type,
+            ).update_one(upsert=True, **update)
+
+        for stale in klass.objects(date=date).only('team', 'card_type'):
+            if (stale.team, stale.card_type) not in keys:
+                stale.delete()
+
+        return keys
+
+    @classmethod
+    def rollup(klass, date, teams=None):
+        """
+        Sums the rows for the teams supplied (or all teams) on the
+        date provided into a single dictionary of metrics.
+        """
+        date = make_end_date(date=date)
+        defect_types = app.config.get('DEFECT_TYPES', [])
+        default_type = app.config.get('DEFAULT_TYPE', '')
+
+        qs = klass.objects.filter(date=date)
+        if teams is not None:
+            qs = qs.filter(team__in=teams)
+
+        totals = dict([(f, 0) for f in klass.METRIC_FIELDS])
+        totals['state_counts'] = {}
+        totals['state_card_counts'] = {}
+        for row in qs:
+            for f in klass.METRIC_FIELDS:
+                totals[f] += getattr(row, f) or 0
+
+            is_card = (row.card_type or default_type) not in defect_types
+            for state, count in row.state_counts.items():
+                totals['state_counts'][state] = totals['state_counts'].get(state, 0) + count
+                if is_card:
+                    totals['state_card_counts'][state] = totals['state_card_counts'].get(state, 0) + count
+
+        totals['moving_cycle_time'] = klass._average(
+            totals['cycle_time_sum'], totals['cycle_time_count'])
+        totals['moving_lead_time'] = klass._average(
+            totals['lead_time_sum'], totals['lead_time_count'])
+        return totals
+
+    @classmethod
+    def _average(klass, total, count):
+        if not count:
+            return 0
+        return int(round(total / float(count)))
@@ -0,0 +1,143 @@
+import datetime
+import zlib
+
+from bson import BSON
+
+from kardboard.app import app
+
+
+METADATA_KEYS = ('status', 'type', 'resolution')
+"""Payload keys holding ticket system metadata shared by many tickets."""
+
+_metadata = {}
+
+
+class TicketMetadata(app.db.Document):
+    """
+    One status, type or resolution dictionary from the ticket system,
+    stored once and referenced by id from compressed payloads.
+    """
+
+    ref = app.db.StringField(primary_key=True)
+    """The kind of metadata and its id in the ticket system, e.g. status:6"""
+
+    data = app.db.DictField()
+
+    meta = {
+        'collection': 'kard_ticket_metadata',
+    }
+
+    @staticmethod
+    def make_ref(kind, metadata_id):
+        return "%s:%s" % (kind, metadata_id)
+
+    @classmethod
+    def remember(klass, kind, value):
+        ref = klass.make_ref(kind, value['id'])
+        if _metadata.get(ref) != value:
+            klass.objects(ref=ref).update_one(upsert=True, set__data=value)
+            _metadata[ref] = value
+        return ref
+
+    @classmethod
+    def lookup(klass, ref):
+        value = _metadata.get(ref)
+        if value is None:
+            doc = klass._get_collection().find_one({'_id': ref})
+            value = (doc or {}).get('data') or {'id': ref.split(':', 1)[-1]}
+            _metadata[ref] = value
+        return value
+
+
+class TicketPayload(app.db.Document):
+    """
+    The raw data a :ref:`TICKET_HELPER` fetched for a card.
+
+    Kept out of the Kard collection so card queries don't carry it,
+    the fields kardboard needs are denormalised onto Kard on save.
+    """
+
+    card = app.db.ObjectIdField(primary_key=True)
+    """The id of the Kard the payload belongs to."""
+
+    data = app.db.DictField()
+    """The ticket data, as supplied by the helper."""
+
+    blob = app.db.BinaryField()
+    """The ticket data zlib compressed, when :ref:`TICKET_PAYLOAD_COMPRESSION` is on."""
+
+    updated_at = app.db.DateTimeField(required=True)
+    """The datetime the payload was last written."""
+
+    meta = {
+        'collection': 'kard_ticket_payload',
+    }
+
+    def save(self, *args, **kwargs):
+        self.updated_at = datetime.datetime.now()
+        super(TicketPayload, self).save(*args, **kwargs)
+
+    def __str__(self):
+        return "<TicketPayload: %s>" % (self.card, )
+
+    @staticmethod
+    def compress(data):
+        """
+        Packs the data into a zlib compressed BSON blob, with the
+        shared metadata dictionaries swapped for TicketMetadata refs.
+        """
+        data = dict(data)
+        refs = {}
+        for key in METADATA_KEYS:
+            value = data.get(key)
+            if isinstance(value, dict) and value.get('id') is not None:
+                refs[key] = TicketMetadata.remember(key, value)
+                del data[key]
+
+        level = app.config.get('TICKET_PAYLOAD_COMPRESSION_LEVEL', 6)
+        return zlib.compress(BSON.encode({'data': data, 'refs': refs}), level)
+
+    @staticmethod
+    def decompress(blob):
+        packed = BSON(zlib.decompress(blob)).decode()
+        data = packed.get('data') or {}
+        for key, ref in (packed.get('refs') or {}).items():
+            data[key] = TicketMetadata.lookup(ref)
+        return data
+
+    @classmethod
+    def load(klass, card_id):
+        """
+        The stored data for the card, or an empty dict.
+        """
+        if card_id is None:
+            return {}
+        doc = klass._get_collection().find_one({'_id': card_id}, fields=['data', 'blob'])
+        if not doc:
+            return {}
+        if doc.get('blob'):
+            return klass.decompress(doc['blob'])
+        return doc.get('data') or {}
+
+    @classmethod
+    def store(klass, card_id, data):
+        data = data or {}
+        if app.config.get('TICKET_PAYLOAD_COMPRESSION', False) and data:
+            update = {
+                'set__blob': klass.compress(data),
+                'unset__data': True,
+            }
+        else:
+            update = {
+                'set__data': data,
+                'unset__blob': True,
+            }
+        klass.objects(card=card_id).update_one(
+            upsert=True,
+            set__updated_at=datetime.datetime.now(),
+            **update
+        )
+
+    @classmethod
+    def remove(klass, card_id):
+        klass.objects(card=card_id).delete()
@@ -0,0 +1,153 @@
+"""
+Opt-in cProfile runs of single requests and Celery tasks.
+
+An authenticated user adds ?_profile=1 to any URL; a task decorated
+with profileable is called with _profile=True. Either way the top
+functions by cumulative time and the Mongo queries made are stored
+as a ProfileRun, listed at /profiles/. Nothing is profiled, or even
+imported, unless asked for.
+"""
+import functools
+import time
+
+from kardboard.querylog import QueryLog, install
+
+
+PROFILE_PARAM = '_profile'
+
+
+def top_stats(profile, limit):
+    """
+    The limit functions with the most cumulative time, as dicts.
+    """
+    import pstats
+
+    stats = pstats.Stats(profile)
+    stats.sort_stats('cumulative')
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, callers = stats.stats[func]
+        rows.append({
+            'function': pstats.func_std_string(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'tottime': total_time * 1000,
+            'cumtime': cumulative_time * 1000,
+        })
+    return rows
+
+
+class Profiling(object):
+    """
+    cProfile plus a QueryLog, between start() and stop().
+    """
+
+    def __init__(self, kind, name, target=None, user=None):
+        self.kind = kind
+        self.name = name
+        self.target = target
+        self.user = user
+
+    def start(self):
+        import cProfile
+
+        install()
+        self.queries = QueryLog(self.name).start()
+        self.profile = cProfile.Profile()
+        self.started = time.time()
+        self.profile.enable()
+        return self
+
+    def stop(self, config):
+        """
+        Stops profiling and stores the run, returning the ProfileRun.
+        """
+        from kardboard.models import ProfileRun
+
+        try:
+            self.profile.disable()
+        finally:
+            self.queries.stop()
+        duration = (time.time() - self.started) * 1000
+
+        query_limit = config.get('PROFILE_QUERY_LIMIT', 500)
+        run = ProfileRun(
+            kind=self.kind,
+            name=self.name,
+            target=self.target,
+            user=self.user,
+            duration=duration,
+            stats=top_stats(self.profile, config.get('PROFILE_TOP_N', 50)),
+            queries=self.queries.entries[:query_limit],
+            query_count=self.queries.count,
+            query_time=self.queries.total_ms,
+        )
+        run.save()
+        return run
+
+
+def init_app(app):
+    """
+    Profiles requests with ?_profile=1 from authenticated users when
+    :ref:`PROFILING_ENABLED` is on.
+    """
+    from flask import request, session, _request_ctx_stack
+    from kardboard.auth import is_authenticated
+
+    @app.before_request
+    def start_profiling():
+        if PROFILE_PARAM not in request.args:
+            return
+        if not app.config.get('PROFILING_ENABLED', False) or not is_authenticated():
+            return
+        _request_ctx_stack.top.profiling = Profiling(
+            'request',
+            request.endpoint or 'unknown',
+            target=request.url,
+            user=session.get('username'),
+        ).start()
+
+    @app.after_request
+    def finish_profiling(response):
+        profiling = getattr(_request_ctx_stack.top, 'profiling', None)
+        if profiling is None:
+            return response
+        _request_ctx_stack.top.profiling = None
+        run = profiling.stop(app.config)
+        response.headers['X-Profile-Id'] = str(run.id)
+        return response
+
+    @app.teardown_request
+    def abandon_profiling(exc=None):
+        # after_request is skipped when the view raises, don't
+        # leave cProfile and the QueryLog running on this thread
+        ctx = _request_ctx_stack.top
+        profiling = getattr(ctx, 'profiling', None)
+        if profiling is None:
+            return
+        ctx.profiling = None
+        profiling.stop(app.config)
+
+
+def profileable(func):
+    """
+    Lets a Celery task be called with _profile=True to store a
+    ProfileRun of that invocation.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from kardboard.app import app
+
+        if not kwargs.pop(PROFILE_PARAM, False) or not app.config.get('PROFILING_ENABLED', False):
+            return func(*args, **kwargs)
+
+        profiling = Profiling(
+            'task',
+            "%s.%s" % (func.__module__.split('.')[-1], func.__name__),
+            target=repr((args, kwargs)),
+        ).start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiling.stop(app.config)
+    return wrapper
@@ -0,0 +1,228 @@
+"""
+Counts and times the Mongo operations made while a QueryLog is active,
+so a request or task can report how many queries it made and warn
+about the same query being repeated, the usual sign of an N+1.
+
+pymongo 2.x has no command monitoring, so install() wraps the few
+Cursor, Collection and Database methods every operation goes through.
+With no log active the wrappers cost one thread local lookup.
+"""
+import threading
+import time
+
+from pymongo.collection import Collection
+from pymongo.cursor import Cursor
+from pymongo.database import Database
+
+
+_local = threading.local()
+_installed = []
+
+
+def _active():
+    return getattr(_local, 'logs', None)
+
+
+def query_shape(spec):
+    """
+    The query with its values blanked out, so queries that differ
+    only in the values they look for compare equal.
+    """
+    if isinstance(spec, dict):
+        return "{%s}" % ", ".join(["%s: %s" % (key, query_shape(spec[key]))
+            for key in sorted(spec.keys())])
+    if isinstance(spec, (list, tuple)) and spec and isinstance(spec[0], dict):
+        return "[%s]" % ", ".join([query_shape(s) for s in spec])
+    return "?"
+
+
+class QueryLog(object):
+    """
+    The Mongo operations made on this thread between start() and stop().
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.entries = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        logs = _active()
+        if logs is None:
+            logs = _local.logs = []
+        logs.append(self)
+        return self
+
+    def stop(self):
+        logs = _active() or []
+        if self in logs:
+            logs.remove(self)
+        return self
+
+    def record(self, operation, collection, shape, duration):
+        self.entries.append({
+            'operation': operation,
+            'collection': collection,
+            'shape': shape,
+            'ms': duration * 1000,
+        })
+
+    @property
+    def count(self):
+        return len(self.entries)
+
+    @property
+    def total_ms(self):
+        return sum([e['ms'] for e in self.entries])
+
+    def repeated(self, threshold):
+        """
+        (count, operation, collection, shape) for every query shape made
+        more than threshold times, most repeated first.
+        """
+        counts = {}
+        for e in self.entries:
+            if e['operation'] == 'getmore':
+                continue
+            key = (e['operation'], e['collection'], e['shape'])
+            counts[key] = counts.get(key, 0) + 1
+        repeats = [(count, ) + shape for shape, count in counts.items() if count > threshold]
+        repeats.sort(reverse=True)
+        return repeats
+
+
+def _record(operation, collection, shape, duration):
+    for log in _active() or []:
+        log.record(operation, collection, shape, duration)
+
+
+def _timed(operation, describe):
+    def wrap(original):
+        def wrapper(self, *args, **kwargs):
+            if not _active():
+                return original(self, *args, **kwargs)
+            # Described before running, a cursor has an id (and
+            # looks like a getmore) once its first batch is in
+            name, collection, shape = describe(self, operation, *args, **kwargs)
+            start = time.time()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                _record(name, collection, shape, time.time() - start)
+        wrapper.__name__ = original.__name__
+        wrapper._querylog_original = original
+        return wrapper
+    return wrap
+
+
+def _describe_cursor(cursor, operation):
+    operation = 'find' if cursor._Cursor__id is None else 'getmore'
+    return operation, cursor._Cursor__collection.name, query_shape(cursor._Cursor__spec)
+
+
+def _describe_write(collection, operation, spec=None, *args, **kwargs):
+    if operation == 'insert':
+        spec = None
+    return operation, collection.name, query_shape(spec or {})
+
+
+def _describe_command(database, operation, command, value=1, *args, **kwargs):
+    if isinstance(command, basestring):
+        name, collection, body = command, value, {}
+    else:
+        name = iter(command).next()
+        collection, body = command[name], command
+    query = body.get('query') or body.get('pipeline') or {}
+    if not isinstance(collection, basestring):
+        collection = ''
+    return name, collection, query_shape(query)
+
+
+def install():
+    """
+    Wraps pymongo so active QueryLogs see every operation. Safe to call more than once.
+    """
+    if _installed:
+        return
+    Cursor._refresh = _timed(None, _describe_cursor)(Cursor._refresh)
+    for name in ('insert', 'update', 'remove'):
+        setattr(Collection, name, _timed(name, _describe_write)(getattr(Collection, name)))
+    Database.command = _timed(None, _describe_command)(Database.command)
+    _installed.append(True)
+
+
+def _warn_repeats(logger, log, threshold, where):
+    for count, operation, collection, shape in log.repeated(threshold):
+        logger.warning("Possible N+1 in %s: %s %s %s made %s times" % (
+            where, operation, collection, shape, count))
+
+
+def _statsd_timings(app, prefix, log):
+    import statsd
+    stats = app.statsd.get_client(prefix)
+    stats.get_client(class_=statsd.Timer).send('time', log.total_ms / 1000.0)
+    stats.get_client(class_=statsd.Counter).increment('queries', log.count)
+
+
+def init_app(app):
+    """
+    Accounts for the queries each request makes when
+    :ref:`MONGO_QUERY_ACCOUNTING` is on.
+    """
+    from flask import g, request
+
+    install()
+
+    @app.before_request
+    def start_query_log():
+        if app.config.get('MONGO_QUERY_ACCOUNTING', False):
+            g.query_log = QueryLog(request.endpoint).start()
+
+    @app.after_request
+    def finish_query_log(response):
+        log = getattr(g, 'query_log', None)
+        if log is None:
+            return response
+        log.stop()
+        response.headers['X-Mongo-Queries'] = str(log.count)
+        response.headers['X-Mongo-Time'] = "%.1f" % log.total_ms
+
+        _statsd_timings(app, 'web.mongo.%s' % (request.endpoint or 'unknown'), log)
+        threshold = app.config.get('MONGO_REPEATED_QUERY_THRESHOLD', 10)
+        _warn_repeats(app.logger, log, threshold, request.path)
+        return response
+
+
+def init_celery(app):
+    """
+    Accounts for the queries each Celery task makes when
+    :ref:`MONGO_QUERY_ACCOUNTING` is on.
+    """
+    from celery.signals import task_prerun, task_postrun
+    from kardboard.metrics import ScopedMetrics
+
+    install()
+    logs = {}
+
+    def start_task_log(sender=None, task_id=None, task=None, **kwargs):
+        if app.config.get('MONGO_QUERY_ACCOUNTING', False):
+            logs[task_id] = QueryLog(task.name).start()
+
+    def finish_task_log(sender=None, task_id=None, task=None, **kwargs):
+        log = logs.pop(task_id, None)
+        if log is None:
+            return
+        log.stop()
+        metrics = ScopedMetrics('%s.mongo' % task.name)
+        metrics.timing('time', log.total_ms / 1000.0)
+        metrics.incr('queries', log.count)
+        threshold = app.config.get('MONGO_REPEATED_QUERY_THRESHOLD', 10)
+        _warn_repeats(task.get_logger(), log, threshold, task.name)
+
+    task_prerun.connect(start_task_log, weak=False)
+    task_postrun.connect(finish_task_log, weak=False)
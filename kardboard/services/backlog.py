@@ -0,0 +1,88 @@
+from kardboard.models.kard import Kard
+from kardboard.models.states import get_states
+
+RANK_GAP = 1024
+"""The space left between neighbouring priorities when a backlog is renumbered."""
+
+
+def rank_between(before, after):
+    """
+    Returns a priority that sorts strictly between before and after,
+    or None if there's no room left and the backlog needs renumbering.
+
+    A before of None means the card is moving to the top of the backlog,
+    an after of None means it is moving to the bottom.
+    """
+    lower = before or 0
+    if after is None:
+        return lower + RANK_GAP
+    if after - lower > 1:
+        return lower + (after - lower) / 2
+    return None
+
+
+def team_backlog(team_name):
+    states = get_states()
+    return Kard.objects.filter(
+        team=team_name,
+        state=states.backlog,
+    ).only('key', 'priority').order_by('priority')
+
+
+def renumber(team_name, key, before_key=None):
+    """
+    Renumbers the team's whole backlog RANK_GAP apart, with the card
+    for key placed directly after before_key. Only cards whose priority
+    actually changes are written.
+    """
+    cards = list(team_backlog(team_name))
+    others = [c for c in cards if c.key != key]
+    moving = [c for c in cards if c.key == key]
+
+    position = 0
+    if before_key:
+        keys = [c.key for c in others]
+        if before_key in keys:
+            position = keys.index(before_key) + 1
+        else:
+            position = len(others)
+    others[position:position] = moving
+
+    writes = 0
+    for i, card in enumerate(others):
+        rank = (i + 1) * RANK_GAP
+        if card.priority != rank:
+            Kard.objects(key=card.key).only('priority').update_one(set__priority=rank)
+            writes += 1
+    return writes
+
+
+def move_card(team_name, key, before_key=None, after_key=None):
+    """
+    Moves a card between its new neighbours in a team's backlog.
+
+    Only the moved card is written, unless its neighbours have
+    no gap between them (or no priority at all), in which case the
+    whole backlog is renumbered. Returns the number of cards written.
+    """
+    keys = [k for k in (key, before_key, after_key) if k]
+    priorities = dict(
+        [(c.key, c.priority) for c in Kard.objects.filter(key__in=keys).only('key', 'priority')]
+    )
+    if key not in priorities:
+        raise Kard.DoesNotExist("No card with key %s" % key)
+
+    before = priorities.get(before_key, None)
+    after = priorities.get(after_key, None)
+
+    rank = None
+    neighbours_ranked = (before_key is None or before is not None) and \
+        (after_key is None or after is not None)
+    if neighbours_ranked:
+        rank = rank_between(before, after)
+
+    if rank is None:
+        return renumber(team_name, key, before_key)
+
+    Kard.objects(key=key).only('priority').update_one(set__priority=rank)
+    return 1
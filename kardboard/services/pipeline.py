@@ -0,0 +1,170 @@
+"""
+Health of the ticket sync and report pipeline, for the ops page.
+
+Every number here comes from an indexed count, a small aggregation or
+a maintained counter, so the page stays cheap however many cards there are.
+"""
+import datetime
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from kardboard.app import app
+from kardboard.models.kard import Kard
+from kardboard.models.dailyrecord import DailyRecord
+from kardboard.models.flowreport import FlowReport
+from kardboard.models.serviceclassrecord import ServiceClassSnapshot
+from kardboard.models.taskrun import TaskRun
+from kardboard.util import now
+
+
+SYNC_AGE_BUCKETS = (
+    ('Under an hour', datetime.timedelta(hours=1)),
+    ('1 to 6 hours', datetime.timedelta(hours=6)),
+    ('6 to 24 hours', datetime.timedelta(days=1)),
+    ('1 to 7 days', datetime.timedelta(days=7)),
+    ('Over 7 days', None),
+)
+
+
+def sync_ages(today=None):
+    """
+    (label, count) of cards by how long ago they were last
+    updated from the ticket system, ending with those never updated.
+    """
+    today = today or now()
+    rows = []
+    newer_than = None
+    for label, age in SYNC_AGE_BUCKETS:
+        query = {}
+        if age is not None:
+            query['_ticket_system_updated_at__gt'] = today - age
+        if newer_than is not None:
+            query['_ticket_system_updated_at__lte'] = newer_than
+        rows.append((label, Kard.objects.filter(**query).unordered().count()))
+        if age is not None:
+            newer_than = today - age
+    never = Kard.objects.filter(_ticket_system_updated_at__exists=False).unordered().count()
+    rows.append(('Never', never))
+    return rows
+
+
+def queue_depth(queue='celery'):
+    """
+    Messages waiting in the broker queue update_ticket is sent to,
+    or None when the broker can't be reached.
+    """
+    from kardboard.tasks import celery
+    try:
+        connection = celery.broker_connection()
+        try:
+            name, messages, consumers = connection.default_channel.queue_declare(
+                queue=queue, passive=True)
+        finally:
+            connection.release()
+    except Exception:
+        return None
+    return messages
+
+
+def periodic_tasks():
+    """
+    A row per entry in :ref:`CELERYBEAT_SCHEDULE` with its task's last run.
+    """
+    runs = dict([(r.name, r) for r in TaskRun.objects.all()])
+    rows = []
+    for entry, conf in sorted(app.config.get('CELERYBEAT_SCHEDULE', {}).items()):
+        rows.append({
+            'entry': entry,
+            'task': conf['task'],
+            'schedule': conf.get('schedule'),
+            'run': runs.get(conf['task']),
+        })
+    return rows
+
+
+def _latest_updates(document, recent_field=None, since=None):
+    query = {}
+    if recent_field:
+        query[recent_field] = {'$gte': since}
+    pipeline = [
+        {'$match': query},
+        {'$group': {'_id': '$group', 'updated_at': {'$max': '$updated_at'}}},
+    ]
+    rows = document._get_collection().aggregate(pipeline).get('result', [])
+    return dict([(row['_id'], row['updated_at']) for row in rows])
+
+
+def report_freshness(today=None):
+    """
+    A row per report group with when its DailyRecords, FlowReport and
+    ServiceClassSnapshot were last written. Only the last month of
+    DailyRecords and FlowReports is looked at, that's what the
+    periodic tasks keep rewriting.
+    """
+    since = (today or now()) - relativedelta(months=1)
+    daily = _latest_updates(DailyRecord, 'date', since)
+    flow = _latest_updates(FlowReport, 'date', since)
+    snapshots = _latest_updates(ServiceClassSnapshot)
+
+    groups = ['all'] + sorted(app.config.get('REPORT_GROUPS', {}).keys())
+    return [{
+        'group': group,
+        'daily_record': daily.get(group),
+        'flow_report': flow.get(group),
+        'service_class_snapshot': snapshots.get(group),
+    } for group in groups]
+
+
+def cache_stats():
+    """
+    Hits, misses and hit ratio of the Redis cache, or None when the
+    cache isn't Redis.
+    """
+    from kardboard.app import cache
+    client = getattr(getattr(cache, 'cache', None), '_client', None)
+    if client is None:
+        return None
+    try:
+        info = client.info()
+    except Exception:
+        return None
+    hits, misses = info.get('keyspace_hits', 0), info.get('keyspace_misses', 0)
+    ratio = None
+    if hits + misses:
+        ratio = hits / float(hits + misses)
+    return {'hits': hits, 'misses': misses, 'ratio': ratio}
+
+
+def init_celery(app):
+    """
+    Keeps a TaskRun up to date for every task in :ref:`CELERYBEAT_SCHEDULE`.
+    """
+    from celery.signals import task_prerun, task_postrun, task_failure
+
+    started = {}
+
+    def periodic(task):
+        names = [conf['task'] for conf in app.config.get('CELERYBEAT_SCHEDULE', {}).values()]
+        return task is not None and task.name in names
+
+    def start_task_run(sender=None, task_id=None, task=None, **kwargs):
+        if periodic(task):
+            started[task_id] = time.time()
+            TaskRun.started(task.name, now())
+
+    def finish_task_run(sender=None, task_id=None, task=None, **kwargs):
+        # task_postrun fires for failed runs too, after task_failure
+        # has dropped them from started
+        start = started.pop(task_id, None)
+        if start is not None:
+            TaskRun.finished(task.name, now(), (time.time() - start) * 1000)
+
+    def fail_task_run(sender=None, task_id=None, exception=None, **kwargs):
+        started.pop(task_id, None)
+        if periodic(sender):
+            TaskRun.failed(sender.name, now(), exception)
+
+    task_prerun.connect(start_task_run, weak=False)
+    task_postrun.connect(finish_task_run, weak=False)
+    task_failure.connect(fail_task_run, weak=False)
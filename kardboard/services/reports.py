@@ -0,0 +1,193 @@
+"""
+Refreshes the current reports in one pass.
+
+update_flow_reports, queue_service_class_reports and normalize_people
+each used to read their own, largely overlapping, set of cards. refresh()
+reads the active cards once, with only the fields the reports use, and
+runs every report as a stage over that snapshot. A stage only runs once
+the stages it depends on have succeeded.
+"""
+import time
+
+from dateutil.relativedelta import relativedelta
+from mongoengine.queryset import Q
+
+from kardboard.app import app
+from kardboard.models.kard import Kard
+from kardboard.models.person import Person
+from kardboard.models.dailyrecord import DailyRecord
+from kardboard.models.flowreport import FlowReport
+from kardboard.models.reportgroup import ReportGroup
+from kardboard.models.serviceclassrecord import ServiceClassRecord, ServiceClassSnapshot
+from kardboard.models.teamdailymetric import TeamDailyMetric
+from kardboard.util import now, month_ranges, log_exception
+
+
+SERVICE_CLASS_MONTHS = (1, 3, 6, 9, 12)
+"""The month ranges a ServiceClassRecord is kept for."""
+
+SNAPSHOT_FIELDS = (
+    'key',
+    'team',
+    'state',
+    '_type',
+    '_service_class',
+    'backlog_date',
+    'start_date',
+    'done_date',
+    '_reporter',
+    '_developers',
+    '_testers',
+)
+
+
+class CardSnapshot(object):
+    """
+    Every card in progress, started in the last months or
+    done in the last people_days, read with a single query.
+    """
+
+    def __init__(self, today=None, months=max(SERVICE_CLASS_MONTHS), people_days=7):
+        self.today = today or now()
+        self.started_since = month_ranges(self.today, months)[0][0]
+        self.touched_since = self.today - relativedelta(days=people_days)
+        self.cards = []
+
+    def load(self):
+        query = (Q(done_date=None) & Q(start_date__exists=True)) | \
+            Q(start_date__gte=self.started_since) | \
+            Q(done_date__gte=self.touched_since)
+        self.cards = list(Kard.objects.filter(query).only(*SNAPSHOT_FIELDS).unordered())
+        return self
+
+    def in_group(self, group):
+        teams = ReportGroup(group, None).teams
+        if teams is None:
+            return list(self.cards)
+        return [c for c in self.cards if c.team in teams]
+
+    def in_progress(self, group='all'):
+        return [c for c in self.in_group(group) if c.start_date and not c.done_date]
+
+    def started_between(self, start_date, end_date, group='all'):
+        return [c for c in self.in_group(group)
+            if c.start_date and start_date <= c.start_date <= end_date]
+
+    def recently_touched(self):
+        return [c for c in self.cards
+            if (c.start_date and c.start_date >= self.touched_since) or
+               (c.done_date and c.done_date >= self.touched_since)]
+
+
+def report_groups():
+    slugs = app.config.get('REPORT_GROUPS', {}).keys()
+    slugs.append('all')
+    return slugs
+
+
+def _get_person(name, cache):
+    p = cache.get(name, None)
+    if not p:
+        try:
+            p = Person.objects.get(name=name)
+        except Person.DoesNotExist:
+            p = Person(name=name)
+        cache[name] = p
+    return p
+
+
+def update_people(cards):
+    """
+    Adds the cards to the Person records of their reporters,
+    developers and testers.
+    """
+    people_cache = {}
+    for k in cards:
+        if k.reporter:
+            _get_person(k.reporter, people_cache).report(k)
+        for d in k.developers:
+            _get_person(d, people_cache).develop(k)
+        for t in k.testers:
+            _get_person(t, people_cache).test(k)
+
+    for name, person in people_cache.items():
+        person.save()
+    return len(people_cache)
+
+
+def _team_metrics(snapshot):
+    TeamDailyMetric.capture(snapshot.today)
+
+
+def _flow_reports(snapshot):
+    for slug in report_groups():
+        FlowReport.capture(slug, capture=False)
+
+
+def _daily_records(snapshot):
+    for slug in report_groups():
+        DailyRecord.calculate(date=snapshot.today, group=slug, capture=False)
+
+
+def _service_classes(snapshot):
+    for slug in report_groups():
+        ServiceClassSnapshot.calculate(slug, cards=snapshot.in_progress(slug))
+        for x in SERVICE_CLASS_MONTHS:
+            ranges = month_ranges(snapshot.today, x)
+            start_date, end_date = ranges[0][0], ranges[-1][1]
+            ServiceClassRecord.calculate(start_date, end_date, group=slug,
+                cards=snapshot.started_between(start_date, end_date, slug))
+
+
+def _people(snapshot):
+    if app.config.get('DISABLE_TASK_PEOPLE', False):
+        return
+    update_people(snapshot.recently_touched())
+
+
+STAGES = (
+    ('team_metrics', (), _team_metrics),
+    ('flow_reports', ('team_metrics', ), _flow_reports),
+    ('daily_records', ('team_metrics', ), _daily_records),
+    ('service_classes', (), _service_classes),
+    ('people', (), _people),
+)
+"""(name, the stages it needs to have succeeded, function) in the order they run."""
+
+
+def refresh(today=None, metrics=None):
+    """
+    Loads a CardSnapshot and runs STAGES over it. Returns (stage, seconds)
+    for the snapshot and every stage, seconds is None for a stage that
+    failed or was skipped because one it needs failed.
+    """
+    timings = []
+
+    def timed(name, func, *args):
+        start = time.time()
+        result = func(*args)
+        seconds = time.time() - start
+        timings.append((name, seconds))
+        if metrics is not None:
+            metrics.timing(name, seconds)
+        return result
+
+    snapshot = timed('snapshot', CardSnapshot(today).load)
+    if metrics is not None:
+        metrics.gauge('cards', len(snapshot.cards))
+
+    succeeded = set()
+    for name, needs, func in STAGES:
+        if not succeeded.issuperset(needs):
+            timings.append((name, None))
+            continue
+        try:
+            timed(name, func, snapshot)
+        except Exception, e:
+            log_exception(e, "refresh: the %s stage failed" % name)
+            timings.append((name, None))
+            if metrics is not None:
+                metrics.incr('%s.error' % name)
+            continue
+        succeeded.add(name)
+    return timings
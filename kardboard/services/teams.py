@@ -2,10 +2,18 @@ from dateutil.relativedelta import relativedelta
 from datetime import datetime
 from collections import defaultdict
 
+from kardboard.app import app
 from kardboard.models.kard import Kard
-from kardboard.models.states import States
+from kardboard.models.states import get_states
 from kardboard.models.team import Team, TeamList
-from kardboard.util import make_start_date, make_end_date, standard_deviation, average, median
+from kardboard.util import (
+    make_start_date,
+    make_end_date,
+    standard_deviation,
+    average,
+    median,
+    ConfigRegistry,
+)
 
 
 def setup_teams(config):
@@ -15,6 +23,19 @@ def setup_teams(config):
     return team_list
 
 
+_registry = ConfigRegistry(('CARD_TEAMS', ), setup_teams)
+
+
+def get_teams(config=None):
+    """
+    The process wide TeamList for the config. It's only rebuilt
+    when CARD_TEAMS is replaced.
+    """
+    if not config:
+        config = app.config
+    return _registry.get(config)
+
+
 class TeamStats(object):
     def __init__(self, team_name, exclude_classes=[]):
         self.team_name = team_name
@@ -68,7 +89,7 @@ class TeamStats(object):
         return [c for c in cycle_time_list if c is not None]
 
     def wip(self):
-        states = States()
+        states = get_states()
         wip = Kard.objects.filter(
             team=self.team_name,
             done_date=None,
@@ -30,4 +30,21 @@ $(function() {
     $( "tbody.sortable_table" ).disableSelection();
 
     $( "tbody.sortable_table" ).sortable( "disable" ); // Disable by default
-});
\ No newline at end of file
+});
+
+// Describes a drag and drop in a sortable backlog table as the
+// moved card's key plus the keys of its new neighbours, so the
+// server only has to re-rank the one card that moved.
+var backlog_move = function(item) {
+    var card_key = function(row) {
+        if (row.length === 0) {
+            return '';
+        }
+        return row.attr('id').replace(/^card_/, '');
+    };
+    return {
+        key: card_key(item),
+        before: card_key(item.prevAll('tr.card_in_backlog').first()),
+        after: card_key(item.nextAll('tr.card_in_backlog').first())
+    };
+};
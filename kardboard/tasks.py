@@ -1,14 +1,21 @@
 import datetime
 
 from dateutil import relativedelta
-import statsd
 
-from kardboard.models import Kard, Person, Q
+from kardboard.models import Kard, KardArchive, Q
 from flask.ext.celery import Celery
+from kardboard import querylog
+from kardboard.metrics import ScopedMetrics, init_celery as init_celery_metrics
+from kardboard.services import pipeline
+from kardboard.profiler import profileable
+from kardboard.locks import exclusive
 from kardboard.app import app
 from kardboard.util import log_exception
 
 celery = Celery(app)
+querylog.init_celery(app)
+init_celery_metrics(app)
+pipeline.init_celery(app)
 
 
 @celery.task(name="tasks.force_update_ticket", ignore_result=True)
@@ -20,18 +27,14 @@ def force_update_ticket(card_id):
 
 
 @celery.task(name="tasks.update_ticket", ignore_result=True)
+@profileable
 def update_ticket(card_id):
     from kardboard.app import app
 
-    statsd_conn = app.statsd.get_client('tasks.update_ticket')
-    consider_counter = statsd_conn.get_client('consider', class_=statsd.Counter)
-    update_counter = statsd_conn.get_client('update', class_=statsd.Counter)
-    error_counter = statsd_conn.get_client('error', class_=statsd.Counter)
+    metrics = ScopedMetrics('tasks.update_ticket')
+    timer = metrics.timer().start()
 
-    timer = statsd_conn.get_client(class_=statsd.Timer)
-    timer.start()
-
-    consider_counter += 1
+    metrics.incr('consider')
 
     logger = update_ticket.get_logger()
     try:
@@ -40,7 +43,7 @@ def update_ticket(card_id):
         k = Kard.objects.with_id(card_id)
         i = k.ticket_system.get_issue(k.key)
         origin_updated = getattr(i, 'updated')
-        local_updated = k.ticket_system_data.get('updated', None)
+        local_updated = k._ticket_updated
 
         should_update = False
         if not local_updated:
@@ -72,31 +75,42 @@ def update_ticket(card_id):
         if should_update:
             logger.info("update_ticket running for %s" % (k.key, ))
             try:
-                update_counter += 1
+                metrics.incr('update')
                 k.ticket_system.actually_update()
             except AttributeError:
-                error_counter += 1
+                metrics.incr('error')
                 logger.warning('Updating kard: %s and we got an AttributeError' % k.key)
                 raise
 
     except Kard.DoesNotExist:
-        error_counter += 1
+        metrics.incr('error')
         logger.error(
             "update_ticket: Kard with id %s does not exist" % (card_id, ))
     except Exception, e:
-        error_counter += 1
+        metrics.incr('error')
         message = "update_ticket: Couldn't update ticket %s from ticket system" % (card_id, )
         log_exception(e, message)
 
     timer.stop()
 
 
+def update_queue_querysets(old_time):
+    """
+    The cards queue_updates schedules: never synced, open and
+    stale, and done and stale.
+    """
+    new_cards = Kard.objects.filter(_ticket_system_updated_at__not__exists=True).unordered()
+    old_cards = Kard.objects.filter(_ticket_system_updated_at__lte=old_time, done_date=None).order_by('_ticket_system_updated_at')
+    old_done_cards = Kard.objects.done().filter(_ticket_system_updated_at__lte=old_time).order_by('_ticket_system_updated_at')
+    return new_cards, old_cards, old_done_cards
+
+
 @celery.task(name="tasks.queue_updates", ignore_result=True)
+@profileable
 def queue_updates():
     from kardboard.app import app
 
     logger = queue_updates.get_logger()
-    new_cards = Kard.objects.filter(_ticket_system_updated_at__not__exists=True)
 
     now = datetime.datetime.now()
     old_time = now - datetime.timedelta(seconds=app.config.get('TICKET_UPDATE_THRESHOLD', 60 * 60))
@@ -104,18 +118,16 @@ def queue_updates():
         "Looking for cards that haven't been updated since %s" % (old_time, )
     )
 
-    old_cards = Kard.objects.filter(_ticket_system_updated_at__lte=old_time, done_date=None).order_by('_ticket_system_updated_at')
-    old_done_cards = Kard.objects.done().filter(_ticket_system_updated_at__lte=old_time).order_by('_ticket_system_updated_at')
+    new_cards, old_cards, old_done_cards = update_queue_querysets(old_time)
 
-    statsd_conn = app.statsd.get_client('tasks.queue_updates')
-    gauge = statsd_conn.get_client(class_=statsd.Gauge)
+    metrics = ScopedMetrics('tasks.queue_updates')
 
     [update_ticket.delay(k.id) for k in new_cards]
-    gauge.send('new', len(new_cards))
+    metrics.gauge('new', len(new_cards))
     [update_ticket.delay(k.id) for k in old_cards]
-    gauge.send('old', len(old_cards))
+    metrics.gauge('old', len(old_cards))
     [update_ticket.delay(k.id) for k in old_done_cards.limit(75)]
-    gauge.send('done', len(old_done_cards.limit(75)))
+    metrics.gauge('done', len(old_done_cards.limit(75)))
 
     logger.info(
         "Queued updates -- NEW: %s EXISTING: %s DONE: %s" % (
@@ -125,48 +137,111 @@ def queue_updates():
 
 
 @celery.task(name="tasks.update_daily_record", ignore_result=True)
+@profileable
 def update_daily_record(target_date, group):
     from kardboard.models import DailyRecord
 
     logger = update_daily_record.get_logger()
 
-    should_recalc = False
-
-    # We need all this logic because this job can be pulled
-    # by two workers in parallel leading to a race condition
-    try:
-        dr = DailyRecord.objects.get(date=target_date, group=group)
-        one_minute_ago = datetime.datetime.now() - relativedelta.relativedelta(minutes=1)
-        if dr.updated_at <= one_minute_ago:
-            should_recalc = True
-        else:
-            logger.debug("DailyRecord: %s / %s was recalulcated in the last minute" % (target_date, group))
-    except DailyRecord.DoesNotExist:
-        should_recalc = True
-
-    if should_recalc:
-        DailyRecord.calculate(date=target_date, group=group)
-        logger.info("Successfully calculated DailyRecord: Date: %s / Group: %s" % (target_date, group))
+    # Two workers can pull this job for the same date and group,
+    # calculate holds a lease so only one of them does the work
+    DailyRecord.calculate(date=target_date, group=group)
+    logger.info("Successfully calculated DailyRecord: Date: %s / Group: %s" % (target_date, group))
 
-@celery.task(name="tasks.queue_daily_record_updates", ignore_result=True)
-def queue_daily_record_updates(days=365):
+@celery.task(name="tasks.update_daily_records", ignore_result=True)
+@profileable
+@exclusive
+def update_daily_records(target_date):
     from kardboard.app import app
-    from kardboard.util import make_end_date
+    from kardboard.models import DailyRecord, TeamDailyMetric
+
+    logger = update_daily_records.get_logger()
 
     report_groups = app.config.get('REPORT_GROUPS', {})
     group_slugs = report_groups.keys()
     group_slugs.append('all')
 
+    # Capture the per-team cube once, then every group is just a roll-up
+    TeamDailyMetric.capture(target_date)
+    for slug in group_slugs:
+        DailyRecord.calculate(date=target_date, group=slug, capture=False)
+    logger.info("Successfully calculated DailyRecords: Date: %s / Groups: %s" % (target_date, group_slugs))
+
+
+@celery.task(name="tasks.queue_daily_record_updates", ignore_result=True)
+@profileable
+def queue_daily_record_updates(days=365):
+    from kardboard.util import make_end_date
+
     now = datetime.datetime.now()
 
     for i in xrange(0, days):
         target_date = now - relativedelta.relativedelta(days=i)
         target_date = make_end_date(date=target_date)
-        for slug in group_slugs:
-            update_daily_record.delay(target_date, slug)
+        update_daily_records.delay(target_date)
+
+
+@celery.task(name="tasks.update_dirty_daily_records", ignore_result=True)
+@profileable
+@exclusive
+def update_dirty_daily_records(days=365):
+    """
+    Recalculates the DailyRecords, within the last days, that card
+    changes since the last run have made out of date.
+    """
+    from kardboard.models import DailyRecord, DirtyRange, TeamDailyMetric
+    from kardboard.util import make_start_date
+
+    logger = update_dirty_daily_records.get_logger()
+    metrics = ScopedMetrics('tasks.update_dirty_daily_records')
+
+    since = make_start_date(
+        date=datetime.datetime.now() - relativedelta.relativedelta(days=days))
+    ids, dates = DirtyRange.collect(since)
+    skipped = {}
+    for target_date in sorted(dates.keys()):
+        TeamDailyMetric.capture(target_date)
+        for slug in sorted(dates[target_date]):
+            record = DailyRecord.recalculate(date=target_date, group=slug, capture=False)
+            if record is None:
+                # Another worker holds it and may have read the metrics
+                # before the capture above, try it again next run
+                skipped.setdefault(target_date, set()).add(slug)
+    DirtyRange.requeue(skipped)
+    # Only the ranges read above, cards changed since are left for the next run
+    DirtyRange.clear(ids)
+
+    skipped_count = sum([len(groups) for groups in skipped.values()])
+    metrics.gauge('dates', len(dates))
+    metrics.gauge('records', sum([len(groups) for groups in dates.values()]) - skipped_count)
+    metrics.gauge('skipped', skipped_count)
+    logger.info("Recalculated DailyRecords for %s dirty dates from %s ranges, %s skipped" % (len(dates), len(ids), skipped_count))
+
+
+@celery.task(name="tasks.rollup_report_group", ignore_result=True)
+@profileable
+def rollup_report_group(group, days=365):
+    """
+    Builds a report group's DailyRecord history from the TeamDailyMetric
+    rows already captured, without touching the Kard collection.
+    Useful right after adding a new REPORT_GROUPS entry.
+    """
+    from kardboard.models import DailyRecord, TeamDailyMetric
+    from kardboard.util import make_start_date
+
+    logger = rollup_report_group.get_logger()
+
+    start_date = make_start_date(
+        date=datetime.datetime.now() - relativedelta.relativedelta(days=days))
+    dates = TeamDailyMetric.objects.filter(date__gte=start_date).distinct('date')
+    for target_date in dates:
+        DailyRecord.calculate(date=target_date, group=group, capture=False)
+    logger.info("Rolled up %s DailyRecords for %s" % (len(dates), group))
 
 
 @celery.task(name="tasks.queue_service_class_reports", ignore_result=True)
+@profileable
+@exclusive
 def queue_service_class_reports():
     from kardboard.app import app
     from kardboard.models import ServiceClassRecord, ServiceClassSnapshot
@@ -199,85 +274,113 @@ def queue_service_class_reports():
 
 
 @celery.task(name="tasks.update_flow_reports", ignore_result=True)
+@profileable
+@exclusive
 def update_flow_reports():
     from kardboard.app import app
-    from kardboard.models import FlowReport
+    from kardboard.models import FlowReport, TeamDailyMetric
+    from kardboard.util import now
 
     report_groups = app.config.get('REPORT_GROUPS', {})
     group_slugs = report_groups.keys()
     group_slugs.append('all')
 
+    TeamDailyMetric.capture(now())
     for slug in group_slugs:
-        FlowReport.capture(slug)
+        FlowReport.capture(slug, capture=False)
+
+
+@celery.task(name="tasks.update_leaderboard_records", ignore_result=True)
+@profileable
+def update_leaderboard_records(months=2):
+    from kardboard.app import app
+    from kardboard.models import LeaderboardRecord
+    from kardboard.util import now
+
+    logger = update_leaderboard_records.get_logger()
+
+    report_groups = app.config.get('REPORT_GROUPS', {})
+    group_slugs = report_groups.keys()
+    group_slugs.append('all')
+
+    # Only completed months are materialised, the current month
+    # is always computed live by the leaderboard view.
+    this_month = now().replace(day=1)
+    for i in xrange(1, months + 1):
+        target_month = this_month - relativedelta.relativedelta(months=i)
+        for slug in group_slugs:
+            LeaderboardRecord.calculate(target_month, slug)
+            logger.info("LeaderboardRecord: %s / %s" % (slug, target_month.strftime("%Y-%m")))
+
+
+@celery.task(name="tasks.sync_report_groups", ignore_result=True)
+def sync_report_groups():
+    logger = sync_report_groups.get_logger()
+    Kard.sync_report_groups()
+    KardArchive.sync_report_groups()
+    logger.info("Synced Kard.report_groups with REPORT_GROUPS")
 
 
-def _get_person(name, cache):
-    p = cache.get(name, None)
-    if not p:
-        try:
-            p = Person.objects.get(name=name)
-        except Person.DoesNotExist:
-            p = Person(name=name)
-        cache[name] = p
-    return p
+@celery.task(name="tasks.archive_done_cards", ignore_result=True)
+@profileable
+def archive_done_cards(months=None):
+    logger = archive_done_cards.get_logger()
+    moved = KardArchive.archive(months)
+    logger.info("Archived %s cards" % moved)
 
 
 @celery.task(name="tasks.normalize_people", ignore_result=True)
+@profileable
+@exclusive
 def normalize_people(days=7):
+    from kardboard.services.reports import update_people
+
     logger = normalize_people.get_logger()
-    people_cache = {}
 
     if app.config.get('DISABLE_TASK_PEOPLE', False):
         logger.debug("SKIPPING normalize_people because DISABLE_TASK_PEOPLE is True")
         return None
 
     one_week_ago = datetime.datetime.now() - relativedelta.relativedelta(days=days)
-    kards = Kard.objects.filter(Q(start_date__gte=one_week_ago) | Q(done_date__gte=one_week_ago))
-
-    for k in kards:
-        logger.debug("Considering %s" % k.key)
-        reporter = k.ticket_system_data.get('reporter', '')
-        devs = k.ticket_system_data.get('developers', [])
-        testers = k.ticket_system_data.get('qaers', [])
-
-        logger.debug("Reporter: %s / Devs: %s / Testers: %s" % (reporter, devs, testers))
+    kards = Kard.objects.filter(Q(start_date__gte=one_week_ago) | Q(done_date__gte=one_week_ago)).unordered()
+    people = update_people(kards)
+    logger.info("Updated %s people from the last %s days" % (people, days))
 
-        if reporter:
-            p = _get_person(reporter, people_cache)
-            p.report(k)
 
-        for d in devs:
-            p = _get_person(d, people_cache)
-            p.develop(k)
+@celery.task(name="tasks.refresh_reports", ignore_result=True)
+@profileable
+@exclusive
+def refresh_reports():
+    """
+    Refreshes today's FlowReports, DailyRecords and service class
+    reports and the recently active people over one snapshot of the cards.
+    """
+    from kardboard.services.reports import refresh
 
-        for t in testers:
-            p = _get_person(t, people_cache)
-            p.test(k)
-
-    for name, person in people_cache.items():
-        person.save()
+    logger = refresh_reports.get_logger()
+    timings = refresh(metrics=ScopedMetrics('tasks.refresh_reports'))
+    logger.info("Refreshed reports: %s" % ", ".join([
+        "%s %s" % (name, "failed" if seconds is None else "%.2fs" % seconds)
+        for name, seconds in timings]))
 
 
 @celery.task(name="tasks.jira_add_team_cards", ignore_result=True)
 def jira_add_team_cards(team, filter_id):
     from kardboard.tickethelpers import JIRAHelper
-    from kardboard.models import States
+    from kardboard.models import get_states
     from kardboard.app import app
 
-    statsd_conn = app.statsd.get_client('tasks.jira_add_team_cards')
-
-    counter = statsd_conn.get_client(class_=statsd.Counter)
-    total_timer = statsd_conn.get_client(class_=statsd.Timer)
-    total_timer.start()
+    metrics = ScopedMetrics('tasks.jira_add_team_cards')
+    total_timer = metrics.timer().start()
 
     logger = jira_add_team_cards.get_logger()
     logger.info("JIRA BACKLOG SYNC %s: %s" % (team, filter_id))
-    states = States()
+    states = get_states()
     helper = JIRAHelper(app.config, None)
     issues = helper.service.getIssuesFromFilter(helper.auth, filter_id)
     for issue in issues:
-        if Kard.objects.filter(key=issue.key):
-            # Card exists, pass
+        if Kard.objects.filter(key=issue.key).only('key').first() or KardArchive.exists(issue.key):
+            # Card exists, or existed and was archived, pass
             pass
         else:
             logger.info("JIRA BACKLOGGING %s: %s" % (team, issue.key))
@@ -291,7 +394,7 @@ def jira_add_team_cards(team, filter_id):
             c = Kard(**defaults)
             c.ticket_system.actually_update(issue)
             c.save()
-            counter += 1
+            metrics.incr()
 
     total_timer.stop()
 
@@ -28,6 +28,7 @@ class KardboardTestCase(unittest2.TestCase):
         app.config['MONGODB_DB'] = 'kardboard_unittest'
         app.config['TESTING'] = True
         app.config['CELERY_ALWAYS_EAGER'] = True
+        app.config['TASK_LOCK_BACKEND'] = 'file'
         connect(app.config['MONGODB_DB'])
         app.db = MongoEngine(app)
 
@@ -0,0 +1,112 @@
+from dateutil.relativedelta import relativedelta
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class KardArchiveTests(KardboardTestCase):
+    def setUp(self):
+        super(KardArchiveTests, self).setUp()
+        from kardboard.models import get_states
+        self.states = get_states()
+        self.today = self._date('end')
+
+        self.old_card = self._done_card(months=-30)
+        self.recent_card = self._done_card(months=-1)
+
+    def _done_card(self, months):
+        done_date = self.today + relativedelta(months=months)
+        k = self.make_card(
+            backlog_date=done_date - relativedelta(days=10),
+            start_date=done_date - relativedelta(days=5),
+            done_date=done_date,
+            team='Team 1',
+            state=self.states.done,
+        )
+        k.save()
+        return k
+
+    def _get_target_class(self):
+        from kardboard.models import KardArchive
+        return KardArchive
+
+    def test_archive(self):
+        from kardboard.models import StateLog
+        klass = self._get_target_class()
+        Kard = self._get_card_class()
+
+        self.assertEqual(1, klass.archive(months=24))
+
+        self.assertEqual([self.recent_card.key], [k.key for k in Kard.objects.all()])
+        self.assertEqual(1, klass.cards().find({'key': self.old_card.key}).count())
+        self.assertEqual(0, StateLog._get_collection().find({'card': self.old_card.id}).count())
+
+        # Running it again has nothing left to move
+        self.assertEqual(0, klass.archive(months=24))
+
+    def test_archive_disabled(self):
+        klass = self._get_target_class()
+        self.assertEqual(0, klass.archive(months=0))
+
+    def test_with_archive(self):
+        klass = self._get_target_class()
+        Kard = self._get_card_class()
+        klass.archive(months=24)
+
+        done = Kard.objects.done()
+        self.assertEqual(1, done.count())
+        self.assertEqual(2, done.with_archive().count())
+
+        keys = [k.key for k in done.order_by('-done_date').with_archive()]
+        self.assertEqual([self.recent_card.key, self.old_card.key], keys)
+
+    def test_metrics_include_archive(self):
+        from kardboard.models import TeamDailyMetric
+        klass = self._get_target_class()
+        klass.archive(months=24)
+
+        TeamDailyMetric.capture(self.today)
+        totals = TeamDailyMetric.rollup(self.today)
+        self.assertEqual(2, totals['done'])
+
+    def test_restore(self):
+        klass = self._get_target_class()
+        Kard = self._get_card_class()
+        klass.archive(months=24)
+
+        card = klass.restore(self.old_card.key)
+        self.assertEqual(self.old_card.key, card.key)
+        self.assertEqual(2, Kard.objects.count())
+        self.assertEqual(0, klass.cards().count())
+
+    def test_card_page(self):
+        klass = self._get_target_class()
+        klass.archive(months=24)
+
+        res = self.app.get('/card/%s/' % self.old_card.key)
+        self.assertEqual(200, res.status_code)
+        self.assertTrue('Archived' in res.data)
+
+        res = self.app.get('/quick/?key=%s' % self.old_card.key)
+        self.assertEqual(302, res.status_code)
+        self.assertTrue(res.headers['Location'].endswith('/card/%s/' % self.old_card.key))
+
+    def test_exists(self):
+        klass = self._get_target_class()
+        klass.archive(months=24)
+        self.assertTrue(klass.exists(self.old_card.key))
+        self.assertFalse(klass.exists(self.recent_card.key))
+
+    def test_archive_recreated_key(self):
+        klass = self._get_target_class()
+        Kard = self._get_card_class()
+        klass.archive(months=24)
+
+        # The same ticket is added again and finishes long ago too
+        recreated = self._done_card(months=-26)
+        recreated.key = self.old_card.key
+        recreated.save()
+
+        self.assertEqual(1, klass.archive(months=24))
+        docs = list(klass.cards().find({'key': self.old_card.key}))
+        self.assertEqual([recreated.id], [d['_id'] for d in docs])
+        self.assertEqual(1, Kard.objects.count())
@@ -0,0 +1,80 @@
+import datetime
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class LeaseTests(KardboardTestCase):
+    def _get_target_class(self):
+        from kardboard.models import Lease
+        return Lease
+
+    def test_acquire(self):
+        klass = self._get_target_class()
+        holder = klass.acquire('work', seconds=60)
+        self.assertTrue(holder)
+        self.assertEqual(None, klass.acquire('work', seconds=60))
+        self.assertTrue(klass.acquire('other work', seconds=60))
+
+        klass.release('work', holder)
+        self.assertTrue(klass.acquire('work', seconds=60))
+
+    def test_expired(self):
+        klass = self._get_target_class()
+        klass.acquire('work', seconds=-1)
+        self.assertTrue(klass.acquire('work', seconds=60))
+
+    def test_release_by_holder_only(self):
+        klass = self._get_target_class()
+        holder = klass.acquire('work', seconds=60)
+        klass.release('work', 'someone else')
+        self.assertEqual(None, klass.acquire('work', seconds=60))
+        klass.release('work', holder)
+
+    def test_leased(self):
+        from kardboard.models.atomic import leased
+        with leased('work') as held:
+            self.assertTrue(held)
+            with leased('work') as also_held:
+                self.assertFalse(also_held)
+        self.assertEqual(0, self._get_target_class().objects.count())
+
+
+class AtomicReportWriteTests(KardboardTestCase):
+    def setUp(self):
+        super(AtomicReportWriteTests, self).setUp()
+        self.today = self._date('end')
+        k = self.make_card(team='Team 1', state='Todo')
+        k.save()
+
+    def test_find_and_upsert(self):
+        from kardboard.models import find_and_upsert, FlowReport
+        query = {'date': self.today, 'group': 'all'}
+        first = find_and_upsert(FlowReport, query,
+            state_counts={'Todo': 1}, updated_at=datetime.datetime.now())
+        second = find_and_upsert(FlowReport, query,
+            state_counts={'Todo': 2}, updated_at=datetime.datetime.now())
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(1, FlowReport.objects.count())
+        self.assertEqual({'Todo': 2}, FlowReport.objects.get().state_counts)
+
+    def test_daily_record(self):
+        record = self._get_record_class().calculate(self.today, group='all')
+        self.assertEqual(1, record.backlog)
+        record = self._get_record_class().calculate(self.today, group='all')
+        self.assertEqual(1, self._get_record_class().objects.count())
+
+    def test_daily_record_leased_elsewhere(self):
+        from kardboard.models import Lease
+        klass = self._get_record_class()
+        Lease.acquire('DailyRecord:%s:all' % self.today.strftime('%Y-%m-%d'))
+
+        self.assertEqual(None, klass.calculate(self.today, group='all'))
+        self.assertEqual(0, klass.objects.count())
+
+    def test_flow_report(self):
+        from kardboard.models import FlowReport
+        report = FlowReport.capture(group='all')
+        self.assertEqual(1, report.state_counts['Todo'])
+        FlowReport.capture(group='all')
+        self.assertEqual(1, FlowReport.objects.count())
@@ -0,0 +1,73 @@
+from kardboard.tests.core import KardboardTestCase
+
+
+class BacklogServiceTests(KardboardTestCase):
+    def setUp(self):
+        super(BacklogServiceTests, self).setUp()
+        from kardboard.models import States
+        from kardboard.services import backlog
+        self.service = backlog
+        self.states = States()
+        self.team = 'Team 1'
+
+        self.keys = []
+        for i in xrange(0, 4):
+            k = self.make_card(
+                team=self.team,
+                state=self.states.backlog,
+                priority=(i + 1) * backlog.RANK_GAP,
+            )
+            k.save()
+            self.keys.append(k.key)
+
+    def _ordered_keys(self):
+        return [c.key for c in self.service.team_backlog(self.team)]
+
+    def test_rank_between(self):
+        self.assertEqual(1536, self.service.rank_between(1024, 2048))
+        self.assertEqual(512, self.service.rank_between(None, 1024))
+        self.assertEqual(2048 + self.service.RANK_GAP,
+            self.service.rank_between(2048, None))
+        self.assertEqual(None, self.service.rank_between(4, 5))
+
+    def test_move_only_writes_moved_card(self):
+        moving = self.keys[3]
+        writes = self.service.move_card(self.team, moving,
+            before_key=self.keys[0], after_key=self.keys[1])
+
+        self.assertEqual(1, writes)
+        expected = [self.keys[0], moving, self.keys[1], self.keys[2]]
+        self.assertEqual(expected, self._ordered_keys())
+
+    def test_move_to_top(self):
+        moving = self.keys[2]
+        self.service.move_card(self.team, moving, after_key=self.keys[0])
+
+        self.assertEqual(moving, self._ordered_keys()[0])
+
+    def test_move_renumbers_when_out_of_room(self):
+        Kard = self._get_card_class()
+        Kard.objects(key=self.keys[0]).update_one(set__priority=1)
+        Kard.objects(key=self.keys[1]).update_one(set__priority=2)
+
+        moving = self.keys[3]
+        writes = self.service.move_card(self.team, moving,
+            before_key=self.keys[0], after_key=self.keys[1])
+
+        self.assertTrue(writes > 1)
+        expected = [self.keys[0], moving, self.keys[1], self.keys[2]]
+        self.assertEqual(expected, self._ordered_keys())
+
+        priorities = [c.priority for c in self.service.team_backlog(self.team)]
+        expected = [(i + 1) * self.service.RANK_GAP for i in xrange(0, 4)]
+        self.assertEqual(expected, priorities)
+
+    def test_backlog_view_post(self):
+        moving = self.keys[3]
+        res = self.app.post('/team/team-1/backlog/', data={
+            'key': moving,
+            'before': self.keys[0],
+            'after': self.keys[1],
+        })
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(moving, self._ordered_keys()[1])
@@ -0,0 +1,108 @@
+import datetime
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class DirtyRangeTests(KardboardTestCase):
+    def setUp(self):
+        super(DirtyRangeTests, self).setUp()
+        self.today = self.now()
+        self.card = self.make_card(team='Team 1',
+            backlog_date=self.today - datetime.timedelta(days=10))
+        self.card.save()
+
+    def _get_target_class(self):
+        from kardboard.models import DirtyRange
+        return DirtyRange
+
+    def test_created(self):
+        klass = self._get_target_class()
+        self.assertEqual(set(['all', 'team-1']),
+            set([r.group for r in klass.objects.all()]))
+
+        ids, dates = klass.collect()
+        self.assertEqual(11, len(dates))
+        self.assertEqual(set(['all', 'team-1']), dates[max(dates.keys())])
+
+    def test_unchanged_save(self):
+        klass = self._get_target_class()
+        klass.objects.delete()
+        self.card.title = "A new title"
+        self.card.save()
+        self.assertEqual(0, klass.objects.count())
+
+    def test_started(self):
+        klass = self._get_target_class()
+        klass.objects.delete()
+        self.card.start_date = self.today - datetime.timedelta(days=2)
+        self.card.save()
+
+        ids, dates = klass.collect()
+        self.assertEqual(3, len(dates))
+
+    def test_loaded_card_started(self):
+        klass = self._get_target_class()
+        klass.objects.delete()
+        card = self._get_card_class().objects.get(key=self.card.key)
+        card.start_date = self.today - datetime.timedelta(days=4)
+        card.save()
+
+        ids, dates = klass.collect()
+        self.assertEqual(5, len(dates))
+        self.assertEqual(set(['all', 'team-1']), set([r.group for r in klass.objects.all()]))
+
+    def test_deleted(self):
+        klass = self._get_target_class()
+        klass.objects.delete()
+        self.card.delete()
+        self.assertEqual(2, klass.objects.count())
+
+    def test_collect_since(self):
+        klass = self._get_target_class()
+        ids, dates = klass.collect(self.today - datetime.timedelta(days=2))
+        self.assertEqual(3, len(dates))
+
+    def test_update_dirty_daily_records(self):
+        from kardboard.models import DailyRecord
+        from kardboard.tasks import update_dirty_daily_records
+        update_dirty_daily_records.apply()
+
+        self.assertEqual(22, DailyRecord.objects.count())
+        self.assertEqual(0, self._get_target_class().objects.count())
+        record = DailyRecord.objects.get(date=self._date('end'), group='team-1')
+        self.assertEqual(1, record.backlog)
+
+    def test_update_dirty_daily_records_leased(self):
+        from kardboard.models import DailyRecord, Lease
+        from kardboard.tasks import update_dirty_daily_records
+        klass = self._get_target_class()
+        today = self._date('end')
+        key = 'DailyRecord:%s:team-1' % today.strftime('%Y-%m-%d')
+        holder = Lease.acquire(key)
+        try:
+            update_dirty_daily_records.apply()
+        finally:
+            Lease.release(key, holder)
+
+        self.assertEqual(21, DailyRecord.objects.count())
+        left = klass.objects.get()
+        self.assertEqual('team-1', left.group)
+        ids, dates = klass.collect()
+        self.assertEqual({today: set(['team-1'])}, dates)
+
+    def test_requeue(self):
+        klass = self._get_target_class()
+        klass.objects.delete()
+        day = self._date('end')
+        klass.requeue({
+            day: set(['all', 'team-1']),
+            day - datetime.timedelta(days=1): set(['all']),
+            day - datetime.timedelta(days=3): set(['all']),
+        })
+
+        spans = sorted([(r.group, r.start_date, r.end_date) for r in klass.objects.all()])
+        self.assertEqual(3, len(spans))
+        ids, dates = klass.collect()
+        self.assertEqual(set(['all']), dates[day - datetime.timedelta(days=1)])
+        self.assertFalse(day - datetime.timedelta(days=2) in dates)
+        self.assertEqual(set(['all', 'team-1']), dates[day])
@@ -127,6 +127,23 @@ class CardFormTest(FormTests):
         f.validate()
         self.assertIn('key', f.errors.keys())
 
+    def test_key_uniqueness_case_insensitive(self):
+        klass = self._get_card_class()
+        del self.required_data['priority']
+        c = klass(**self.required_data)
+        c.backlog_date = datetime.datetime.now()
+        c.save()
+
+        self.required_data['key'] = u' cmsif-199 '
+        f = self.Form(self._post_data())
+        f.validate()
+        self.assertIn('key', f.errors.keys())
+
+    def test_key_uniqueness_new_key(self):
+        f = self.Form(self._post_data())
+        f.validate()
+        self.assertNotIn('key', f.errors.keys())
+
     def test_start_date_requiredness(self):
         """
         If the state is set to >= START_STATE then
@@ -0,0 +1,76 @@
+from dateutil.relativedelta import relativedelta
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class LeaderboardRecordTests(KardboardTestCase):
+    def setUp(self):
+        super(LeaderboardRecordTests, self).setUp()
+        self.config['DEFECT_TYPES'] = ['Bug', ]
+        self.last_month = self.now().replace(day=15) - relativedelta(months=1)
+        self._set_up_cards()
+
+    def tearDown(self):
+        super(LeaderboardRecordTests, self).tearDown()
+        del self.config['DEFECT_TYPES']
+
+    def _set_up_cards(self):
+        done_date = self.last_month
+        start_date = done_date - relativedelta(days=4)
+        backlog_date = done_date - relativedelta(days=10)
+
+        for devs, card_type in ((['alice', 'bob'], 'Feature'),
+                                (['alice', ], 'Feature'),
+                                (['alice', ], 'Bug')):
+            k = self.make_card(
+                backlog_date=backlog_date,
+                start_date=start_date,
+                done_date=done_date,
+                team='Team 1',
+            )
+            k._ticket_system_data = {'developers': devs}
+            k.save()
+            k._type = card_type
+            k.update(set___type=card_type)
+
+    def _get_target_class(self):
+        from kardboard.models import LeaderboardRecord
+        return LeaderboardRecord
+
+    def test_aggregate(self):
+        from kardboard.util import month_range
+        start_date, end_date = month_range(self.last_month)
+
+        rows = self._get_target_class().aggregate(start_date, end_date)
+        people = dict([(r['name'], r) for r in rows])
+
+        self.assertEqual(2, people['alice']['cards'])
+        self.assertEqual(1, people['alice']['defects'])
+        self.assertEqual(12, people['alice']['cycle_time_total'])
+        self.assertEqual(1, people['bob']['cards'])
+        self.assertEqual(0, people['bob']['defects'])
+
+    def test_completed_months_are_materialised(self):
+        from kardboard.util import month_ranges
+        klass = self._get_target_class()
+
+        ranges = month_ranges(self.now(), 2)
+        people = klass.people_for_ranges(ranges)
+        people.sort(reverse=True)
+
+        self.assertEqual(1, klass.objects.count())
+        self.assertEqual('alice', people[0].name)
+        self.assertEqual(2, people[0].count)
+        self.assertEqual(4, people[0].cycle_time)
+
+    def test_leaderboard_view(self):
+        res = self.app.get('/reports/all/leaderboard/2/')
+        self.assertEqual(200, res.status_code)
+        self.assertIn('alice', res.data)
+
+    def test_leaderboard_person_view(self):
+        res = self.app.get('/reports/all/leaderboard/2/alice/')
+        self.assertEqual(200, res.status_code)
+
+        res = self.app.get('/reports/all/leaderboard/2/nobody/')
+        self.assertEqual(404, res.status_code)
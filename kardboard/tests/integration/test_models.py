@@ -292,6 +292,26 @@ class StatesTests(KardboardTestCase):
         )
         self.assertEqual(expected, states.for_forms)
 
+    def test_get_states_is_shared(self):
+        from kardboard.models import get_states
+        states = get_states(self.config)
+        self.assertTrue(states is get_states(self.config))
+        self.assertRaises(TypeError, states.in_progress.append, 'Deploy')
+
+    def test_get_states_rebuilds_on_config_change(self):
+        from kardboard.models import get_states
+        states = get_states(self.config)
+        self.config['CARD_STATES'] = ('Backlog', 'In Progress', 'Done')
+        rebuilt = get_states(self.config)
+
+        self.assertTrue(states is not rebuilt)
+        self.assertEqual(['In Progress', ], rebuilt.in_progress)
+
+    def test_index_of_unknown_state(self):
+        states = self._make_one()
+        self.assertEqual(2, states.index('Deploy'))
+        self.assertRaises(ValueError, states.index, 'Nope')
+
 
 class DailyRecordTests(KardboardTestCase):
     def setUp(self):
@@ -611,6 +631,80 @@ class KardTests(KardTestCase):
         diff = now - updated_at
         self.assert_(diff.seconds <= 1)
 
+    def test_ticket_system_data_stored_separately(self):
+        from kardboard.models import TicketPayload
+        klass = self._get_target_class()
+        k = self._make_one()
+        k._ticket_system_data = {
+            'summary': 'Stand',
+            'reporter': 'gob',
+            'developers': ['michael', 'buster'],
+            'description': 'There is always money in the banana stand.',
+        }
+        k.save()
+
+        raw = klass._get_collection().find_one({'_id': k.id})
+        self.assertFalse('_ticket_system_data' in raw)
+        self.assertEqual(['michael', 'buster'], raw['developers'])
+        self.assertEqual('gob', raw['reporter'])
+        self.assertEqual(1, TicketPayload.objects(card=k.id).count())
+
+        fetched = klass.objects.get(id=k.id)
+        self.assertEqual(None, fetched._ticket_payload)
+        self.assertEqual('Stand', fetched.title)
+        self.assertEqual('There is always money in the banana stand.',
+            fetched.ticket_system_data['description'])
+
+        fetched.delete()
+        self.assertEqual(0, TicketPayload.objects(card=k.id).count())
+
+    def test_save_without_payload_change(self):
+        import mock
+        from kardboard.models import TicketPayload
+        klass = self._get_target_class()
+        k = self._make_one()
+        k._ticket_system_data = {'summary': 'Stand', 'reporter': 'gob'}
+        k.save()
+
+        fetched = klass.objects.get(id=k.id)
+        fetched.priority = 3
+        with mock.patch.object(TicketPayload, 'load') as load:
+            fetched.save()
+            self.assertFalse(load.called)
+        self.assertEqual('Stand', fetched.title)
+        self.assertEqual('gob', fetched.reporter)
+
+        fetched._ticket_system_data = {'summary': 'Banana', 'reporter': 'gob'}
+        fetched.save()
+        self.assertEqual('Banana', klass.objects.get(id=k.id).title)
+
+    def test_ticket_system_data_compressed(self):
+        from kardboard.models import TicketPayload, TicketMetadata
+        klass = self._get_target_class()
+        self.config['TICKET_PAYLOAD_COMPRESSION'] = True
+        try:
+            status = {'id': '6', 'name': 'Closed', 'icon': 'status_closed.gif'}
+            k = self._make_one()
+            k._ticket_system_data = {
+                'summary': 'Stand',
+                'status': status,
+                'updated': datetime.datetime(2011, 5, 2, 8, 30),
+            }
+            k.save()
+        finally:
+            self.config['TICKET_PAYLOAD_COMPRESSION'] = False
+
+        raw = TicketPayload._get_collection().find_one({'_id': k.id})
+        self.assertFalse('data' in raw)
+        self.assertTrue(raw['blob'])
+        self.assertEqual(1, TicketMetadata.objects(ref='status:6').count())
+
+        fetched = klass.objects.get(id=k.id)
+        self.assertEqual(status, fetched.ticket_system_data['status'])
+        self.assertEqual(datetime.datetime(2011, 5, 2, 8, 30),
+            fetched.ticket_system_data['updated'])
+        self.assertEqual('Closed', fetched.ticket_status['name'])
+
     def test_priority(self):
         klass = self._get_target_class()
         klass.objects.all().delete()
@@ -735,6 +829,24 @@ class KardWarningTests(KardTestCase):
         self.wip_card.save()
         self.assertEqual(2, self.wip_card.cycle_vs_goal)
 
+    def test_service_class_is_shared(self):
+        other = self.make_card()
+        self.assertTrue(self.wip_card.service_class is other.service_class)
+        self.assertEqual('default', self.wip_card.service_class['name'])
+        self.assertRaises(TypeError, self.wip_card.service_class.update, {})
+
+    def test_evaluate_goals(self):
+        today = datetime.datetime(year=2011, month=5, day=20)
+        speedy = self.make_card(
+            start_date=datetime.datetime(year=2011, month=5, day=9),
+            _service_class="Speedy",
+        )
+        self._get_card_class().evaluate_goals([self.wip_card, speedy], today)
+
+        self.assertEqual(0, self.wip_card.cycle_vs_goal)
+        self.assertEqual(2, speedy.cycle_vs_goal)
+        self.assertEqual('Speedy', speedy.service_class.name)
+
 
 class KardBlockingTests(KardTestCase):
     def setUp(self):
@@ -0,0 +1,69 @@
+import datetime
+
+import mock
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class PipelineHealthTests(KardboardTestCase):
+    def setUp(self):
+        super(PipelineHealthTests, self).setUp()
+        self.today = self.now()
+        for hours in (0, 2, 2, 30, 24 * 10, None):
+            k = self.make_card()
+            if hours is not None:
+                k._ticket_system_updated_at = self.today - datetime.timedelta(hours=hours, minutes=1)
+            k.save()
+
+    def test_sync_ages(self):
+        from kardboard.services.pipeline import sync_ages
+        ages = sync_ages(self.today)
+        self.assertEqual([1, 2, 0, 1, 1, 1], [count for label, count in ages])
+        self.assertEqual('Never', ages[-1][0])
+
+    def test_periodic_task_tracked(self):
+        from kardboard.models import TaskRun
+        from kardboard.services.pipeline import periodic_tasks
+        from kardboard.tasks import refresh_reports
+        refresh_reports.apply()
+
+        run = TaskRun.objects.get(name='tasks.refresh_reports')
+        self.assertEqual(1, run.runs)
+        self.assertTrue(run.last_duration >= 0)
+
+        rows = dict([(r['task'], r) for r in periodic_tasks()])
+        self.assertEqual(run.name, rows['tasks.refresh_reports']['run'].name)
+        self.assertEqual(None, rows['tasks.queue_updates']['run'])
+
+    def test_failed_periodic_task(self):
+        from kardboard.models import TaskRun
+        from kardboard.tasks import refresh_reports
+        with mock.patch('kardboard.services.reports.refresh') as refresh:
+            refresh.side_effect = RuntimeError('boom')
+            refresh_reports.apply()
+
+        run = TaskRun.objects.get(name='tasks.refresh_reports')
+        self.assertEqual('boom', run.last_error)
+        self.assertTrue(run.last_failed)
+        self.assertEqual(None, run.last_finished)
+        self.assertEqual(0, run.runs)
+
+    def test_unscheduled_task_not_tracked(self):
+        from kardboard.models import TaskRun
+        from kardboard.tasks import update_daily_record
+        update_daily_record.apply(args=(self.today, 'all'))
+        self.assertEqual(0, TaskRun.objects.count())
+
+    def test_report_freshness(self):
+        from kardboard.models import FlowReport
+        from kardboard.services.pipeline import report_freshness
+        FlowReport.capture(group='all')
+
+        rows = dict([(r['group'], r) for r in report_freshness(self.today)])
+        self.assertTrue(rows['all']['flow_report'] is not None)
+        self.assertEqual(None, rows['team-1']['flow_report'])
+
+    def test_page(self):
+        res = self.app.get('/ops/')
+        self.assertEqual(200, res.status_code)
+        self.assertTrue('Never' in res.data)
@@ -0,0 +1,66 @@
+import mock
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class ProfilerTests(KardboardTestCase):
+    def setUp(self):
+        super(ProfilerTests, self).setUp()
+        self.config['PROFILING_ENABLED'] = True
+        self.card = self.make_card()
+        self.card.save()
+
+    def tearDown(self):
+        self.config['PROFILING_ENABLED'] = False
+        super(ProfilerTests, self).tearDown()
+
+    def _get_target_class(self):
+        from kardboard.models import ProfileRun
+        return ProfileRun
+
+    def test_request(self):
+        res = self.app.get('/card/%s/?_profile=1' % self.card.key)
+        self.assertEqual(200, res.status_code)
+
+        run = self._get_target_class().objects.get()
+        self.assertEqual(str(run.id), res.headers['X-Profile-Id'])
+        self.assertEqual('request', run.kind)
+        self.assertEqual('card', run.name)
+        self.assertTrue(run.stats)
+        self.assertTrue(run.query_count > 0)
+
+        res = self.app.get('/profiles/%s/' % run.id)
+        self.assertEqual(200, res.status_code)
+        self.assertEqual(200, self.app.get('/profiles/').status_code)
+
+    def test_view_raises(self):
+        from kardboard.querylog import _active
+
+        with mock.patch('kardboard.views.render_template') as render:
+            render.side_effect = RuntimeError('boom')
+            self.assertRaises(RuntimeError, self.app.get,
+                '/card/%s/?_profile=1' % self.card.key)
+
+        self.assertFalse(_active())
+        self.assertEqual(1, self._get_target_class().objects.count())
+
+    def test_not_asked_for(self):
+        res = self.app.get('/card/%s/' % self.card.key)
+        self.assertFalse('X-Profile-Id' in res.headers)
+        self.assertEqual(0, self._get_target_class().objects.count())
+
+    def test_disabled(self):
+        self.config['PROFILING_ENABLED'] = False
+        self.app.get('/card/%s/?_profile=1' % self.card.key)
+        self.assertEqual(0, self._get_target_class().objects.count())
+
+    def test_task(self):
+        from kardboard.tasks import update_flow_reports
+        update_flow_reports.apply(kwargs={'_profile': True})
+
+        run = self._get_target_class().objects.get()
+        self.assertEqual('task', run.kind)
+        self.assertEqual('tasks.update_flow_reports', run.name)
+
+    def test_unknown(self):
+        self.assertEqual(404, self.app.get('/profiles/nope/').status_code)
@@ -0,0 +1,247 @@
+import datetime
+
+from bson import ObjectId
+
+from kardboard.tests.core import KardboardTestCase
+
+
+SORT_THRESHOLD = 200
+"""The most documents a hot query may sort in memory."""
+
+
+def _stages(stage):
+    if not stage:
+        return []
+    children = list(stage.get('inputStages') or [])
+    if stage.get('inputStage'):
+        children.append(stage['inputStage'])
+    stages = [stage]
+    for child in children:
+        stages.extend(_stages(child))
+    return stages
+
+
+def _winning_plan(plan):
+    return plan.get('queryPlanner', {}).get('winningPlan')
+
+
+def sorts_in_memory(plan):
+    """
+    True if a cursor.explain() result sorted in memory instead of
+    walking an index in order. Handles the pre and post 3.0 formats.
+    """
+    if plan.get('scanAndOrder'):
+        return True
+    return any([s.get('stage') == 'SORT' for s in _stages(_winning_plan(plan))])
+
+
+def uses_collection_scan(plan):
+    """
+    True if any part of a cursor.explain() result, including each
+    clause of an $or, walked the whole collection.
+    """
+    if plan.get('cursor', '').startswith('BasicCursor'):
+        return True
+    if any([uses_collection_scan(c) for c in plan.get('clauses') or []]):
+        return True
+    return any([s.get('stage') == 'COLLSCAN' for s in _stages(_winning_plan(plan))])
+
+
+def plan_counts(plan):
+    """
+    The documents examined and returned by a cursor.explain() result.
+    """
+    stats = plan.get('executionStats')
+    if stats:
+        return stats.get('totalDocsExamined', 0), stats.get('nReturned', 0)
+    return plan.get('nscannedObjects', 0), plan.get('n', 0)
+
+
+class QueryPlanTestCase(KardboardTestCase):
+    def setUp(self):
+        super(QueryPlanTestCase, self).setUp()
+        from kardboard.models import get_states
+        self.states = get_states()
+
+        for i in xrange(0, 20):
+            k = self.make_card(
+                backlog_date=self._date('start', days=-i),
+                team='Team 1',
+                state=self.states.backlog,
+                priority=i,
+            )
+            k.save()
+
+    def explain(self, queryset):
+        return queryset.clone()._cursor.explain()
+
+    def assertNoInMemorySort(self, queryset):
+        plan = self.explain(queryset)
+        self.assertFalse(sorts_in_memory(plan), plan)
+
+
+class KardOrderingPlanTests(QueryPlanTestCase):
+    def test_default_ordering_uses_index(self):
+        Kard = self._get_card_class()
+        self.assertNoInMemorySort(Kard.objects.all())
+
+    def test_unordered(self):
+        Kard = self._get_card_class()
+        qs = Kard.objects.filter(team='Team 1').unordered()
+        self.assertNoInMemorySort(qs)
+        self.assertEqual(20, len(list(qs.clone())))
+
+    def test_unordered_iterates_and_counts(self):
+        Kard = self._get_card_class()
+        qs = Kard.objects.filter(team='Team 1').unordered()
+        self.assertEqual(20, qs.count())
+        self.assertEqual(20, len([k.key for k in qs]))
+
+        qs = Kard.objects.filter(team='Team 1').only('priority').unordered()
+        self.assertEqual(range(0, 20), sorted([k.priority for k in qs]))
+        self.assertEqual(5, len(list(Kard.objects.unordered()[5:10])))
+
+    def test_order_by_after_unordered(self):
+        Kard = self._get_card_class()
+        qs = Kard.objects.unordered().order_by('priority')
+        self.assertEqual(range(0, 20), [k.priority for k in qs])
+
+
+class HotQueryPlanTests(KardboardTestCase):
+    """
+    Explains the queries the board, reports and tasks run most and
+    fails on a collection scan or a large in-memory sort. The
+    examined to returned ratio of each is printed once the class is done.
+    """
+    teams = ('Team 1', 'Team 2')
+    backlogged = 150
+    started = 150
+    finished = 200
+
+    ratios = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if not cls.ratios:
+            return
+        print
+        print "%-40s %10s %10s %8s" % ('query', 'examined', 'returned', 'ratio')
+        for name in sorted(cls.ratios.keys()):
+            examined, returned = cls.ratios[name]
+            ratio = float(examined) / returned if returned else float(examined)
+            print "%-40s %10d %10d %8.2f" % (name, examined, returned, ratio)
+
+    def setUp(self):
+        super(HotQueryPlanTests, self).setUp()
+        from kardboard.models import get_states, StateLog
+        self.states = get_states()
+        self.today = self._date('end')
+        Kard = self._get_card_class()
+
+        cards, logs = [], []
+        total = self.backlogged + self.started + self.finished
+        for i in xrange(0, total):
+            team = self.teams[i % len(self.teams)]
+            backlog_date = self._date('start', days=-(i % 90) - 30)
+            fields = dict(team=team, backlog_date=backlog_date, priority=i % 10,
+                state=self.states.backlog, created_at=backlog_date)
+            if i >= self.backlogged:
+                fields.update(start_date=backlog_date + datetime.timedelta(days=5),
+                    state=self.states.in_progress[0])
+            if i >= self.backlogged + self.started:
+                fields.update(done_date=fields['start_date'] + datetime.timedelta(days=(i % 20) + 1),
+                    state=self.states.done)
+            if i % 3 == 0:
+                fields['_ticket_system_updated_at'] = self.today - datetime.timedelta(hours=i % 48)
+
+            card = self.make_card(**fields)
+            card.id = ObjectId()
+            cards.append(card.to_mongo())
+            logs.append({
+                '_id': ObjectId(),
+                'card': card.id,
+                'state': card.state,
+                'entered': backlog_date,
+                'created_at': backlog_date,
+                'updated_at': backlog_date,
+            })
+
+        Kard._get_collection().insert(cards)
+        StateLog._get_collection().insert(logs)
+        self.card = Kard.objects.get(id=cards[-1]['_id'])
+
+    def assertEfficient(self, name, queryset):
+        plan = queryset.clone()._cursor.explain()
+        self.assertFalse(uses_collection_scan(plan), "%s: %s" % (name, plan))
+
+        examined, returned = plan_counts(plan)
+        if sorts_in_memory(plan):
+            self.assertTrue(returned <= SORT_THRESHOLD,
+                "%s sorted %s documents in memory: %s" % (name, returned, plan))
+        self.ratios[name] = (examined, returned)
+
+    def test_done_in_week(self):
+        Kard = self._get_card_class()
+        self.assertEfficient('Kard.done_in_week',
+            Kard.objects.done_in_week(date=self.today))
+
+    def test_done_in_month(self):
+        Kard = self._get_card_class()
+        self.assertEfficient('Kard.done_in_month',
+            Kard.objects.done_in_month(date=self.today))
+
+    def test_moving_cycle_time(self):
+        Kard = self._get_card_class()
+        start_date = self.today - datetime.timedelta(weeks=4)
+        qs = Kard.objects.done().filter(done_date__lte=self.today,
+            done_date__gte=start_date).unordered().only('_cycle_time')
+        self.assertEfficient('Kard.moving_cycle_time', qs)
+
+    def test_in_progress(self):
+        from mongoengine.queryset import Q
+        Kard = self._get_card_class()
+        date = self.today - datetime.timedelta(days=30)
+        self.assertEfficient('Kard.in_progress',
+            Kard.in_progress())
+        self.assertEfficient('Kard.in_progress(date) open',
+            Kard.objects.filter(Q(done_date=None) & Q(start_date__lte=date)).unordered().only('id'))
+        self.assertEfficient('Kard.in_progress(date) done',
+            Kard.objects.filter(Q(done_date__gt=date) & Q(start_date__lte=date)).unordered().only('id'))
+
+    def test_backlogged(self):
+        from mongoengine.queryset import Q
+        Kard = self._get_card_class()
+        date = self.today - datetime.timedelta(days=30)
+        self.assertEfficient('Kard.backlogged',
+            Kard.backlogged())
+        self.assertEfficient('Kard.backlogged(date) open',
+            Kard.objects.filter(Q(start_date=None) & Q(backlog_date__lte=date)).unordered().only('id'))
+        self.assertEfficient('Kard.backlogged(date) started',
+            Kard.objects.filter(Q(start_date__gt=date) & Q(backlog_date__lte=date)).unordered().only('id'))
+
+    def test_display_board(self):
+        from kardboard.models import DisplayBoard
+        for backlog_limit in (None, 20):
+            board = DisplayBoard(teams=['Team 1'], backlog_limit=backlog_limit)
+            for name, qs in board.card_querysets().items():
+                self.assertEfficient('DisplayBoard.%s (limit %s)' % (name, backlog_limit), qs)
+
+    def test_team_stats(self):
+        from kardboard.services.teams import TeamStats
+        stats = TeamStats('Team 1')
+        self.assertEfficient('TeamStats.done_in_range',
+            stats.done_in_range(self.today - datetime.timedelta(weeks=4), self.today))
+        self.assertEfficient('TeamStats.wip', stats.wip())
+
+    def test_statelogs(self):
+        from kardboard.models import StateLog
+        self.assertEfficient('StateLog.open_logs', StateLog.open_logs(self.card))
+        self.assertEfficient('StateLog card and state',
+            StateLog.objects.filter(card=self.card, state=self.card.state))
+
+    def test_queue_updates(self):
+        from kardboard.tasks import update_queue_querysets
+        old_time = self.today - datetime.timedelta(hours=24)
+        names = ('new', 'old', 'old done')
+        for name, qs in zip(names, update_queue_querysets(old_time)):
+            self.assertEfficient('queue_updates %s' % name, qs)
@@ -0,0 +1,33 @@
+from kardboard.tests.core import KardboardTestCase
+
+
+class QueryAccountingTests(KardboardTestCase):
+    def setUp(self):
+        super(QueryAccountingTests, self).setUp()
+        self.card = self.make_card()
+        self.card.save()
+
+    def tearDown(self):
+        self.config['MONGO_QUERY_ACCOUNTING'] = False
+        super(QueryAccountingTests, self).tearDown()
+
+    def test_queries_counted(self):
+        from kardboard.querylog import QueryLog
+        Kard = self._get_card_class()
+        with QueryLog() as log:
+            Kard.objects.get(key=self.card.key)
+            list(Kard.objects.filter(team=self.card.team))
+
+        self.assertEqual(2, len([e for e in log.entries if e['operation'] == 'find']))
+        self.assertEqual('kard', log.entries[0]['collection'])
+
+    def test_headers(self):
+        self.config['MONGO_QUERY_ACCOUNTING'] = True
+        res = self.app.get('/card/%s/' % self.card.key)
+        self.assertEqual(200, res.status_code)
+        self.assertTrue(int(res.headers['X-Mongo-Queries']) > 0)
+        self.assertTrue('X-Mongo-Time' in res.headers)
+
+    def test_off(self):
+        res = self.app.get('/card/%s/' % self.card.key)
+        self.assertFalse('X-Mongo-Queries' in res.headers)
@@ -0,0 +1,80 @@
+import datetime
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class RefreshReportsTests(KardboardTestCase):
+    def setUp(self):
+        super(RefreshReportsTests, self).setUp()
+        today = self.now()
+        self.in_progress = self.make_card(team='Team 1', state='Doing',
+            start_date=today - datetime.timedelta(days=3),
+            _developers=['alice'])
+        self.in_progress.save()
+        self.done = self.make_card(team='Team 2', state='Done',
+            start_date=today - datetime.timedelta(days=10),
+            done_date=today - datetime.timedelta(days=2),
+            _reporter='bob')
+        self.done.save()
+        self.old = self.make_card(team='Team 2', state='Done',
+            start_date=today - datetime.timedelta(days=500),
+            done_date=today - datetime.timedelta(days=450))
+        self.old.save()
+        self.backlogged = self.make_card(team='Team 1', state='Todo')
+        self.backlogged.save()
+
+    def test_snapshot(self):
+        from kardboard.services.reports import CardSnapshot
+        snapshot = CardSnapshot().load()
+
+        self.assertEqual(set([self.in_progress.key, self.done.key]),
+            set([c.key for c in snapshot.cards]))
+        self.assertEqual([self.in_progress.key], [c.key for c in snapshot.in_progress()])
+        self.assertEqual([], snapshot.in_progress('team-2'))
+        self.assertEqual([self.done.key], [c.key for c in snapshot.in_group('team-2')])
+        self.assertEqual(2, len(snapshot.recently_touched()))
+
+    def test_refresh(self):
+        from kardboard.models import DailyRecord, FlowReport, Person, ServiceClassSnapshot
+        from kardboard.services.reports import refresh, STAGES
+
+        timings = refresh()
+
+        self.assertEqual(['snapshot'] + [name for name, needs, func in STAGES],
+            [name for name, seconds in timings])
+        self.assertTrue(all([seconds is not None for name, seconds in timings]))
+        self.assertEqual(3, FlowReport.objects.count())
+        self.assertEqual(3, DailyRecord.objects.count())
+        self.assertEqual(3, ServiceClassSnapshot.objects.count())
+        self.assertEqual(set(['alice', 'bob']),
+            set([p.name for p in Person.objects.all()]))
+
+        snapshot = ServiceClassSnapshot.objects.get(group='all')
+        self.assertEqual(1, sum([row['wip'] for row in snapshot.data.values()]))
+        self.assertEqual(1, FlowReport.objects.get(group='all').state_counts['Doing'])
+        self.assertEqual([self.in_progress.key],
+            [k.key for k in Person.objects.get(name='alice').developed])
+
+    def test_task(self):
+        from kardboard.models import FlowReport, ServiceClassRecord
+        from kardboard.tasks import refresh_reports
+        refresh_reports.apply()
+
+        self.assertEqual(3, FlowReport.objects.count())
+        self.assertEqual(15, ServiceClassRecord.objects.count())
+
+    def test_failed_stage_skips_dependents(self):
+        import mock
+        from kardboard.models import DailyRecord, FlowReport, ServiceClassSnapshot
+        from kardboard.services import reports
+
+        capture = mock.Mock(side_effect=ValueError("broken"))
+        with mock.patch.object(reports.TeamDailyMetric, 'capture', capture):
+            timings = dict(reports.refresh())
+
+        self.assertEqual(None, timings['team_metrics'])
+        self.assertEqual(None, timings['flow_reports'])
+        self.assertEqual(None, timings['daily_records'])
+        self.assertEqual(0, FlowReport.objects.count())
+        self.assertEqual(0, DailyRecord.objects.count())
+        self.assertEqual(3, ServiceClassSnapshot.objects.count())
@@ -18,6 +18,7 @@ class ReportGroupTests(KardboardTestCase):
         self._orig_groups = deepcopy(
             app.config.get('REPORT_GROUPS', {})
         )
+        self._orig_denormalized = app.config.get('REPORT_GROUPS_DENORMALIZED', False)
 
         app.config['REPORT_GROUPS'] = {
             'ops': (('Ops',), 'Ops'),
@@ -50,6 +51,7 @@ class ReportGroupTests(KardboardTestCase):
     def tearDown(self):
         from kardboard.app import app
         app.config['REPORT_GROUPS'] = self._orig_groups
+        app.config['REPORT_GROUPS_DENORMALIZED'] = self._orig_denormalized
         Kard = self._get_card_class()
         Kard.objects.all().delete()
 
@@ -84,6 +86,32 @@ class ReportGroupTests(KardboardTestCase):
 
         self.assertEqual(9, len(report_group.queryset))
 
+    def test_report_group_teams(self):
+        Kard = self._get_card_class()
+        klass = self._get_target_klass()
+
+        self.assertEqual(('Ops', ), klass('ops', Kard.objects).teams)
+        self.assertEqual(None, klass('all', Kard.objects).teams)
+
+    def test_cards_store_report_groups(self):
+        Kard = self._get_card_class()
+        k = Kard.objects.filter(team='Team 2').first()
+        self.assertEqual(['dev'], k.report_groups)
+
+    def test_report_group_denormalized(self):
+        from kardboard.app import app
+        Kard = self._get_card_class()
+        klass = self._get_target_klass()
+
+        groups = deepcopy(app.config['REPORT_GROUPS'])
+        groups['ops'] = (('Ops', 'Team 1'), 'Ops')
+        app.config['REPORT_GROUPS'] = groups
+        Kard.sync_report_groups()
+
+        app.config['REPORT_GROUPS_DENORMALIZED'] = True
+        self.assertEqual(6, len(klass('ops', Kard.objects).queryset))
+        self.assertEqual(9, len(klass('dev', Kard.objects).queryset))
+
 
 class ChartIndexTests(ReportTests):
     def _get_target_url(self):
@@ -211,6 +239,15 @@ class CycleTimeHistoryTests(DashboardTestCase):
         expected = end_date.strftime("%m/%d/%Y")
         self.assertIn(expected, res.data)
 
+    def test_cycle_if_modified_since(self):
+        target_url = self._get_target_url(months=3)
+        res = self.app.get(target_url)
+        self.assertEqual(200, res.status_code)
+
+        last_modified = res.headers['Last-Modified']
+        res = self.app.get(target_url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(304, res.status_code)
+
 
 class CumulativeFlowTests(DashboardTestCase):
     def setUp(self):
@@ -236,3 +273,25 @@ class CumulativeFlowTests(DashboardTestCase):
         target_url = self._get_target_url()
         res = self.app.get(target_url)
         self.assertEqual(200, res.status_code)
+
+    def test_cum_flow_not_modified(self):
+        target_url = self._get_target_url()
+        res = self.app.get(target_url)
+        self.assertEqual(200, res.status_code)
+        self.assertIn('max-age', res.headers['Cache-Control'])
+
+        etag = res.headers['ETag']
+        res = self.app.get(target_url, headers={'If-None-Match': etag})
+        self.assertEqual(304, res.status_code)
+
+    def test_cum_flow_modified(self):
+        target_url = self._get_target_url()
+        res = self.app.get(target_url)
+        etag = res.headers['ETag']
+
+        record = self._get_record_class().objects.order_by('-date').first()
+        record.moving_cycle_time = 42
+        record.save()
+
+        res = self.app.get(target_url, headers={'If-None-Match': etag})
+        self.assertEqual(200, res.status_code)
@@ -0,0 +1,42 @@
+from kardboard.tests.core import KardboardTestCase
+
+
+class SyntheticDatasetTests(KardboardTestCase):
+    def _get_target_class(self):
+        from kardboard.tests.synthetic import SyntheticDataset
+        return SyntheticDataset
+
+    def _dataset(self, **kwargs):
+        kwargs.setdefault('today', self._date('start'))
+        return self._make_one(cards=200, people=10, **kwargs)
+
+    def _snapshot(self):
+        Kard = self._get_card_class()
+        return [(k.key, k.team, k.state, k.backlog_date, k.start_date, k.done_date)
+            for k in Kard.objects.order_by('key')]
+
+    def test_generate(self):
+        from kardboard.models import Person, StateLog
+        counts = self._dataset().generate()
+
+        self.assertEqual(200, counts['cards'])
+        self.assertEqual(200, self._get_card_class().objects.count())
+        self.assertEqual(counts['statelogs'], StateLog.objects.count())
+        self.assertEqual(10, Person.objects.count())
+
+    def test_histories_are_consistent(self):
+        self._dataset().generate()
+        Kard = self._get_card_class()
+        done = Kard.objects.done()
+        self.assertTrue(done.count() > 0)
+        for k in done:
+            self.assertTrue(k.backlog_date <= k.start_date <= k.done_date)
+            self.assertEqual(k.cycle_time, k._cycle_time)
+
+    def test_seeded(self):
+        self._dataset(seed=1).generate()
+        first = self._snapshot()
+        self._flush_db()
+
+        self._dataset(seed=1).generate()
+        self.assertEqual(first, self._snapshot())
@@ -0,0 +1,112 @@
+from copy import deepcopy
+
+from kardboard.tests.core import KardboardTestCase
+
+
+class TeamDailyMetricTests(KardboardTestCase):
+    def setUp(self):
+        super(TeamDailyMetricTests, self).setUp()
+        from kardboard.models import States
+        self.states = States()
+        self._orig_groups = deepcopy(self.config.get('REPORT_GROUPS', {}))
+        self.today = self._date('end')
+        self._set_up_cards()
+
+    def tearDown(self):
+        self.config['REPORT_GROUPS'] = self._orig_groups
+        super(TeamDailyMetricTests, self).tearDown()
+
+    def _set_up_cards(self):
+        backlog_date = self._date('start', days=-10)
+        start_date = self._date('start', days=-6)
+        done_date = self._date('end', days=-1)
+
+        for team in ('Team 1', 'Team 2'):
+            c = self.make_card(
+                backlog_date=backlog_date,
+                team=team,
+                state=self.states.backlog,
+            )
+            c.save()
+
+            c = self.make_card(
+                backlog_date=backlog_date,
+                start_date=start_date,
+                team=team,
+                state=self.states.start,
+            )
+            c.save()
+
+            c = self.make_card(
+                backlog_date=backlog_date,
+                start_date=start_date,
+                done_date=done_date,
+                team=team,
+                state=self.states.done,
+            )
+            c.save()
+
+    def _get_target_class(self):
+        from kardboard.models import TeamDailyMetric
+        return TeamDailyMetric
+
+    def test_capture(self):
+        klass = self._get_target_class()
+        klass.capture(self.today)
+
+        self.assertEqual(2, klass.objects.filter(date=self.today).count())
+
+        row = klass.objects.get(date=self.today, team='Team 1')
+        self.assertEqual(1, row.backlog)
+        self.assertEqual(1, row.in_progress)
+        self.assertEqual(1, row.done)
+        self.assertEqual(0, row.completed)
+        self.assertEqual(1, row.state_counts[self.states.done])
+
+    def test_capture_history(self):
+        klass = self._get_target_class()
+        yesterday = self._date('end', days=-1)
+        klass.capture(yesterday)
+
+        row = klass.objects.get(date=yesterday, team='Team 1')
+        self.assertEqual(1, row.completed)
+        self.assertEqual(5, row.cycle_time_sum)
+        self.assertEqual({}, row.state_counts)
+
+    def test_rollup(self):
+        klass = self._get_target_class()
+        klass.capture(self.today)
+
+        totals = klass.rollup(self.today)
+        self.assertEqual(2, totals['backlog'])
+        self.assertEqual(2, totals['in_progress'])
+        self.assertEqual(2, totals['done'])
+        self.assertEqual(5, totals['moving_cycle_time'])
+
+        totals = klass.rollup(self.today, ('Team 2', ))
+        self.assertEqual(1, totals['backlog'])
+
+    def test_capture_removes_stale_rows(self):
+        klass = self._get_target_class()
+        klass.capture(self.today)
+
+        self._get_card_class().objects.filter(team='Team 2').delete()
+        klass.capture(self.today)
+
+        self.assertEqual(0, klass.objects.filter(date=self.today, team='Team 2').count())
+
+    def test_new_group_rollup(self):
+        from kardboard.models import DailyRecord
+        from kardboard.tasks import rollup_report_group
+
+        klass = self._get_target_class()
+        klass.capture(self.today)
+
+        self.config['REPORT_GROUPS']['everyone'] = (('Team 1', 'Team 2'), 'Everyone')
+        self._get_card_class().objects.delete()
+
+        rollup_report_group.apply(args=['everyone', 7], throw=True)
+
+        record = DailyRecord.objects.get(date=self.today, group='everyone')
+        self.assertEqual(2, record.backlog)
+        self.assertEqual(2, record.done)
@@ -62,6 +62,10 @@ class JIRAHelperTests(KardboardTestCase):
         self.assert_(len(k.ticket_system_data['developers']) > 0)
         self.assert_(len(k.ticket_system_data['testers']) > 0)
 
+    def test_shared_statsd_client(self):
+        h = self._make_one()
+        self.assertTrue(h.statsd is self._make_one().statsd)
+
     def test_get_title(self):
         h = self._make_one()
         expected = self.ticket.summary
@@ -87,6 +87,10 @@ class QuickJumpTests(DashboardTestCase):
         expected = "/card/%s/" % (key.upper(), )
         self.assertIn(expected, res.headers['Location'])
 
+    def test_quick_empty(self):
+        res = self.app.get(self._get_target_url(''))
+        self.assertEqual(302, res.status_code)
+
     def test_quick_add(self):
         key = "CMSCMSCMS-127"
         res = self.app.get(self._get_target_url(key))
@@ -114,6 +118,38 @@ class ExportTests(KardboardTestCase):
         for k in Kard.objects.all():
             self.assertIn(k.key, res.data)
 
+    def test_csv_team_filter(self):
+        c = self.make_card(team='Team 2')
+        c.save()
+
+        res = self.app.get(self._get_target_url() + '?team=team-2')
+        self.assertEqual(200, res.status_code)
+
+        rows = res.data.strip().split('\n')
+        self.assertEqual(2, len(rows))
+        self.assertIn(c.key, rows[1])
+
+    def test_csv_done_date_filter(self):
+        done_date = self._date('end', days=-30)
+        c = self.make_card(
+            start_date=done_date,
+            done_date=done_date,
+        )
+        c.save()
+
+        start = self._date('start', days=-31).strftime("%Y-%m-%d")
+        end = self._date('end', days=-29).strftime("%Y-%m-%d")
+        res = self.app.get(self._get_target_url() + '?start=%s&end=%s' % (start, end))
+        self.assertEqual(200, res.status_code)
+
+        rows = res.data.strip().split('\n')
+        self.assertEqual(2, len(rows))
+        self.assertIn(c.key, rows[1])
+
+    def test_csv_bad_team(self):
+        res = self.app.get(self._get_target_url() + '?team=not-a-team')
+        self.assertEqual(404, res.status_code)
+
 
 class RobotsTests(KardboardTestCase):
     def _get_target_url(self):
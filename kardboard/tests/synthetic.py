@@ -0,0 +1,201 @@
+"""
+Seeded, realistic looking card histories for benchmarks and query plan
+tests. The same seed, size and configuration always produce the same
+dataset, so timings can be compared between commits.
+"""
+import datetime
+import random
+
+from bson import ObjectId
+
+from kardboard.util import now, delta_in_hours
+
+
+BATCH_SIZE = 1000
+
+
+def _batched_insert(collection, docs):
+    for i in xrange(0, len(docs), BATCH_SIZE):
+        collection.insert(docs[i:i + BATCH_SIZE])
+
+
+class SyntheticDataset(object):
+    """
+    Generates cards, StateLogs, blockers and people for the teams and
+    states in the app's config.
+
+    Cards are written with raw inserts, skipping Kard.save and its
+    signals, but carry every field save would have denormalised so
+    reports treat them like real cards.
+    """
+
+    backlog_ratio = 0.2
+    """The share of cards that never leave the backlog."""
+
+    wait_days = 10
+    """The mean number of days a started card waited in the backlog."""
+
+    cycle_mu, cycle_sigma = 2.0, 0.6
+    """Log-normal parameters for cycle time in days, a median of about a week."""
+
+    blocked_ratio = 0.1
+    """The share of started cards that were blocked at some point."""
+
+    defect_ratio = 0.15
+
+    def __init__(self, cards=1000, teams=None, people=50, days=365, seed=0, today=None):
+        from kardboard.app import app
+        from kardboard.models.states import get_states
+        from kardboard.services.teams import get_teams
+
+        self.size = cards
+        self.teams = teams or get_teams().names
+        self.people = ["person%d" % i for i in xrange(0, people)]
+        self.days = days
+        self.seed = seed
+        self.today = today or now()
+        self.states = get_states()
+        self.service_classes = sorted(app.config.get('SERVICE_CLASSES', {}).keys())
+        self.defect_types = list(app.config.get('DEFECT_TYPES', ()))
+        self.default_type = app.config.get('DEFAULT_TYPE', '')
+
+    def generate(self):
+        """
+        Inserts the dataset and returns how many of each document were written.
+        """
+        from kardboard.models.kard import Kard
+        from kardboard.models.person import Person
+        from kardboard.models.statelog import StateLog
+
+        rand = random.Random(self.seed)
+        cards, logs = [], []
+        roles = dict([(name, {'reported': [], 'developed': [], 'tested': []})
+            for name in self.people])
+
+        for i in xrange(0, self.size):
+            card = self._make_card(rand, i)
+            cards.append(card.to_mongo())
+            logs.extend([l.to_mongo() for l in self._make_logs(card)])
+
+            roles[card._reporter]['reported'].append(card.id)
+            for name in card._developers:
+                roles[name]['developed'].append(card.id)
+            for name in card._testers:
+                roles[name]['tested'].append(card.id)
+
+        people = []
+        for name in self.people:
+            person = Person(name=name, updated_at=self.today, **roles[name])
+            person.id = ObjectId()
+            people.append(person.to_mongo())
+
+        _batched_insert(Kard._get_collection(), cards)
+        _batched_insert(StateLog._get_collection(), logs)
+        _batched_insert(Person._get_collection(), people)
+        return {
+            'cards': len(cards),
+            'statelogs': len(logs),
+            'people': len(people),
+        }
+
+    def _days_ago(self, rand, days):
+        return self.today - datetime.timedelta(days=days, seconds=rand.randint(0, 86399))
+
+    def _make_card(self, rand, number):
+        from kardboard.models.blocker import BlockerRecord
+        from kardboard.models.kard import Kard
+        from kardboard.models.reportgroup import report_groups_for_team
+
+        backlog_date = self._days_ago(rand, rand.uniform(0, self.days))
+        start_date, done_date = None, None
+        if rand.random() >= self.backlog_ratio:
+            start_date = backlog_date + datetime.timedelta(days=rand.expovariate(1.0 / self.wait_days))
+            done_date = start_date + datetime.timedelta(days=rand.lognormvariate(self.cycle_mu, self.cycle_sigma))
+            if start_date > self.today:
+                start_date, done_date = None, None
+            elif done_date > self.today:
+                done_date = None
+
+        if done_date:
+            state = self.states.done
+        elif start_date:
+            state = rand.choice(self.states.in_progress)
+        else:
+            state = rand.choice(self.states.pre_start)
+
+        team = rand.choice(self.teams)
+        card = Kard(
+            key="SYN-%d" % (number + 1),
+            title="Synthetic card %d" % (number + 1),
+            team=team,
+            report_groups=report_groups_for_team(team),
+            state=state,
+            backlog_date=backlog_date,
+            start_date=start_date,
+            done_date=done_date,
+            created_at=backlog_date,
+            priority=rand.randint(0, 20) if not start_date else None,
+        )
+        card.id = ObjectId()
+        card._set_cycle_lead_times()
+
+        if self.service_classes:
+            card._service_class = rand.choice(self.service_classes)
+        card._type = self.default_type
+        if self.defect_types and rand.random() < self.defect_ratio:
+            card._type = rand.choice(self.defect_types)
+
+        card._reporter = rand.choice(self.people)
+        card._developers = rand.sample(self.people, min(len(self.people), rand.randint(1, 2)))
+        card._testers = rand.sample(self.people, min(len(self.people), rand.randint(0, 1)))
+        card._ticket_system_updated_at = self._days_ago(rand, rand.uniform(0, 2))
+
+        if start_date and rand.random() < self.blocked_ratio:
+            end = done_date or self.today
+            for i in xrange(0, rand.randint(1, 2)):
+                blocked_at = start_date + datetime.timedelta(
+                    hours=rand.uniform(0, delta_in_hours(end - start_date)))
+                unblocked_at = blocked_at + datetime.timedelta(days=rand.uniform(0.5, 5))
+                if unblocked_at > end:
+                    unblocked_at = None if not done_date else done_date
+                card.blockers.append(BlockerRecord(reason="Synthetic blocker",
+                    blocked_at=blocked_at, unblocked_at=unblocked_at))
+            card.blocked_ever = True
+            card.blocked = any([b.unblocked_at is None for b in card.blockers])
+        return card
+
+    def _make_logs(self, card):
+        """
+        One StateLog per state the card passed through, splitting its
+        time in progress evenly over the in progress states.
+        """
+        from kardboard.models.statelog import StateLog
+
+        visits = [(self.states.backlog, card.backlog_date)]
+        if card.start_date:
+            progress = list(self.states.in_progress)
+            if not card.done_date:
+                progress = progress[:progress.index(card.state) + 1]
+            end = card.done_date or self.today
+            step = (end - card.start_date) / len(progress)
+            for i, state in enumerate(progress):
+                visits.append((state, card.start_date + step * i))
+        if card.done_date:
+            visits.append((self.states.done, card.done_date))
+
+        logs = []
+        for i, (state, entered) in enumerate(visits):
+            log = StateLog(
+                card=card.id,
+                state=state,
+                entered=entered,
+                service_class=card._service_class,
+                created_at=entered,
+            )
+            log.id = ObjectId()
+            if i + 1 < len(visits):
+                log.exited = visits[i + 1][1]
+                log._duration = log.duration
+            log.updated_at = log.exited or entered
+            logs.append(log)
+        return logs
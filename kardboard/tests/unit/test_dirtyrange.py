@@ -0,0 +1,57 @@
+import datetime
+
+import unittest2
+
+
+class AffectedTests(unittest2.TestCase):
+    def setUp(self):
+        self.today = datetime.datetime(2012, 6, 30, 12)
+        self.card = {
+            'team': 'Team 1',
+            'backlog_date': datetime.datetime(2012, 6, 1),
+            'start_date': datetime.datetime(2012, 6, 10),
+            'done_date': None,
+        }
+
+    def _call(self, before, after):
+        from kardboard.models.dirtyrange import affected
+        return affected(before, after, self.today)
+
+    def test_unchanged(self):
+        self.assertEqual(None, self._call(self.card, dict(self.card)))
+
+    def test_created(self):
+        groups, start, end = self._call(None, self.card)
+        self.assertEqual(set(['all', 'team-1']), groups)
+        self.assertEqual((self.card['backlog_date'], self.today), (start, end))
+
+    def test_deleted(self):
+        groups, start, end = self._call(self.card, None)
+        self.assertEqual((self.card['backlog_date'], self.today), (start, end))
+
+    def test_moved_team(self):
+        after = dict(self.card, team='Team 2')
+        groups, start, end = self._call(self.card, after)
+        self.assertEqual(set(['all', 'team-1', 'team-2']), groups)
+        self.assertEqual((self.card['backlog_date'], self.today), (start, end))
+
+    def test_start_date_moved(self):
+        after = dict(self.card, start_date=datetime.datetime(2012, 6, 5))
+        groups, start, end = self._call(self.card, after)
+        self.assertEqual(set(['all', 'team-1']), groups)
+        self.assertEqual(datetime.datetime(2012, 6, 5), start)
+        self.assertEqual(datetime.datetime(2012, 6, 10), end)
+
+    def test_done(self):
+        after = dict(self.card, done_date=datetime.datetime(2012, 6, 20))
+        groups, start, end = self._call(self.card, after)
+        self.assertEqual(datetime.datetime(2012, 6, 20), start)
+        self.assertEqual(self.today, end)
+
+    def test_done_long_ago_moved(self):
+        before = dict(self.card, done_date=datetime.datetime(2012, 1, 10))
+        after = dict(self.card, done_date=datetime.datetime(2012, 1, 12))
+        groups, start, end = self._call(before, after)
+        self.assertEqual(datetime.datetime(2012, 1, 10), start)
+        # The moving averages cover MOVING_WEEKS after a card is done
+        self.assertEqual(datetime.datetime(2012, 2, 9), end)
@@ -0,0 +1,54 @@
+import unittest2
+
+
+class RequestStatsTests(unittest2.TestCase):
+    def _make_one(self, *args, **kwargs):
+        from kardboard.instrumentation import RequestStats
+        return RequestStats(*args, **kwargs)
+
+    def test_packets(self):
+        stats = self._make_one('report_flow', group='team-1')
+        data = stats.packets('prefix')
+
+        self.assertEqual(6, len(data))
+        self.assertTrue(data['prefix.web.report_flow.total'].endswith('|ms'))
+        self.assertTrue('prefix.web.report_flow.group.team-1.db' in data)
+
+    def test_sampled_packets(self):
+        stats = self._make_one('state', sample_rate=.1)
+        data = stats.packets('prefix')
+
+        self.assertEqual(3, len(data))
+        self.assertTrue(data['prefix.web.state.render'].endswith('|ms|@0.1'))
+
+
+class SendPacketsTests(unittest2.TestCase):
+    def test_every_packet_sent(self):
+        import mock
+        from kardboard.instrumentation import RequestStats, send_packets
+
+        packets = RequestStats('report_flow', group='team-1').packets('prefix')
+        connection = mock.Mock()
+        send_packets(connection, packets)
+
+        sent = {}
+        for args, kwargs in connection.send.call_args_list:
+            self.assertEqual(1, len(args[0]))
+            sent.update(args[0])
+        self.assertEqual(packets, sent)
+
+
+class RequestGroupTests(unittest2.TestCase):
+    def _call_fut(self, view_args):
+        from kardboard.instrumentation import request_group
+        config = {'REPORT_GROUPS': {'team-1': (('Team 1', ), 'Team 1')}}
+        return request_group(config, view_args)
+
+    def test_group(self):
+        self.assertEqual('team-1', self._call_fut({'group': 'team-1'}))
+        self.assertEqual('all', self._call_fut({'group': 'all'}))
+
+    def test_no_group(self):
+        self.assertEqual(None, self._call_fut({'group': 'nope'}))
+        self.assertEqual(None, self._call_fut({'key': 'CMSAD-1'}))
+        self.assertEqual(None, self._call_fut(None))
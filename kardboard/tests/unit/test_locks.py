@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+
+import unittest2
+
+
+class FileLockTests(unittest2.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _make_one(self, key='tasks.update_flow_reports'):
+        from kardboard.locks import FileLock
+        return FileLock(key, self.directory)
+
+    def test_acquire(self):
+        lock = self._make_one()
+        self.assertTrue(lock.acquire())
+        self.assertFalse(self._make_one().acquire())
+        self.assertTrue(self._make_one('tasks.normalize_people').acquire())
+
+        lock.release()
+        self.assertTrue(self._make_one().acquire())
+
+    def test_key_made_safe(self):
+        lock = self._make_one('tasks.update_daily_records:2012-01-01 23:59:59')
+        self.assertEqual('tasks.update_daily_records_2012-01-01_23_59_59.lock',
+            lock.path.split('/')[-1])
+
+
+class RedisLockTests(unittest2.TestCase):
+    def _make_one(self, client):
+        from kardboard.locks import RedisLock
+        return RedisLock('tasks.update_flow_reports', 60, client)
+
+    def test_acquire(self):
+        import mock
+        client = mock.Mock()
+        client.setnx.return_value = True
+        lock = self._make_one(client)
+
+        self.assertTrue(lock.acquire())
+        client.expire.assert_called_with('lock:tasks.update_flow_reports', 60)
+
+        client.get.return_value = lock.token
+        lock.release()
+        client.delete.assert_called_with('lock:tasks.update_flow_reports')
+
+    def test_held(self):
+        import mock
+        client = mock.Mock()
+        client.setnx.return_value = False
+        client.ttl.return_value = 30
+        lock = self._make_one(client)
+
+        self.assertFalse(lock.acquire())
+        self.assertFalse(client.expire.called)
+        lock.release()
+        self.assertFalse(client.delete.called)
+
+
+class ExclusiveTests(unittest2.TestCase):
+    def setUp(self):
+        from kardboard.app import app
+        self.config = app.config
+        self.directory = tempfile.mkdtemp()
+        self.saved = dict([(k, self.config.get(k)) for k in ('TASK_LOCK_BACKEND', 'TASK_LOCK_DIR')])
+        self.config['TASK_LOCK_BACKEND'] = 'file'
+        self.config['TASK_LOCK_DIR'] = self.directory
+
+    def tearDown(self):
+        self.config.update(self.saved)
+        shutil.rmtree(self.directory)
+
+    def test_skips_overlapping_run(self):
+        from kardboard.locks import exclusive
+
+        calls = []
+
+        @exclusive
+        def report(days):
+            calls.append(days)
+            if len(calls) == 1:
+                # Still running when the next two are scheduled
+                report(days)
+                report(days + 1)
+            return days
+
+        self.assertEqual(7, report(7))
+        self.assertEqual([7, 8], calls)
+        self.assertEqual(7, report(7))
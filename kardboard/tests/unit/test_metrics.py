@@ -0,0 +1,52 @@
+import unittest2
+
+
+class MetricsBufferTests(unittest2.TestCase):
+    def _make_one(self, **kwargs):
+        from kardboard.metrics import MetricsBuffer
+        kwargs.setdefault('flush_interval', 3600)
+        return MetricsBuffer('env.host.kardboard', **kwargs)
+
+    def test_counters_aggregated(self):
+        metrics = self._make_one()
+        metrics.incr('tasks.update_ticket.consider')
+        metrics.incr('tasks.update_ticket.consider')
+        metrics.incr('tasks.update_ticket.error', 3)
+
+        self.assertEqual([
+            'env.host.kardboard.tasks.update_ticket.consider:2|c',
+            'env.host.kardboard.tasks.update_ticket.error:3|c',
+        ], metrics.lines())
+
+    def test_timer_and_gauge(self):
+        metrics = self._make_one()
+        metrics.timer('tasks.update_ticket').start().stop()
+        metrics.gauge('tasks.queue_updates.new', 12)
+
+        lines = metrics.lines()
+        self.assertEqual('env.host.kardboard.tasks.queue_updates.new:12|g', lines[0])
+        self.assertTrue(lines[1].startswith('env.host.kardboard.tasks.update_ticket.total:'))
+        self.assertTrue(lines[1].endswith('|ms'))
+
+    def test_packets(self):
+        from kardboard.metrics import MAX_PACKET_SIZE
+        metrics = self._make_one()
+        for i in xrange(0, 100):
+            metrics.incr('counter%s' % i)
+
+        packets = metrics.packets()
+        self.assertTrue(1 < len(packets) < 100)
+        self.assertTrue(all([len(p) <= MAX_PACKET_SIZE for p in packets]))
+        self.assertEqual(100, sum([len(p.split('\n')) for p in packets]))
+
+    def test_flush(self):
+        metrics = self._make_one(port=1)
+        metrics.incr('counter')
+        self.assertEqual(1, metrics.flush())
+        self.assertEqual([], metrics.lines())
+        self.assertEqual(0, metrics.flush())
+
+    def test_interval(self):
+        metrics = self._make_one(port=1, flush_interval=0)
+        metrics.incr('counter')
+        self.assertEqual([], metrics.lines())
@@ -0,0 +1,75 @@
+import unittest2
+
+
+class QueryShapeTests(unittest2.TestCase):
+    def _call_fut(self, spec):
+        from kardboard.querylog import query_shape
+        return query_shape(spec)
+
+    def test_values_blanked(self):
+        self.assertEqual(
+            self._call_fut({'key': 'CMSAD-1', 'done_date': {'$gte': 1, '$lte': 2}}),
+            self._call_fut({'key': 'CMSAD-2', 'done_date': {'$lte': 3, '$gte': 4}}),
+        )
+
+    def test_or_clauses(self):
+        self.assertEqual("{$or: [{team: ?}, {state: ?}]}",
+            self._call_fut({'$or': [{'team': 'Team 1'}, {'state': 'Doing'}]}))
+
+    def test_in_list(self):
+        self.assertEqual("{team: {$in: ?}}",
+            self._call_fut({'team': {'$in': ['Team 1', 'Team 2']}}))
+
+
+class QueryLogTests(unittest2.TestCase):
+    def _make_one(self):
+        from kardboard.querylog import QueryLog
+        return QueryLog('test')
+
+    def test_repeated(self):
+        log = self._make_one()
+        for i in xrange(0, 4):
+            log.record('find', 'kard', '{_id: ?}', .001)
+        log.record('getmore', 'kard', '{_id: ?}', .001)
+        log.record('find', 'person', '{name: ?}', .001)
+
+        self.assertEqual([(4, 'find', 'kard', '{_id: ?}')], log.repeated(3))
+        self.assertEqual([], log.repeated(4))
+        self.assertEqual(6, log.count)
+
+    def test_nested(self):
+        from kardboard.querylog import _record
+        outer = self._make_one()
+        with outer:
+            with self._make_one() as inner:
+                _record('find', 'kard', '{}', .001)
+            _record('find', 'kard', '{}', .001)
+        _record('find', 'kard', '{}', .001)
+
+        self.assertEqual(1, inner.count)
+        self.assertEqual(2, outer.count)
+
+
+class TimedTests(unittest2.TestCase):
+    def test_described_before_running(self):
+        from kardboard.querylog import QueryLog, _timed
+
+        class FakeCursor(object):
+            id = None
+
+            def refresh(self):
+                self.id = 42
+
+        def describe(cursor, operation):
+            return ('find' if cursor.id is None else 'getmore'), 'kard', '{}'
+
+        refresh = _timed(None, describe)(FakeCursor.refresh.im_func)
+        cursor = FakeCursor()
+        log = QueryLog().start()
+        try:
+            refresh(cursor)
+            refresh(cursor)
+        finally:
+            log.stop()
+
+        self.assertEqual(['find', 'getmore'], [e['operation'] for e in log.entries])
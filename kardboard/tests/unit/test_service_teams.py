@@ -42,3 +42,27 @@ class TeamServiceTests(unittest2.TestCase):
 
         teams = self.service.setup_teams(config)
         assert 0 == teams[1].wip_limit
+
+    def test_get_teams_is_shared(self):
+        config = {
+            'CARD_TEAMS': [
+                ('Team 1', 100),
+                ('Team 2', 20),
+            ]
+        }
+
+        teams = self.service.get_teams(config)
+        assert teams is self.service.get_teams(config)
+
+    def test_get_teams_rebuilds_on_config_change(self):
+        config = {
+            'CARD_TEAMS': [
+                ('Team 1', 100),
+            ]
+        }
+
+        teams = self.service.get_teams(config)
+        config['CARD_TEAMS'] = [('Team 1', 100), ('Team 3', 5)]
+        rebuilt = self.service.get_teams(config)
+        assert teams is not rebuilt
+        assert ['Team 1', 'Team 3'] == rebuilt.names
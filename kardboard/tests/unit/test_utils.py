@@ -52,3 +52,46 @@ class UtilTests(unittest2.TestCase):
         self.assertEqual(6, end.month)
         self.assertEqual(11, end.day)
         self.assertEqual(2011, end.year)
+
+    def test_get_ticket_helper_class(self):
+        from collections import OrderedDict
+        from kardboard.util import get_ticket_helper_class
+        config = {'TICKET_HELPER': 'collections.OrderedDict'}
+
+        self.assertEqual(OrderedDict, get_ticket_helper_class(config))
+
+        config['TICKET_HELPER'] = 'collections.Counter'
+        self.assertEqual('Counter', get_ticket_helper_class(config).__name__)
+
+
+class ConfigRegistryTests(unittest2.TestCase):
+    def _make_one(self, settings):
+        from kardboard.util import ConfigRegistry
+        self.built = []
+
+        def build(config):
+            self.built.append(config)
+            return list(config.get('THINGS', ()))
+        return ConfigRegistry(settings, build)
+
+    def test_cached(self):
+        registry = self._make_one(('THINGS', ))
+        config = {'THINGS': ('a', 'b')}
+        first = registry.get(config)
+        self.assertTrue(first is registry.get(config))
+        self.assertEqual(1, len(self.built))
+
+    def test_setting_replaced(self):
+        registry = self._make_one(('THINGS', ))
+        config = {'THINGS': ('a', 'b')}
+        registry.get(config)
+        config['THINGS'] = ('c', )
+        self.assertEqual(['c'], registry.get(config))
+        self.assertEqual(2, len(self.built))
+
+    def test_config_replaced(self):
+        registry = self._make_one(('THINGS', ))
+        things = ('a', 'b')
+        registry.get({'THINGS': things})
+        registry.get({'THINGS': things})
+        self.assertEqual(2, len(self.built))
@@ -2,11 +2,11 @@ import urlparse
 import datetime
 import cPickle as pickle
 
-import statsd
 import dateutil
 
 from kardboard.app import cache
 from kardboard.app import app
+from kardboard.metrics import ScopedMetrics
 from kardboard.util import ImproperlyConfigured, log_exception
 from kardboard.tasks import update_ticket
 
@@ -123,12 +123,19 @@ class TestTicketHelper(TicketHelper):
 
 class JIRAHelper(TicketHelper):
     clients = {}
+    """suds clients by WSDL url, shared by every helper in the process."""
+
+    auths = {}
+    """Auth tokens and when they were fetched, by WSDL url."""
+
+    AUTH_TIMEOUT = 60 * 60
+
+    _statsd = None
 
     def __init__(self, config, kard):
         super(JIRAHelper, self).__init__(config, kard)
         self.logger = app.logger
         self.testing = app.config.get('TESTING')
-        self.statsd = app.statsd.get_client('tickethelpers.JIRAHelper')
 
         self.issues = {}
         self._service = None
@@ -147,6 +154,13 @@ class JIRAHelper(TicketHelper):
             raise ImproperlyConfigured(
                 "JIRA_CREDENTIALS should be a two-item tuple (user, pass)")
 
+    @property
+    def statsd(self):
+        # Shared by every helper, it writes to the process's metrics buffer
+        if JIRAHelper._statsd is None:
+            JIRAHelper._statsd = ScopedMetrics('tickethelpers.JIRAHelper')
+        return JIRAHelper._statsd
+
     @property
     def cache_prefix(self):
         return "jira_%s" % self.wsdl_url
@@ -157,9 +171,17 @@ class JIRAHelper(TicketHelper):
             self.connect()
         return self._service
 
+    def _shared_auth(self):
+        auth, fetched_at = self.auths.get(self.wsdl_url, (None, None))
+        if auth and fetched_at:
+            age = datetime.datetime.now() - fetched_at
+            if age < datetime.timedelta(seconds=self.AUTH_TIMEOUT):
+                return auth
+        return None
+
     def connect(self):
         auth_key = "offline_auth_%s" % self.cache_prefix
-        auth = cache.get(auth_key)
+        auth = self._shared_auth() or cache.get(auth_key)
 
         client = self.clients.get(self.wsdl_url, None)
         if not client:
@@ -178,8 +200,10 @@ class JIRAHelper(TicketHelper):
         if not auth:
             self.logger.warn("Cache miss for %s" % auth_key)
             auth = client.service.login(self.username, self.password)
-            cache.set(auth_key, auth, 60 * 60)  # Cache for an hour
+            cache.set(auth_key, auth, self.AUTH_TIMEOUT)
 
+        if self.auths.get(self.wsdl_url, (None, None))[0] != auth:
+            self.auths[self.wsdl_url] = (auth, datetime.datetime.now())
         self.auth = auth
         self._service = client.service
 
@@ -425,11 +449,9 @@ class JIRAHelper(TicketHelper):
         return card
 
     def actually_update(self, issue=None):
-        statsd_conn = self.statsd.get_client('actually_update')
-        counter = statsd_conn.get_client(class_=statsd.Counter)
-        timer = statsd_conn.get_client(class_=statsd.Timer)
-        timer.start()
-        counter += 1
+        metrics = self.statsd.scope('actually_update')
+        timer = metrics.timer().start()
+        metrics.incr()
 
         super(JIRAHelper, self).update()
 
@@ -4,6 +4,7 @@ import traceback
 import logging
 import os
 import functools
+import importlib
 
 from logging.handlers import RotatingFileHandler
 
@@ -59,6 +60,90 @@ class ImproperlyConfigured(Exception):
     pass
 
 
+class FrozenList(list):
+    """
+    A list that can't be changed once it's built,
+    so one instance can be shared process wide.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("%s is immutable" % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _immutable
+    __setslice__ = __delslice__ = _immutable
+    __iadd__ = __imul__ = _immutable
+    append = extend = insert = pop = remove = reverse = sort = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class FrozenDict(dict):
+    """
+    A dict that can't be changed once it's built,
+    so one instance can be shared process wide.
+    """
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("%s is immutable" % self.__class__.__name__)
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class ConfigRegistry(object):
+    """
+    Holds one value built from the app config, and only rebuilds
+    it when the config, or one of the settings it depends on, is
+    replaced. Lookups compare identities, so a setting has to be
+    assigned a new value rather than changed in place.
+    """
+    def __init__(self, settings, build):
+        self.settings = tuple(settings)
+        self.build = build
+        self._key = None
+        self._value = None
+
+    def get(self, config):
+        key = self._key
+        if key is not None and key[0] is config and \
+                all([config.get(name) is value for name, value in zip(self.settings, key[1:])]):
+            return self._value
+
+        self._value = self.build(config)
+        self._key = (config, ) + tuple([config.get(name) for name in self.settings])
+        return self._value
+
+
+_ticket_helper_classes = {}
+
+
+def get_ticket_helper_class(config):
+    """
+    The class named by the :ref:`TICKET_HELPER` setting. It's
+    imported once per process for each setting value.
+    """
+    helper_setting = config['TICKET_HELPER']
+    try:
+        return _ticket_helper_classes[helper_setting]
+    except KeyError:
+        pass
+
+    modname = '.'.join(helper_setting.split('.')[:-1])
+    klassnam = helper_setting.split('.')[-1]
+    mod = importlib.import_module(modname)
+    klass = getattr(mod, klassnam)
+    _ticket_helper_classes[helper_setting] = klass
+    return klass
+
+
 def redirect_to_next_url(fn):
     """
     Views wrapped in this decorator will
@@ -1,12 +1,16 @@
 import csv
 import cStringIO
 import datetime
-import importlib
+import hashlib
+import itertools
 import os
 import time
 from math import isnan
 
+from bson import ObjectId
 from dateutil import relativedelta
+from dateutil import parser as dateutil_parser
+from werkzeug.http import is_resource_modified
 from flask import (
     render_template,
     make_response,
@@ -18,15 +22,18 @@ from flask import (
     abort,
     send_from_directory,
     jsonify,
+    Response,
 )
 
 import kardboard.auth
 from kardboard.version import VERSION
 from kardboard.app import app
-from kardboard.models import Kard, DailyRecord, Q, Person, ReportGroup, States, DisplayBoard, PersonCardSet, FlowReport, StateLog, ServiceClassRecord, ServiceClassSnapshot
+from kardboard.models import Kard, DailyRecord, Q, Person, ReportGroup, get_states, DisplayBoard, PersonCardSet, FlowReport, StateLog, ServiceClassRecord, ServiceClassSnapshot, LeaderboardRecord, KardArchive, ProfileRun
 from kardboard.forms import get_card_form, _make_choice_field_ready, LoginForm, CardBlockForm, CardUnblockForm
 import kardboard.util
 from kardboard.services import teams as teams_service
+from kardboard.services import backlog as backlog_service
+from kardboard.services import pipeline as pipeline_service
 from kardboard.util import (
     make_start_date,
     make_end_date,
@@ -42,9 +49,7 @@ def _get_date():
     return date
 
 def _get_teams():
-    teams = teams_service.setup_teams(
-        app.config
-    )
+    teams = teams_service.get_teams()
     return teams
 
 def _find_team_by_slug(team_slug, teams):
@@ -117,6 +122,56 @@ def _team_backlog_markers(team, cards, weeks=12):
     return backlog_marker_data, backlog_markers
 
 
+def _report_validators(queryset):
+    """
+    Builds an (etag, last_modified) pair for a report page from
+    the newest updated_at among the precomputed records behind it.
+    Returns None if there are no records yet.
+    """
+    newest = queryset.clone().order_by('-updated_at').only('updated_at').first()
+    if newest is None or newest.updated_at is None:
+        return None
+
+    # HTTP dates only go down to the second, the ETag changes
+    # with any rewrite of the record
+    last_modified = newest.updated_at.replace(microsecond=0)
+    etag = hashlib.md5('|'.join([
+        request.url,
+        newest.updated_at.isoformat(),
+        _get_date().strftime("%Y-%m-%d"),
+        VERSION,
+    ])).hexdigest()
+    return etag, last_modified
+
+
+def _not_modified(validators):
+    """
+    Returns a 304 response if the client's If-None-Match or
+    If-Modified-Since headers match the report's validators.
+    """
+    if validators is None:
+        return None
+
+    etag, last_modified = validators
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+
+    return _cacheable(app.response_class(status=304), validators)
+
+
+def _cacheable(response, validators):
+    response = make_response(response)
+    if validators is None:
+        return response
+
+    etag, last_modified = validators
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.max_age = app.config.get('REPORT_CACHE_MAX_AGE', 60)
+    response.cache_control.must_revalidate = True
+    return response
+
+
 def team(team_slug=None):
     date = _get_date()
     teams = _get_teams()
@@ -172,30 +227,34 @@ def team(team_slug=None):
     return render_template('team.html', **context)
 
 def team_backlog(team_slug=None):
+    teams = _get_teams()
+    team = _find_team_by_slug(team_slug, teams)
+
     if request.method == "POST":
         if kardboard.auth.is_authenticated() is False:
             abort(403)
 
         start = time.time()
-        card_key_list = request.form.getlist('card[]')
-        counter = 1
-        for card_key in card_key_list:
-            Kard.objects(
-                key=card_key.strip()
-            ).only('priority').update_one(set__priority=counter)
-            counter +=1
+        card_key = request.form.get('key', '').strip()
+        if not card_key:
+            abort(400)
+        before_key = request.form.get('before', '').strip() or None
+        after_key = request.form.get('after', '').strip() or None
+
+        try:
+            writes = backlog_service.move_card(team.name, card_key, before_key, after_key)
+        except Kard.DoesNotExist:
+            abort(404)
 
         elapsed = (time.time() - start)
-        return jsonify(message="Reordered %s cards in %.2fs" % (counter, elapsed))
+        return jsonify(message="Moved %s, wrote %s cards in %.2fs" % (card_key, writes, elapsed))
 
-    teams = _get_teams()
-    team = _find_team_by_slug(team_slug, teams)
     weeks=12
 
     backlog = Kard.objects.filter(
         team=team.name,
-        state=States().backlog,
-    ).exclude('_ticket_system_data').order_by('priority')
+        state=get_states().backlog,
+    ).order_by('priority')
 
 
     backlog_marker_data, backlog_markers = _team_backlog_markers(team, backlog, weeks)
@@ -220,7 +279,7 @@ def team_backlog(team_slug=None):
 def state():
     date = datetime.datetime.now()
     date = make_end_date(date=date)
-    states = States()
+    states = get_states()
 
     board = DisplayBoard(backlog_limit=0)  # defaults to all teams, 7 days of done
     board.cards  # force the card calculation
@@ -230,9 +289,7 @@ def state():
 
     metrics = []
 
-    teams = teams_service.setup_teams(
-        app.config
-    )
+    teams = teams_service.get_teams()
 
     context = {
         'title': title,
@@ -252,7 +309,7 @@ def _init_new_card_form(*args, **kwargs):
 
 
 def _init_card_form(*args, **kwargs):
-    states = States()
+    states = get_states()
     new = kwargs.get('new', False)
     if new:
         del kwargs['new']
@@ -262,9 +319,7 @@ def _init_card_form(*args, **kwargs):
     if states:
         f.state.choices = states.for_forms
 
-    teams = teams_service.setup_teams(
-        app.config
-    )
+    teams = teams_service.get_teams()
     if teams:
         f.team.choices = _make_choice_field_ready(teams.names)
 
@@ -333,17 +388,27 @@ def card_edit(key):
 
 @kardboard.auth.login_required
 def card(key):
+    archived = False
     try:
         card = Kard.objects.get(key=key)
     except Kard.DoesNotExist:
-        abort(404)
+        # Done cards past the archive cutoff are still linked to
+        # from the reports, they're shown read only
+        card = KardArchive.get(key)
+        if card is None:
+            abort(404)
+        archived = True
 
-    card_log = StateLog.objects.filter(card=card)
+    if archived:
+        card_log = KardArchive.statelogs_for(card)
+    else:
+        card_log = StateLog.objects.filter(card=card)
 
     context = {
         'title': "%s -- %s" % (card.key, card.title),
         'card': card,
         'card_log': card_log,
+        'archived': archived,
         'updated_at': datetime.datetime.now(),
         'version': VERSION,
     }
@@ -424,57 +489,108 @@ def card_block(key):
 
 
 def quick():
-    key = request.args.get('key', None)
+    key = request.args.get('key', '')
     key = key.strip()
     if not key:
-        url = url_for('dashboard')
+        url = url_for('state')
         return redirect(url)
 
-    try:
-        card = Kard.objects.get(key=key)
-    except Kard.DoesNotExist:
-        card = None
-
-    if not card:
-        try:
-            card = Kard.objects.get(key=key.upper())
-        except Kard.DoesNotExist:
-            pass
+    card = Kard.objects.filter(
+        key=Kard.normalize_key(key)).only('key').first()
 
     if card:
         url = url_for('card', key=card.key)
+    elif KardArchive.exists(key):
+        url = url_for('card', key=Kard.normalize_key(key))
     else:
         url = url_for('card_add', key=key)
 
     return redirect(url)
 
 
-@kardboard.auth.login_required
-def card_export():
+def _export_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'second'):
+        value = value.strftime("%m/%d/%Y")
+    if hasattr(value, 'strip'):
+        value = value.strip()
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return value
+
+
+def _export_rows(cursor, batch_size):
+    """
+    Yields the export CSV in chunks of batch_size rows, so
+    the whole file never has to be held in memory.
+    """
     output = cStringIO.StringIO()
     export = csv.DictWriter(output, Kard.EXPORT_FIELDNAMES)
     header_row = [(v, v) for v in Kard.EXPORT_FIELDNAMES]
     export.writerow(dict(header_row))
-    for c in Kard.objects.all():
+
+    counter = 0
+    for card in cursor:
         row = {}
-        card = c.to_mongo()
         for name in Kard.EXPORT_FIELDNAMES:
-            try:
-                value = card[name]
-                if hasattr(value, 'second'):
-                    value = value.strftime("%m/%d/%Y")
-                if hasattr(value, 'strip'):
-                    value = value.strip()
-                row[name] = value
-            except KeyError:
-                row[name] = ''
+            row[name] = _export_value(card.get(name))
         export.writerow(row)
+        counter += 1
 
-    response = make_response(output.getvalue())
-    content_type = response.headers['Content-Type']
-    response.headers['Content-Type'] = \
-        content_type.replace('text/html', 'text/plain')
-    return response
+        if counter % batch_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+
+    yield output.getvalue()
+
+
+def _parse_export_date(value, end=False):
+    if not value:
+        return None
+    try:
+        date = dateutil_parser.parse(value)
+    except (ValueError, TypeError):
+        abort(400)
+    if end:
+        return make_end_date(date=date)
+    return make_start_date(date=date)
+
+
+@kardboard.auth.login_required
+def card_export():
+    """
+    Exports Kard.EXPORT_FIELDNAMES as CSV.
+
+    Optionally filtered by team slug (?team=team-1) and
+    done date range (?start=2012-01-01&end=2012-03-31).
+    """
+    query = Kard.objects
+
+    team_slug = request.args.get('team', None)
+    if team_slug:
+        try:
+            team = _find_team_by_slug(team_slug, _get_teams())
+        except ValueError:
+            abort(404)
+        query = query.filter(team=team.name)
+
+    start = _parse_export_date(request.args.get('start', None))
+    end = _parse_export_date(request.args.get('end', None), end=True)
+    if start:
+        query = query.filter(done_date__gte=start)
+    if end:
+        query = query.filter(done_date__lte=end)
+
+    batch_size = app.config.get('EXPORT_BATCH_SIZE', 500)
+    fields = list(Kard.EXPORT_FIELDNAMES)
+    cursor = itertools.chain(
+        Kard._get_collection().find(query._query, fields=fields).batch_size(batch_size),
+        KardArchive.find(query._query, fields=fields).batch_size(batch_size),
+    )
+
+    return Response(_export_rows(cursor, batch_size), mimetype='text/plain')
 
 
 def reports_index():
@@ -511,7 +627,7 @@ def done(group="all", months=3, start=None):
     done = rg.queryset
 
     cards = done.filter(done_date__gte=start,
-        done_date__lte=end).order_by('-done_date')
+        done_date__lte=end).order_by('-done_date').with_archive()
 
     context = {
         'title': "Completed Cards",
@@ -532,30 +648,21 @@ def report_leaderboard(group="all", months=3, person=None, start_month=None, sta
     start = months_ranges[0][0]
     end = months_ranges[-1][-1]
 
-    rg = ReportGroup(group, Kard.objects.done())
-    done = rg.queryset
-
-    cards = done.filter(done_date__gte=start,
-        done_date__lte=end)
-
-    people = {}
-    for card in cards:
-        try:
-            devs = card.ticket_system_data['developers']
-            for d in devs:
-                p = people.get(d, PersonCardSet(d))
-                p.add_card(card)
-                people[d] = p
-        except KeyError:
-            pass
-
     if person:
-        person = people.get(person, None)
+        rg = ReportGroup(group, Kard.objects.done())
+        cards = rg.queryset.filter(done_date__gte=start,
+            done_date__lte=end,
+            _developers=person).unordered().with_archive()
+
+        person_cards = PersonCardSet(person)
+        for card in cards:
+            person_cards.add_card(card)
+        person = person_cards
         people = []
-        if not person:
+        if not person.all_cards:
             abort(404)
     else:
-        people = people.values()
+        people = LeaderboardRecord.people_for_ranges(months_ranges, group)
         people.sort(reverse=True)
 
     context = {
@@ -587,6 +694,12 @@ def report_service_class(group="all", months=None):
 
     if months is None:
         # We want the current report
+        validators = _report_validators(
+            ServiceClassSnapshot.objects.filter(group=group))
+        not_modified = _not_modified(validators)
+        if not_modified:
+            return not_modified
+
         try:
             scr = ServiceClassSnapshot.objects.get(
                 group=group,
@@ -601,6 +714,16 @@ def report_service_class(group="all", months=None):
         months_ranges = month_ranges(start, months)
         start_date = months_ranges[0][0]
         end_date = months_ranges[-1][1]
+
+        validators = _report_validators(ServiceClassRecord.objects.filter(
+            group=group,
+            start_date=start_date,
+            end_date=end_date,
+        ))
+        not_modified = _not_modified(validators)
+        if not_modified:
+            return not_modified
+
         try:
             scr = ServiceClassRecord.objects.get(
                 group=group,
@@ -623,7 +746,7 @@ def report_service_class(group="all", months=None):
         'version': VERSION,
     }
 
-    return render_template('report-service-class.html', **context)
+    return _cacheable(render_template('report-service-class.html', **context), validators)
 
 
 def report_throughput(group="all", months=3, start=None):
@@ -638,7 +761,7 @@ def report_throughput(group="all", months=3, start=None):
         filtered_cards = Kard.objects.filter(done_date__gte=start,
             done_date__lte=end)
         rg = ReportGroup(group, filtered_cards)
-        cards = rg.queryset
+        cards = rg.queryset.unordered().with_archive()
 
         if with_defects:
             counts = {'card': 0, 'defect': 0}
@@ -700,6 +823,11 @@ def report_cycle(group="all", months=3, year=None, month=None, day=None):
         date__lte=end_day,
         group=group)
 
+    validators = _report_validators(records)
+    not_modified = _not_modified(validators)
+    if not_modified:
+        return not_modified
+
     daily_moving_averages = [(r.date, r.moving_cycle_time) for r in records]
     daily_moving_lead = [(r.date, r.moving_lead_time) for r in records]
 
@@ -730,10 +858,10 @@ def report_cycle(group="all", months=3, year=None, month=None, day=None):
         'version': VERSION,
     }
 
-    return render_template('report-cycle.html', **context)
+    return _cacheable(render_template('report-cycle.html', **context), validators)
 
 def report_assignee(group="all"):
-    states = States()
+    states = get_states()
     states_of_interest = [s for s in states if s not in (states.backlog, states.done)]
     # ReportGroup of WIP
     rg = ReportGroup(group, Kard.objects.filter(state__in=states_of_interest))
@@ -807,7 +935,7 @@ def report_cycle_distribution(group="all", months=3, limit=None):
         query = query & Q(_type__nin=app.config.get('DEFECT_TYPES', []))
     rg = ReportGroup(group, Kard.objects.filter(query))
 
-    total = rg.queryset.count()
+    total = rg.queryset.with_archive().count()
     if total == 0:
         context = {
             'error': "Zero cards were completed in the past %s months" % months
@@ -823,7 +951,7 @@ def report_cycle_distribution(group="all", months=3, limit=None):
             query = query & Q(_type__in=app.config.get('DEFECT_TYPES', []))
         else:
             query = query & Q(_type__nin=app.config.get('DEFECT_TYPES', []))
-        pct = ReportGroup(group, Kard.objects.filter(query)).queryset.count() / float(total)
+        pct = ReportGroup(group, Kard.objects.filter(query)).queryset.with_archive().count() / float(total)
         pct = round(pct, 2)
         distro.append((label, pct))
 
@@ -871,6 +999,11 @@ def report_flow(group="all", months=3):
         date__lte=end_day,
         group=group)
 
+    validators = _report_validators(records)
+    not_modified = _not_modified(validators)
+    if not_modified:
+        return not_modified
+
     chart = {}
     chart['categories'] = [report.date.strftime("%m/%d") for report in records]
     series = [
@@ -894,7 +1027,7 @@ def report_flow(group="all", months=3):
         'flowdata': records,
         'version': VERSION,
     }
-    return render_template('chart-flow.html', **context)
+    return _cacheable(render_template('chart-flow.html', **context), validators)
 
 
 def report_detailed_flow_cards(group="all", months=3):
@@ -913,6 +1046,14 @@ def report_detailed_flow(group="all", months=3, cards_only=False):
     else:
         only_arg = ('state_counts', 'date', 'group')
 
+    validators = _report_validators(FlowReport.objects.filter(
+        date__gte=start_day,
+        date__lte=end_day,
+        group=group))
+    not_modified = _not_modified(validators)
+    if not_modified:
+        return not_modified
+
     reports = FlowReport.objects.filter(
         date__gte=start_day,
         date__lte=end_day,
@@ -924,7 +1065,7 @@ def report_detailed_flow(group="all", months=3, cards_only=False):
     chart['categories'] = []
 
     series = []
-    for state in States():
+    for state in get_states():
         seri = {'name': state, 'data': []}
         series.append(seri)
 
@@ -957,10 +1098,10 @@ def report_detailed_flow(group="all", months=3, cards_only=False):
         'chart': chart,
         'start_date': start_date,
         'updated_at': reports[0].updated_at,
-        'states': States(),
+        'states': get_states(),
         'version': VERSION,
     }
-    return render_template('report-detailed-flow.html', **context)
+    return _cacheable(render_template('report-detailed-flow.html', **context), validators)
 
 
 @kardboard.util.redirect_to_next_url
@@ -971,12 +1112,7 @@ def login():
     f = LoginForm(request.form)
 
     if request.method == "POST" and f.validate():
-        helper_setting = app.config['TICKET_HELPER']
-        modname = '.'.join(helper_setting.split('.')[:-1])
-        klassnam = helper_setting.split('.')[-1]
-        mod = importlib.import_module(modname)
-        klass = getattr(mod, klassnam)
-
+        klass = kardboard.util.get_ticket_helper_class(app.config)
         helper = klass(app.config, None)
         result = helper.login(f.username.data, f.password.data)
         if result:
@@ -1020,6 +1156,54 @@ def person(name):
     return render_template('person.html', **context)
 
 
+@kardboard.auth.login_required
+def profiles():
+    runs = ProfileRun.objects.exclude('stats', 'queries').limit(100)
+    context = {
+        'title': "Profiles",
+        'runs': runs,
+        'enabled': app.config.get('PROFILING_ENABLED', False),
+        'updated_at': datetime.datetime.now(),
+        'version': VERSION,
+    }
+    return render_template('profiles.html', **context)
+
+
+@kardboard.auth.login_required
+def profile(profile_id):
+    run = None
+    if ObjectId.is_valid(profile_id):
+        run = ProfileRun.objects.with_id(profile_id)
+    if run is None:
+        abort(404)
+
+    context = {
+        'title': "Profile of %s" % run.name,
+        'run': run,
+        'updated_at': run.created_at,
+        'version': VERSION,
+    }
+    return render_template('profile.html', **context)
+
+
+@kardboard.auth.login_required
+def ops():
+    today = now()
+    sync_ages = pipeline_service.sync_ages(today)
+    context = {
+        'title': "Operations",
+        'sync_ages': sync_ages,
+        'total_cards': sum([count for label, count in sync_ages]),
+        'queue_depth': pipeline_service.queue_depth(),
+        'periodic_tasks': pipeline_service.periodic_tasks(),
+        'freshness': pipeline_service.report_freshness(today),
+        'cache_stats': pipeline_service.cache_stats(),
+        'updated_at': today,
+        'version': VERSION,
+    }
+    return render_template('ops.html', **context)
+
+
 def favicon():
     return send_from_directory(os.path.join(app.root_path, 'static'),
                                'favicon.ico', mimetype='image/vnd.microsoft.icon')
@@ -1063,6 +1247,9 @@ app.add_url_rule('/reports/<group>/leaderboard/<int:start_year>-<int:start_month
 app.add_url_rule('/login/', 'login', login, methods=["GET", "POST"])
 app.add_url_rule('/logout/', 'logout', logout)
 app.add_url_rule('/person/<name>/', 'person', person)
+app.add_url_rule('/profiles/', 'profiles', profiles)
+app.add_url_rule('/ops/', 'ops', ops)
+app.add_url_rule('/profiles/<profile_id>/', 'profile', profile)
 app.add_url_rule('/quick/', 'quick', quick, methods=["GET"])
 app.add_url_rule('/robots.txt', 'robots', robots,)
 app.add_url_rule('/team/<team_slug>/', 'team', team)